@@ -1,13 +1,27 @@
 import asyncio
 import logging
+import secrets
+from datetime import time
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.exceptions import TelegramNetworkError, TelegramUnauthorizedError
+from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN
-from handlers import common, admin, staff, customer
-from db.base import engine
-from db.models import Base
+from config import (
+    BOT_TOKEN, BOT_MODE, FSM_STORAGE,
+    WEEKLY_REPORT_ENABLED, REPORT_WEEK_START, WEEKLY_REPORT_HOUR,
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_CONCURRENCY,
+    QUERY_STATS_ENABLED,
+)
+from handlers import common, admin, staff, customer, search as search_handlers
+from db.base import engine, AsyncSessionLocal
+from db import migrations, audit, identity, outbox, report_cache, search
+from db.fsm_storage import SQLStorage
+from services.webhook import run_webhook
+from services import reports
+from services.scheduler import scheduler
+from utils import notify, query_stats
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,17 +29,27 @@ logging.basicConfig(
 )
 
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-dp = Dispatcher()
+# وضعیت فرم‌های چندمرحله‌ای: پیش‌فرض در دیتابیس تا ری‌استارت آن‌ها را از بین نبرد
+storage = SQLStorage(AsyncSessionLocal) if FSM_STORAGE == "sql" else MemoryStorage()
+dp = Dispatcher(storage=storage)
 
 dp.include_router(common.router)
 dp.include_router(admin.router)
 dp.include_router(staff.router)
 dp.include_router(customer.router)
+dp.include_router(search_handlers.router)
+
+# تعداد و زمان کوئری‌های هر آپدیت + هشدار N+1
+db_stats = query_stats.setup(dp, engine) if QUERY_STATS_ENABLED else None
 
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logging.info("✅ Database schema ensured (tables created if missing).")
+    applied = await migrations.upgrade(engine)
+    logging.info("✅ Database schema ensured (tables created, migrations applied: %s).", applied or "-")
+
+async def warm_search_index():
+    async with AsyncSessionLocal() as session:
+        idx = await search.ensure_index(session)
+    logging.info("🔎 Client search index ready (%d clients).", len(idx))
 
 async def main():
     logging.info("✅ Bot is starting...")
@@ -40,7 +64,45 @@ async def main():
     except TelegramNetworkError as e:
         logging.error("❌ خطای شبکه هنگام ارتباط با تلگرام: %s", e)
 
-    await dp.start_polling(bot, allowed_updates=None, drop_pending_updates=True)
+    await audit.sink.start(AsyncSessionLocal)
+    await notify.dispatcher.start(bot)
+    await outbox.relay.start(AsyncSessionLocal, notify.coalescer)
+    if WEEKLY_REPORT_ENABLED:
+        scheduler.add(
+            "weekly_report", reports.publish_weekly,
+            period="weekly", at=time(WEEKLY_REPORT_HOUR, 0), week_start=REPORT_WEEK_START,
+        )
+    await scheduler.start(AsyncSessionLocal)
+    warmup = asyncio.create_task(warm_search_index())
+    try:
+        if BOT_MODE == "webhook":
+            if not WEBHOOK_BASE_URL:
+                logging.error("❌ BOT_MODE=webhook ولی WEBHOOK_BASE_URL تنظیم نشده است.")
+                return
+            await run_webhook(
+                dp, bot,
+                base_url=WEBHOOK_BASE_URL,
+                path=WEBHOOK_PATH,
+                host=WEBHOOK_HOST,
+                port=WEBHOOK_PORT,
+                secret_token=WEBHOOK_SECRET or secrets.token_urlsafe(32),
+                max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+            )
+        else:
+            # اگر قبلاً webhook ثبت شده باشد getUpdates کار نمی‌کند؛ آپدیت‌های در صف حفظ می‌شوند
+            await bot.delete_webhook(drop_pending_updates=False)
+            await dp.start_polling(bot, allowed_updates=None, drop_pending_updates=True)
+    finally:
+        warmup.cancel()
+        await scheduler.stop()
+        await outbox.relay.stop()
+        await notify.dispatcher.stop()
+        await storage.close()
+        await audit.sink.stop()
+        logging.info("🪪 Identity cache: %s", identity.cache.stats())
+        logging.info("🗂 Report cache: %s", report_cache.cache.stats())
+        if db_stats is not None and db_stats.totals:
+            logging.info("🧮 SQL per handler:\n%s", db_stats.summary())
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,68 @@
+"""
+بنچمارک جستجوی inline مشتری (db.search): زمان ساخت ایندکس و تأخیر هر جستجو
+برای مدیر (همه مشتری‌ها) و نیرو (فقط مشتری‌های خودش) روی نام‌های مصنوعی فارسی.
+
+    python -m benchmarks.client_search
+    python -m benchmarks.client_search --clients 100000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from db.search import ClientSearchIndex
+
+_KINDS = ["فروشگاه", "شرکت", "کافه", "رستوران", "آرایشگاه", "كلينيك", "آموزشگاه", "گالری", "نمایشگاه", "داروخانه"]
+_WORDS = [
+    "آفتاب", "ستاره", "نگین", "پارسی", "البرز", "سپهر", "کیان", "آریا", "مهر", "نور",
+    "باران", "دریا", "کوهستان", "سیمرغ", "بهار", "پردیس", "تندیس", "رویال", "ماهان", "آوا",
+]
+
+
+def _names(n: int, rnd: random.Random):
+    for i in range(n):
+        yield f"{rnd.choice(_KINDS)} {rnd.choice(_WORDS)}‌{rnd.choice(_WORDS)} {rnd.randrange(1, 500)}"
+
+
+def _lat(fn, queries):
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        out.append((time.perf_counter() - t0) * 1e6)
+    out.sort()
+    return statistics.median(out), out[int(len(out) * 0.99) - 1], out[-1]
+
+
+def run(n: int, staff: int, q_count: int) -> None:
+    rnd = random.Random(11)
+    rows = [(i, name, rnd.randrange(1, staff + 1)) for i, name in enumerate(_names(n, rnd), start=1)]
+
+    idx = ClientSearchIndex()
+    t0 = time.perf_counter()
+    idx.rebuild(rows)
+    print(f"{n} clients, build {time.perf_counter() - t0:.2f}s")
+
+    vocab = _KINDS + _WORDS
+    queries = []
+    for _ in range(q_count):
+        w = rnd.choice(vocab)
+        cut = rnd.randrange(1, len(w) + 1)
+        queries.append(rnd.choice([w[:cut], w[-max(3, cut):], f"{rnd.choice(_KINDS)} {w[:cut]}"]))
+
+    print(f"{'scope':>6} | {'p50 µs':>7} {'p99 µs':>7} {'max µs':>7}")
+    p50, p99, mx = _lat(lambda q: idx.search(q), queries)
+    print(f"{'admin':>6} | {p50:>7.0f} {p99:>7.0f} {mx:>7.0f}")
+    p50, p99, mx = _lat(lambda q: idx.search(q, staff_id=rnd.randrange(1, staff + 1)), queries)
+    print(f"{'staff':>6} | {p50:>7.0f} {p99:>7.0f} {mx:>7.0f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--clients", type=int, default=50000)
+    p.add_argument("--staff", type=int, default=200)
+    p.add_argument("--queries", type=int, default=2000)
+    args = p.parse_args()
+    run(args.clients, args.staff, args.queries)
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.orm import sessionmaker
+
+from db.models import Base
+
+
+async def make_engine(url: str = "sqlite+aiosqlite://", **kwargs) -> tuple[AsyncEngine, sessionmaker]:
+    """موتور جدا برای بنچمارک (پیش‌فرض: SQLite در حافظه) + ساخت جداول."""
+    engine = create_async_engine(url, echo=False, future=True, **kwargs)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+class QueryCounter:
+    """شمارش دستورات SQL ارسال‌شده روی یک engine."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine.sync_engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    @contextmanager
+    def track(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def timer():
+    box = {"elapsed": 0.0}
+    t0 = time.perf_counter()
+    try:
+        yield box
+    finally:
+        box["elapsed"] = time.perf_counter() - t0
@@ -0,0 +1,425 @@
+"""
+اجرای همه توابع db/crud.py و تجمیع‌های هندلرهای گزارش روی داده benchmarks.dataset.
+برای هر مورد: p50/p95/p99 زمان، تعداد دستورات SQL هر فراخوانی و کار دیتابیس:
+- Postgres: rows_scanned = مجموع ردیف‌های خوانده‌شده نودهای scan در EXPLAIN ANALYZE دستورات SELECT.
+- SQLite: full_scans = جدول‌هایی که EXPLAIN QUERY PLAN آن‌ها را بدون ایندکس پیمایش می‌کند.
+نتیجه در JSON ذخیره می‌شود تا بین commitها مقایسه شود (--compare).
+
+    python -m benchmarks.crud_suite --url sqlite+aiosqlite:///./bench_dataset.sqlite3 --out crud.json
+    python -m benchmarks.crud_suite --only report --iterations 20 --compare crud-before.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import sqlalchemy
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from db import crud
+from db.base import build_engine
+from db.models import User, Client, Activity, Sale, Feedback, KPIRecord
+from services import kpi as kpi_service, reports
+from utils.constants import ROLE_STAFF
+from benchmarks.dataset import DEFAULT_URL
+
+Case = Callable[[AsyncSession, "Context"], Awaitable[object]]
+
+
+class Context(NamedTuple):
+    rnd: random.Random
+    now: datetime
+    client_ids: List[int]      # نمونه تصادفی مشتری‌ها
+    hot_client: int            # مشتری با بیشترین فعالیت
+    staff_ids: List[int]
+    hot_staff: int             # نیرو با بیشترین مشتری
+    client_tg_ids: List[int]
+    kpi_period: tuple          # (scope, client_id, start, end) یک دوره‌ی دارای رکورد
+
+    def client(self) -> int:
+        return self.rnd.choice(self.client_ids)
+
+    def staff(self) -> int:
+        return self.rnd.choice(self.staff_ids)
+
+    def week(self) -> tuple:
+        return self.now - timedelta(days=7), self.now
+
+
+# -----------------------------
+# موردها
+# -----------------------------
+CASES: Dict[str, tuple] = {}   # name → (case, iterations ضریب)
+
+
+def case(name: str, weight: float = 1.0):
+    def deco(fn: Case) -> Case:
+        CASES[name] = (fn, weight)
+        return fn
+    return deco
+
+
+@case("get_user_by_id")
+async def _(s, ctx): return await crud.get_user_by_id(s, ctx.staff())
+@case("get_client_by_id")
+async def _(s, ctx): return await crud.get_client_by_id(s, ctx.client())
+@case("get_client_by_telegram_id")
+async def _(s, ctx): return await crud.get_client_by_telegram_id(s, ctx.rnd.choice(ctx.client_tg_ids))
+@case("is_admin_tgid")
+async def _(s, ctx): return await crud.is_admin_tgid(s, 1_000_000_000)
+@case("list_staff_active")
+async def _(s, ctx): return await crud.list_staff_active(s)
+@case("list_staff_options")
+async def _(s, ctx): return await crud.list_staff_options(s)
+@case("list_client_options", 0.2)
+async def _(s, ctx): return await crud.list_client_options(s)
+@case("list_client_options[staff]")
+async def _(s, ctx): return await crud.list_client_options(s, staff_id=ctx.hot_staff)
+@case("list_all_clients", 0.1)
+async def _(s, ctx): return await crud.list_all_clients(s)
+@case("page_client_options")
+async def _(s, ctx): return await crud.page_client_options(s, cursor=ctx.client(), direction="n")
+@case("page_staff_options")
+async def _(s, ctx): return await crud.page_staff_options(s, cursor=ctx.staff(), direction="n")
+@case("list_clients_for_staff")
+async def _(s, ctx): return await crud.list_clients_for_staff(s, ctx.hot_staff)
+@case("count_clients_for_staff")
+async def _(s, ctx): return await crud.count_clients_for_staff(s, ctx.staff())
+@case("get_client_kpi")
+async def _(s, ctx): return await crud.get_client_kpi(s, ctx.client())
+@case("count_activities_for_client")
+async def _(s, ctx): return await crud.count_activities_for_client(s, ctx.hot_client)
+@case("count_activities_in_range")
+async def _(s, ctx): return await crud.count_activities_in_range(s, ctx.hot_client, *ctx.week())
+@case("last_activity_ts")
+async def _(s, ctx): return await crud.last_activity_ts(s, ctx.client())
+@case("count_activities_in_range_by_staff")
+async def _(s, ctx): return await crud.count_activities_in_range_by_staff(s, ctx.hot_staff, *ctx.week())
+@case("last_activity_ts_for_staff")
+async def _(s, ctx): return await crud.last_activity_ts_for_staff(s, ctx.staff())
+@case("list_recent_activities_for_client")
+async def _(s, ctx): return await crud.list_recent_activities_for_client(s, ctx.hot_client)
+@case("list_recent_activities_for_staff")
+async def _(s, ctx): return await crud.list_recent_activities_for_staff(s, ctx.hot_staff)
+@case("avg_feedback_for_client")
+async def _(s, ctx): return await crud.avg_feedback_for_client(s, ctx.hot_client)
+@case("list_recent_feedback_for_client")
+async def _(s, ctx): return await crud.list_recent_feedback_for_client(s, ctx.hot_client)
+@case("avg_feedback_for_staff_clients")
+async def _(s, ctx): return await crud.avg_feedback_for_staff_clients(s, ctx.hot_staff)
+@case("sum_sales_in_range")
+async def _(s, ctx): return await crud.sum_sales_in_range(s, ctx.hot_client, *ctx.week())
+@case("sum_sales_in_range[90d]")
+async def _(s, ctx): return await crud.sum_sales_in_range(s, ctx.hot_client, ctx.now - timedelta(days=90), ctx.now)
+@case("sum_sales_in_range_for_staff")
+async def _(s, ctx): return await crud.sum_sales_in_range_for_staff(s, ctx.hot_staff, *ctx.week())
+@case("list_recent_sales_for_client")
+async def _(s, ctx): return await crud.list_recent_sales_for_client(s, ctx.hot_client)
+@case("list_client_summaries", 0.1)
+async def _(s, ctx): return await crud.list_client_summaries(s, *ctx.week())
+@case("list_client_summaries[staff]", 0.5)
+async def _(s, ctx): return await crud.list_client_summaries(s, *ctx.week(), staff_id=ctx.hot_staff)
+@case("list_staff_with_load")
+async def _(s, ctx): return await crud.list_staff_with_load(s)
+@case("page_staff_with_load")
+async def _(s, ctx): return await crud.page_staff_with_load(s)
+@case("pick_staff_by_capacity")
+async def _(s, ctx): return await crud.pick_staff_by_capacity(s)
+@case("get_latest_report_snapshot")
+async def _(s, ctx): return await crud.get_latest_report_snapshot(s, reports.WEEKLY)
+@case("get_kpi_record")
+async def _(s, ctx):
+    scope, cid, p0, p1 = ctx.kpi_period
+    return await crud.get_kpi_record(s, scope=scope, metric="ig_leads", period_start=p0, period_end=p1, client_id=cid)
+@case("kpi_report_dict")
+async def _(s, ctx):
+    scope, cid, p0, p1 = ctx.kpi_period
+    return await crud.kpi_report_dict(s, scope=scope, period_start=p0, period_end=p1, client_id=cid)
+@case("list_kpi_values_for_periods")
+async def _(s, ctx):
+    scope, cid, p0, _p1 = ctx.kpi_period
+    bounds = kpi_service.last_periods(scope, kpi_service.TREND_PERIODS[scope], when=p0)
+    return await crud.list_kpi_values_for_periods(
+        s, scope=scope, metrics=[m for _, m in kpi_service.get_metrics(scope)],
+        period_starts=[b[0] for b in bounds], client_id=cid,
+    )
+
+
+@case("stream_rows_in_range[sales 7d]", 0.2)
+async def _(s, ctx):
+    n = 0
+    async for part in crud.stream_rows_in_range(s, Sale, Sale.ts, *ctx.week()):
+        n += len(part)
+    return n
+
+
+# --- نوشتن‌ها (هر فراخوانی یک تراکنش کامل؛ چند ردیف به داده اضافه می‌شود) ---
+@case("create_activity")
+async def _(s, ctx):
+    return await crud.create_activity(s, client_id=ctx.client(), staff_id=ctx.staff(), activity_type="پست")
+@case("create_sale")
+async def _(s, ctx): return await crud.create_sale(s, client_id=ctx.client(), amount=1_000_000, source="حضوری")
+@case("create_feedback")
+async def _(s, ctx): return await crud.create_feedback(s, client_id=ctx.client(), score=4)
+@case("upsert_client_kpi")
+async def _(s, ctx): return await crud.upsert_client_kpi(s, ctx.client(), 5)
+@case("upsert_kpi_record")
+async def _(s, ctx):
+    scope, cid, p0, p1 = ctx.kpi_period
+    return await crud.upsert_kpi_record(s, scope=scope, metric="ig_leads", value=ctx.rnd.randint(1, 99),
+                                        period_start=p0, period_end=p1, client_id=cid)
+@case("assign_client_to_staff")
+async def _(s, ctx):
+    cid = ctx.client()
+    c = await crud.get_client_by_id(s, cid)
+    return await crud.assign_client_to_staff(s, cid, c.assigned_staff_id or ctx.staff())
+
+
+# --- تجمیع هندلرهای گزارش (همان دنباله فراخوانی‌های handlers/admin.py) ---
+@case("report:one_client")
+async def _(s, ctx):
+    cid = ctx.hot_client
+    start_dt, end_dt = ctx.week()
+    c = await crud.get_client_by_id(s, cid)
+    await crud.get_client_kpi(s, cid)
+    await crud.count_activities_in_range(s, cid, start_dt, end_dt)
+    await crud.avg_feedback_for_client(s, cid)
+    await crud.last_activity_ts(s, cid)
+    await crud.sum_sales_in_range(s, cid, start_dt, end_dt)
+    if c.assigned_staff_id:
+        await crud.get_user_by_id(s, c.assigned_staff_id)
+    await crud.list_recent_activities_for_client(s, cid, limit=10)
+    await crud.list_recent_feedback_for_client(s, cid, limit=10)
+    return await crud.list_recent_sales_for_client(s, cid, limit=10)
+@case("report:one_staff")
+async def _(s, ctx):
+    sid = ctx.hot_staff
+    start_dt, end_dt = ctx.week()
+    await crud.get_user_by_id(s, sid)
+    await crud.count_activities_in_range_by_staff(s, sid, start_dt, end_dt)
+    await crud.list_client_options(s, staff_id=sid)
+    await crud.avg_feedback_for_staff_clients(s, sid)
+    await crud.last_activity_ts_for_staff(s, sid)
+    await crud.list_recent_activities_for_staff(s, sid, limit=10)
+    return await crud.sum_sales_in_range_for_staff(s, sid, start_dt, end_dt)
+@case("report:weekly_live", 0.1)
+async def _(s, ctx): return await reports.build_weekly(s, *ctx.week())
+@case("report:kpi")
+async def _(s, ctx):
+    scope, cid, p0, _p1 = ctx.kpi_period
+    data, start_d, end_d = await kpi_service.report_dict(s, scope=scope, when=p0, client_id=cid)
+    return kpi_service.format_report_text(scope, start_d, end_d, data)
+@case("report:kpi_trend")
+async def _(s, ctx):
+    scope, cid, p0, _p1 = ctx.kpi_period
+    trend = await kpi_service.trend_matrix(s, scope=scope, when=p0, client_id=cid)
+    return kpi_service.format_report_text(scope, *trend.periods[-1], trend.current(), trend=trend)
+
+
+# -----------------------------
+# اندازه‌گیری
+# -----------------------------
+class StatementProbe:
+    """شمارش دستورات و نگهداری دستورات SELECT یک فراخوانی برای EXPLAIN."""
+
+    def __init__(self, engine) -> None:
+        self.engine = engine.sync_engine
+        self.count = 0
+        self.capture = False
+        self.selects: List[tuple] = []
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        if self.capture and not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.selects.append((statement, parameters))
+
+    def close(self) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _pg_scanned(plan: dict) -> int:
+    rows = 0
+    if "Scan" in plan.get("Node Type", ""):
+        rows += int(plan.get("Actual Rows", 0) * plan.get("Actual Loops", 1))
+        rows += int(plan.get("Rows Removed by Filter", 0) * plan.get("Actual Loops", 1))
+    for child in plan.get("Plans", ()):
+        rows += _pg_scanned(child)
+    return rows
+
+
+async def _explain(engine, selects: List[tuple]) -> dict:
+    dialect = engine.dialect.name
+    out: dict = {"rows_scanned": None, "full_scans": None}
+    async with engine.connect() as conn:
+        if dialect == "postgresql":
+            total = 0
+            for stmt, params in selects:
+                res = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, FORMAT JSON) {stmt}", params)
+                plan = res.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                total += _pg_scanned(plan[0]["Plan"])
+            out["rows_scanned"] = total
+        elif dialect == "sqlite":
+            scans = set()
+            for stmt, params in selects:
+                res = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {stmt}", params)
+                for row in res.all():
+                    parts = row[-1].split()
+                    # SCAN CONSTANT ROW و پیمایش زیرکوئری‌های میانی (anon_N) پیمایش جدول نیستند
+                    if parts[0] == "SCAN" and "INDEX" not in parts and parts[1] != "CONSTANT" \
+                            and not parts[1].startswith("anon_"):
+                        scans.add(parts[1])
+            out["full_scans"] = sorted(scans)
+        await conn.rollback()
+    return out
+
+
+def percentile(values: List[float], p: float) -> float:
+    """nearest-rank."""
+    s = sorted(values)
+    return s[max(0, math.ceil(p / 100 * len(s)) - 1)]
+
+
+async def run_case(name: str, fn: Case, engine, Session, probe: StatementProbe, ctx: Context, iterations: int) -> dict:
+    async with Session() as session:     # گرم کردن + ضبط دستورات برای EXPLAIN
+        probe.capture, probe.selects, probe.count = True, [], 0
+        await fn(session, ctx)
+        probe.capture = False
+        queries = probe.count
+    work = await _explain(engine, probe.selects)
+
+    times = []
+    for _ in range(iterations):
+        async with Session() as session:
+            t0 = time.perf_counter()
+            await fn(session, ctx)
+            times.append(time.perf_counter() - t0)
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(times, 50) * 1000, 3),
+        "p95_ms": round(percentile(times, 95) * 1000, 3),
+        "p99_ms": round(percentile(times, 99) * 1000, 3),
+        "mean_ms": round(sum(times) / len(times) * 1000, 3),
+        "queries": queries,
+        **work,
+    }
+
+
+async def _context(Session, seed: int) -> Context:
+    rnd = random.Random(seed)
+    async with Session() as s:
+        client_ids = list((await s.execute(select(Client.id))).scalars())
+        staff_ids = list((await s.execute(select(User.id).where(User.role == ROLE_STAFF))).scalars())
+        if not client_ids or not staff_ids:
+            raise SystemExit("❌ دیتابیس خالی است؛ ابتدا python -m benchmarks.dataset را اجرا کنید.")
+        hot_client = (await s.execute(
+            select(Activity.client_id).group_by(Activity.client_id).order_by(func.count().desc()).limit(1)
+        )).scalar() or client_ids[0]
+        hot_staff = (await s.execute(
+            select(Client.assigned_staff_id).where(Client.assigned_staff_id.is_not(None))
+            .group_by(Client.assigned_staff_id).order_by(func.count().desc()).limit(1)
+        )).scalar() or staff_ids[0]
+        tg_ids = list((await s.execute(select(Client.telegram_id).where(Client.telegram_id.is_not(None)).limit(5000))).scalars())
+        kpi = (await s.execute(
+            select(KPIRecord.scope, KPIRecord.client_id, KPIRecord.period_start, KPIRecord.period_end)
+            .where(KPIRecord.client_id == hot_client).limit(1)
+        )).first() or ("weekly", hot_client, *crud.get_week_bounds(date.today()))
+    return Context(
+        rnd=rnd, now=datetime.utcnow(), client_ids=rnd.sample(client_ids, min(1000, len(client_ids))),
+        hot_client=hot_client, staff_ids=staff_ids, hot_staff=hot_staff,
+        client_tg_ids=tg_ids or [0], kpi_period=tuple(kpi),
+    )
+
+
+async def _dataset_counts(Session) -> dict:
+    async with Session() as s:
+        return {
+            m.__tablename__: (await s.execute(select(func.count()).select_from(m))).scalar()
+            for m in (User, Client, Activity, Sale, Feedback, KPIRecord)
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_compare(results: dict, before: dict) -> None:
+    print(f"\n{'case':<38} {'p50 before':>11} {'p50 now':>9} {'Δ':>8}   queries")
+    for name, r in results.items():
+        b = before.get("cases", {}).get(name)
+        if not b:
+            continue
+        delta = (r["p50_ms"] - b["p50_ms"]) / b["p50_ms"] * 100 if b["p50_ms"] else 0.0
+        q = f"{b['queries']} → {r['queries']}" if b["queries"] != r["queries"] else f"{r['queries']}"
+        print(f"{name:<38} {b['p50_ms']:>11.2f} {r['p50_ms']:>9.2f} {delta:>+7.0f}%   {q}")
+
+
+async def main(url: str, iterations: int, only: Optional[str], seed: int, out: Optional[str],
+               compare: Optional[str]) -> None:
+    engine = build_engine(url, "auto")
+    Session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    ctx = await _context(Session, seed)
+    counts = await _dataset_counts(Session)
+    probe = StatementProbe(engine)
+    print(f"{url}  {counts}")
+    print(f"{'case':<38} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7}  scanned")
+
+    results = {}
+    for name, (fn, weight) in CASES.items():
+        if only and only not in name:
+            continue
+        r = await run_case(name, fn, engine, Session, probe, ctx, max(3, int(iterations * weight)))
+        results[name] = r
+        scanned = r["rows_scanned"] if r["rows_scanned"] is not None else ",".join(r["full_scans"] or []) or "-"
+        print(f"{name:<38} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['queries']:>7}  {scanned}")
+    probe.close()
+    await engine.dispose()
+
+    doc = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "dialect": engine.dialect.name,
+            "dataset": counts,
+            "iterations": iterations,
+            "seed": seed,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+        },
+        "cases": results,
+    }
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, indent=2)
+        print(f"\n📝 {out}")
+    if compare:
+        with open(compare, encoding="utf-8") as f:
+            _print_compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default=DEFAULT_URL)
+    p.add_argument("--iterations", type=int, default=50)
+    p.add_argument("--only", help="فقط موردهایی که نامشان شامل این رشته است")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", help="مسیر فایل JSON نتیجه")
+    p.add_argument("--compare", help="فایل JSON اجرای قبلی برای مقایسه")
+    args = p.parse_args()
+    asyncio.run(main(args.url, args.iterations, args.only, args.seed, args.out, args.compare))
@@ -0,0 +1,94 @@
+"""
+بررسی پلان اجرای کوئری‌های بازه‌ای و «N مورد اخیر» در crud با EXPLAIN.
+اگر روی جداول داغ (activities/sales/feedbacks/rollups) اسکن کامل ببیند، خطا می‌دهد.
+
+    python -m benchmarks.explain_indexes
+    DB_URL=postgresql+asyncpg://... python -m benchmarks.explain_indexes --url "$DB_URL"
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import crud, migrations
+
+HOT_TABLES = ("activities", "sales", "feedbacks", "client_daily_rollups", "staff_daily_rollups")
+
+
+def _full_scans(dialect: str, plan_lines: list[str]) -> list[str]:
+    bad = []
+    for line in plan_lines:
+        for t in HOT_TABLES:
+            if dialect == "sqlite" and re.search(rf"\bSCAN {t}\b", line) and "USING" not in line:
+                bad.append(line)
+            if dialect == "postgresql" and f"Seq Scan on {t}" in line:
+                bad.append(line)
+    return bad
+
+
+async def run(url: str) -> int:
+    engine = create_async_engine(url, echo=False, future=True)
+    await migrations.upgrade(engine)
+    Session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    dialect = engine.dialect.name
+
+    captured: list[tuple[str, object]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    end_dt = datetime.utcnow()
+    start_dt = end_dt - timedelta(days=7)
+    checks = {
+        "count_activities_in_range": lambda s: crud.count_activities_in_range(s, 1, start_dt, end_dt),
+        "count_activities_in_range_by_staff": lambda s: crud.count_activities_in_range_by_staff(s, 1, start_dt, end_dt),
+        "last_activity_ts": lambda s: crud.last_activity_ts(s, 1),
+        "last_activity_ts_for_staff": lambda s: crud.last_activity_ts_for_staff(s, 1),
+        "list_recent_activities_for_client": lambda s: crud.list_recent_activities_for_client(s, 1),
+        "list_recent_activities_for_staff": lambda s: crud.list_recent_activities_for_staff(s, 1),
+        "list_recent_feedback_for_client": lambda s: crud.list_recent_feedback_for_client(s, 1),
+        "sum_sales_in_range": lambda s: crud.sum_sales_in_range(s, 1, start_dt, end_dt),
+        "sum_sales_in_range_for_staff": lambda s: crud.sum_sales_in_range_for_staff(s, 1, start_dt, end_dt),
+        "list_recent_sales_for_client": lambda s: crud.list_recent_sales_for_client(s, 1),
+    }
+
+    failures = 0
+    async with Session() as session:
+        for name, call in checks.items():
+            captured.clear()
+            event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+            try:
+                await call(session)
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+            async with engine.connect() as conn:
+                if dialect == "postgresql":
+                    await conn.exec_driver_sql("SET enable_seqscan = off")
+                prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+                plan = []
+                for statement, params in captured:
+                    res = await conn.exec_driver_sql(prefix + statement, params)
+                    plan += [str(r[-1]) for r in res.all()]
+
+            bad = _full_scans(dialect, plan)
+            failures += bool(bad)
+            print(f"{'❌' if bad else '✅'} {name}")
+            for line in (bad or plan):
+                print(f"     {line}")
+
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default="sqlite+aiosqlite://")
+    args = p.parse_args()
+    raise SystemExit(asyncio.run(run(args.url)))
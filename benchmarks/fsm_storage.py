@@ -0,0 +1,75 @@
+"""
+بنچمارک ذخیره‌ساز FSM (db.fsm_storage.SQLStorage): کاربران همزمان یک فرم ۱۰ مرحله‌ای
+(set_state + update_data در هر مرحله) را طی می‌کنند؛ تعداد تغییرات در برابر ردیف‌های نوشته‌شده،
+تعداد کوئری، حافظه کش، ماندگاری پس از ری‌استارت و انقضای TTL گزارش می‌شود.
+
+    python -m benchmarks.fsm_storage
+    python -m benchmarks.fsm_storage --users 2000 --flush-ms 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import select, func
+
+from db.fsm_storage import SQLStorage
+from db.models import FSMStateRecord
+from benchmarks.common import make_engine, QueryCounter, timer
+
+STEPS = 10
+
+
+async def _flow(storage: SQLStorage, user_id: int, step_gap: float) -> None:
+    ctx = FSMContext(storage, StorageKey(bot_id=1, chat_id=user_id, user_id=user_id))
+    for step in range(STEPS):
+        await ctx.set_state(f"AddClient:step{step}")
+        await ctx.update_data(**{f"field{step}": f"مقدار {step} برای کاربر {user_id}"})
+        await asyncio.sleep(step_gap)
+
+
+async def run(users: int, flush_ms: int, step_ms: float) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "fsm.sqlite3")
+    engine, Session = await make_engine(f"sqlite+aiosqlite:///{path}")
+    counter = QueryCounter(engine)
+
+    storage = SQLStorage(Session, flush_ms=flush_ms)
+    with counter.track(), timer() as t:
+        await asyncio.gather(*(_flow(storage, u, step_ms / 1000) for u in range(1, users + 1)))
+        stats_before_close = storage.stats()
+        await storage.close()
+    s = storage.stats()
+    print(f"{users} users × {STEPS} steps in {t['elapsed']:.2f}s (flush {flush_ms} ms)")
+    print(f"  changes={s['changes']} rows_written={s['rows_written']} flushes={s['flushes']} "
+          f"sql_statements={counter.count}")
+    print(f"  cache: {stats_before_close['cached']} entries, ~{stats_before_close['memory_kb']} KB")
+
+    # ری‌استارت: نمونه جدید همان وضعیت را از DB می‌خواند
+    restarted = SQLStorage(Session, flush_ms=flush_ms)
+    key = StorageKey(bot_id=1, chat_id=1, user_id=1)
+    state, data = await restarted.get_state(key), await restarted.get_data(key)
+    assert state == f"AddClient:step{STEPS - 1}" and len(data) == STEPS, (state, data)
+    print(f"  after restart: state={state!r}, {len(data)} fields")
+
+    # TTL: وضعیت‌های قدیمی منقضی و از DB پاک می‌شوند
+    expiring = SQLStorage(Session, flush_ms=flush_ms, state_ttl=0)
+    await asyncio.sleep(0.01)
+    assert await expiring.get_state(key) is None
+    await expiring.sweep()
+    async with Session() as session:
+        left = await session.scalar(select(func.count()).select_from(FSMStateRecord))
+    print(f"  ttl=0 sweep: expired={expiring.expired}, rows left={left}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--users", type=int, default=500)
+    p.add_argument("--flush-ms", type=int, default=1000)
+    p.add_argument("--step-ms", type=float, default=300)
+    args = p.parse_args()
+    asyncio.run(run(args.users, args.flush_ms, args.step_ms))
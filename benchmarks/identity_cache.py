@@ -0,0 +1,81 @@
+"""
+بنچمارک تشخیص نقش: تعداد کوئری و تأخیر resolve_role برای جریانی از آپدیت‌ها
+با و بدون کش هویت (db.identity). ۱۰٪ آپدیت‌ها از کاربران ناشناس است (کش منفی).
+قبل از اندازه‌گیری بررسی می‌شود که rollback session بارگذار، شیء کش‌شده را خراب نکند.
+
+    python -m benchmarks.identity_cache
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+
+from db import crud, identity
+from services.auth import resolve_role
+from utils.constants import ROLE_STAFF
+from benchmarks.common import make_engine, QueryCounter, timer
+
+
+async def _replay(Session, tg_ids, counter: QueryCounter):
+    with counter.track(), timer() as t:
+        for tg in tg_ids:
+            async with Session() as session:
+                await resolve_role(session, tg)
+    return counter.count, t["elapsed"]
+
+
+async def check_rollback_safety(Session, tg_id: int) -> None:
+    """
+    شیء کش‌شده نباید به session بارگذار وابسته باشد: بعد از rollback (یا تغییر بدون commit) آن session،
+    hit بعدی باید بدون SQL و MissingGreenlet همان مقادیر DB را بدهد.
+    """
+    identity.cache.invalidate("user", tg_id)
+    async with Session() as session:
+        u = await crud.get_user_by_telegram_id(session, tg_id)
+        expected = (u.id, u.role, u.status)
+        u.name = "dirty"
+        await session.rollback()
+    async with Session() as session:
+        hits = identity.cache.hits
+        u = await crud.get_user_by_telegram_id(session, tg_id)
+        assert identity.cache.hits == hits + 1, "expected a cache hit"
+        assert (u.id, u.role, u.status) == expected, (u.id, u.role, u.status)
+        assert u.name != "dirty"
+    print("rollback safety: ok")
+
+
+async def run(users: int, updates: int) -> None:
+    engine, Session = await make_engine()
+    async with Session() as session:
+        for i in range(users):
+            await crud.create_user(session, telegram_id=1000 + i, role=ROLE_STAFF, name=f"u{i}")
+    await check_rollback_safety(Session, 1000)
+
+    rnd = random.Random(7)
+    stream = [
+        1000 + rnd.randrange(users) if rnd.random() < 0.9 else 10**6 + rnd.randrange(users)
+        for _ in range(updates)
+    ]
+    counter = QueryCounter(engine)
+
+    identity.cache.max_size = 0
+    q_off, t_off = await _replay(Session, stream, counter)
+    identity.cache.max_size = users * 4
+    identity.cache.clear()
+    identity.cache.hits = identity.cache.misses = 0
+    q_on, t_on = await _replay(Session, stream, counter)
+
+    print(f"{'mode':>6} | {'queries':>8} {'ms/update':>9}")
+    print(f"{'off':>6} | {q_off:>8} {t_off / updates * 1000:>9.3f}")
+    print(f"{'cache':>6} | {q_on:>8} {t_on / updates * 1000:>9.3f}")
+    print("stats:", identity.cache.stats())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--users", type=int, default=200)
+    p.add_argument("--updates", type=int, default=5000)
+    args = p.parse_args()
+    asyncio.run(run(args.users, args.updates))
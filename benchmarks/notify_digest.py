@@ -0,0 +1,91 @@
+"""
+بنچمارک ادغام اعلان‌ها (utils.notify.Coalescer): چند نیرو پشت‌سرهم فعالیت/فروش ثبت می‌کنند؛
+تعداد پیام‌های ارسالی به تاپیک، زمان تا تحویل آخرین اعلان و رعایت سقف ۴۰۹۶ کاراکتر
+برای پنجره صفر (ارسال فوری) در برابر پنجره ادغام گزارش می‌شود.
+
+    python -m benchmarks.notify_digest
+    python -m benchmarks.notify_digest --staff 5 --events 40 --window-ms 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import List
+
+from utils.notify import Coalescer, NotifyDispatcher, TELEGRAM_TEXT_LIMIT, staff_activity_text, sale_text
+
+CHAT_ID = -100123
+TOPIC = 7
+# ساعت بنچمارک ۳۰ برابر سریع‌تر: سقف ۲۰ پیام در دقیقه → ۱۰ پیام در ثانیه
+TIME_SCALE = 30
+
+
+class CountingBot:
+    def __init__(self, rtt_s: float) -> None:
+        self.rtt_s = rtt_s
+        self.messages: List[str] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        await asyncio.sleep(self.rtt_s)
+        assert len(text) <= TELEGRAM_TEXT_LIMIT, len(text)
+        self.messages.append(text)
+
+
+def _event(staff: str, client: str, i: int) -> tuple:
+    ts = datetime.utcnow().isoformat()
+    if i % 5 == 4:
+        amount = random.randint(1, 90) * 1_000_000
+        text = sale_text(client_name=client, amount=amount, ts=ts, source="اینستاگرام", actor_name=staff)
+        line = f"💰 {amount:,.0f} · اینستاگرام · {ts[11:16]}"
+    else:
+        goal = "معرفی محصول جدید و پیگیری " * random.randint(0, 3)
+        text = staff_activity_text(client_name=client, staff_name=staff, activity_type="post",
+                                   platform="instagram", ts=ts, goal=goal or None)
+        line = f"📝 post / instagram · {ts[11:16]}" + (f" · {goal}" if goal else "")
+    return text, {"group": staff, "item": client, "line": line}
+
+
+async def run(window_ms: int, staff: int, events: int, gap_ms: float, rtt_ms: float) -> tuple:
+    random.seed(7)
+    bot = CountingBot(rtt_ms / 1000)
+    d = NotifyDispatcher(per_minute=20 * TIME_SCALE, burst=3, max_retries=0)
+    await d.start(bot)
+    c = Coalescer(d, window_ms=window_ms)
+    loop = asyncio.get_running_loop()
+    futures = []
+    t0 = time.perf_counter()
+    for i in range(events):
+        for s in range(staff):
+            text, meta = _event(f"نیرو {s + 1}", f"مشتری {(i + s) % 4 + 1}", i)
+            fut = loop.create_future()
+            c.submit(CHAT_ID, text, TOPIC, meta=meta, done=fut)
+            futures.append(fut)
+        await asyncio.sleep(gap_ms / 1000)
+    results = await asyncio.gather(*futures)
+    elapsed = time.perf_counter() - t0
+    await d.stop()
+    assert all(results)
+    return len(futures), len(bot.messages), max(map(len, bot.messages)), elapsed
+
+
+async def main(staff: int, events: int, window_ms: int, gap_ms: float, rtt_ms: float) -> None:
+    print(f"{staff} staff × {events} events, one round every {gap_ms:.0f} ms; "
+          f"topic limit 20 msg/min (burst 3, clock ×{TIME_SCALE}), rtt {rtt_ms:.0f} ms")
+    print(f"{'window':>10} | {'events':>6} {'messages':>8} {'longest':>8} {'all delivered':>14}")
+    for w in (0, window_ms):
+        n, msgs, longest, elapsed = await run(w, staff, events, gap_ms, rtt_ms)
+        print(f"{w:>7} ms | {n:>6} {msgs:>8} {longest:>8} {elapsed:>12.1f} s")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--staff", type=int, default=3)
+    p.add_argument("--events", type=int, default=10)
+    p.add_argument("--window-ms", type=int, default=2000)
+    p.add_argument("--gap-ms", type=float, default=100)
+    p.add_argument("--rtt-ms", type=float, default=40)
+    args = p.parse_args()
+    asyncio.run(main(args.staff, args.events, args.window_ms, args.gap_ms, args.rtt_ms))
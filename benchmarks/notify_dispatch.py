@@ -0,0 +1,119 @@
+"""
+بنچمارک ارسال اعلان‌ها (utils.notify): ارسال مستقیم داخل هندلر در برابر NotifyDispatcher.
+
+یک Bot جعلی محدودیت flood تلگرام را شبیه‌سازی می‌کند (limit پیام در هر ثانیه برای هر چت؛ مازاد
+TelegramRetryAfter می‌گیرد) و درصدی از درخواست‌ها خطای شبکه می‌دهند. گزارش: تأخیر هندلر
+(زمانی که کاربر منتظر تأیید می‌ماند)، پیام‌های رسیده، گم‌شده، throttled و تلاش‌های مجدد.
+
+    python -m benchmarks.notify_dispatch
+    python -m benchmarks.notify_dispatch --messages 200 --limit 20 --error-rate 0.1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from utils.notify import NotifyDispatcher
+from benchmarks.common import timer
+
+CHAT_ID = -100123
+
+
+class FakeBot:
+    """send_message با rtt، سقف limit پیام در ثانیه برای هر چت و خطای شبکه تصادفی."""
+
+    def __init__(self, limit: int, rtt_s: float, error_rate: float) -> None:
+        self.limit = limit
+        self.rtt_s = rtt_s
+        self.error_rate = error_rate
+        self.window: Dict[int, List[float]] = defaultdict(list)
+        self.delivered: List[str] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        await asyncio.sleep(self.rtt_s)
+        method = SendMessage(chat_id=chat_id, text=text, **kwargs)
+        if random.random() < self.error_rate:
+            raise TelegramNetworkError(method, "simulated network error")
+        now = time.monotonic()
+        recent = [t for t in self.window[chat_id] if now - t < 1.0]
+        if len(recent) >= self.limit:
+            self.window[chat_id] = recent
+            raise TelegramRetryAfter(method, "Flood control exceeded", retry_after=1)
+        recent.append(now)
+        self.window[chat_id] = recent
+        self.delivered.append(text)
+
+
+async def run_inline(bot: FakeBot, messages: int, gap_s: float) -> List[float]:
+    """رفتار قبلی: هندلر منتظر send_message می‌ماند و هر خطایی قورت داده می‌شود."""
+    lat = []
+    for i in range(messages):
+        t0 = time.perf_counter()
+        try:
+            await bot.send_message(chat_id=CHAT_ID, text=f"inline {i}", message_thread_id=7)
+        except Exception:
+            pass
+        lat.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(gap_s)
+    return lat
+
+
+async def run_dispatcher(bot: FakeBot, messages: int, gap_s: float, per_minute: int) -> tuple:
+    d = NotifyDispatcher(per_minute=per_minute, burst=3, max_retries=8, backoff_ms=50, backoff_max_s=2)
+    await d.start(bot)
+    lat = []
+    for i in range(messages):
+        t0 = time.perf_counter()
+        d.submit(CHAT_ID, f"queued {i}", 7)
+        lat.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(gap_s)
+    with timer() as t:
+        await d.stop(timeout=120)
+    return lat, d.stats(), t["elapsed"]
+
+
+def _row(name: str, lat: List[float], delivered: int, total: int, extra: str = "") -> str:
+    lat = sorted(lat)
+    p50, p99 = statistics.median(lat), lat[max(0, int(len(lat) * 0.99) - 1)]
+    return (f"{name:>10} | handler p50 {p50:8.3f} ms  p99 {p99:8.3f} ms | "
+            f"delivered {delivered}/{total} lost {total - delivered}{extra}")
+
+
+async def main(messages: int, limit: int, rtt_ms: float, error_rate: float, gap_ms: float) -> None:
+    random.seed(1)
+    logging.getLogger("utils.notify").setLevel(logging.ERROR)
+    rtt_s, gap_s = rtt_ms / 1000, gap_ms / 1000
+    print(f"{messages} notifications, flood limit {limit}/s per chat, rtt {rtt_ms:.0f} ms, "
+          f"network errors {error_rate:.0%}, one every {gap_ms:.0f} ms")
+
+    bot = FakeBot(limit, rtt_s, error_rate)
+    lat = await run_inline(bot, messages, gap_s)
+    print(_row("inline", lat, len(bot.delivered), messages))
+
+    # نرخ dispatcher کمی زیر سقف و یک بار هم عمداً بالاتر از سقف تا RetryAfter رعایت شود
+    for label, per_minute in (("bucket", int(limit * 60 * 0.9)), ("overdrive", limit * 60 * 3)):
+        bot = FakeBot(limit, rtt_s, error_rate)
+        lat, s, drain = await run_dispatcher(bot, messages, gap_s, per_minute)
+        assert len(bot.delivered) == len(set(bot.delivered))
+        print(_row(label, lat, len(bot.delivered), messages,
+                   f" | throttled {s['throttled']} retried {s['retried']} drain {drain:.1f}s"))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--messages", type=int, default=120)
+    p.add_argument("--limit", type=int, default=10)
+    p.add_argument("--rtt-ms", type=float, default=60)
+    p.add_argument("--error-rate", type=float, default=0.05)
+    p.add_argument("--gap-ms", type=float, default=5)
+    args = p.parse_args()
+    asyncio.run(main(args.messages, args.limit, args.rtt_ms, args.error_rate, args.gap_ms))
@@ -0,0 +1,77 @@
+"""
+بنچمارک کیبوردهای انتخاب مشتری: list_all_clients (ORM کامل با JSON/متن)
+در برابر list_client_options (projection سه‌ستونی با __slots__).
+حافظه با tracemalloc (اوج تخصیص هنگام بارگذاری + ساخت کیبورد) اندازه‌گیری می‌شود.
+
+    python -m benchmarks.picker_projection
+    python -m benchmarks.picker_projection --clients 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from db import crud
+from db.models import Client
+from keyboards.admin import assign_clients_kb
+from benchmarks.common import make_engine
+
+
+async def _seed(Session, n: int) -> None:
+    rows = [
+        dict(
+            business_name=f"کسب‌وکار {i}",
+            industry="خرده‌فروشی",
+            platforms={"list": ["instagram", "telegram", "website"]},
+            contact_info={"phone": "09120000000", "email": f"c{i}@example.com"},
+            notes="یادداشت " * 40,
+            status="ACTIVE",
+        )
+        for i in range(n)
+    ]
+    async with Session() as session:
+        await session.execute(insert(Client), rows)
+        await session.commit()
+
+
+async def _measure(Session, loader, rounds: int):
+    lat = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        async with Session() as session:
+            clients = await loader(session)
+        assign_clients_kb(clients)
+        lat.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    async with Session() as session:
+        clients = await loader(session)
+    assign_clients_kb(clients)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(lat), peak / 1024 / 1024
+
+
+async def run(n: int, rounds: int) -> None:
+    engine, Session = await make_engine()
+    await _seed(Session, n)
+
+    print(f"{n} clients")
+    print(f"{'loader':>20} | {'p50 ms':>8} {'peak MB':>8}")
+    for name, loader in (("list_all_clients", crud.list_all_clients), ("list_client_options", crud.list_client_options)):
+        p50, peak = await _measure(Session, loader, rounds)
+        print(f"{name:>20} | {p50:>8.1f} {peak:>8.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--clients", type=int, default=5000)
+    p.add_argument("--rounds", type=int, default=10)
+    args = p.parse_args()
+    asyncio.run(run(args.clients, args.rounds))
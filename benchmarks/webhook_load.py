@@ -0,0 +1,197 @@
+"""
+آزمون بار محلی: تأخیر سرتاسری (ورود آپدیت → پایان هندلر) در حالت polling و webhook.
+
+- polling: یک Bot API جعلی (aiohttp) که getUpdates را به صورت long-poll از صف پاسخ می‌دهد.
+- webhook: آپدیت‌ها مستقیم با هدر secret به services.webhook POST می‌شوند؛ زمان پاسخ (ack) هم ثبت می‌شود.
+آپدیت‌ها به صورت رگباری (burst) تزریق می‌شوند و هندلر work_ms میلی‌ثانیه کار شبیه‌سازی‌شده انجام می‌دهد.
+rtt_ms فاصله شبکه تا سرورهای تلگرام را شبیه‌سازی می‌کند: در polling نیمی برای رفت درخواست getUpdates
+و نیمی برای برگشت پاسخ، در webhook نیمی برای رسیدن هر POST.
+
+    python -m benchmarks.webhook_load
+    python -m benchmarks.webhook_load --bursts 20 --burst-size 100 --work-ms 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from aiohttp import ClientSession, TCPConnector, web
+from aiogram import Bot, Dispatcher, Router, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from services.webhook import start_webhook_server
+
+TOKEN = "123456:TEST-load-harness-token"
+SECRET = "load-test-secret"
+API_PORT = 18081
+HOOK_PORT = 18082
+HOOK_PATH = "/tg/webhook"
+
+
+def _update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1000 + update_id % 50, "type": "private"},
+            "from": {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "load"},
+            "text": f"ping {update_id}",
+        },
+    }
+
+
+def _dispatcher(done: Dict[int, float], work_ms: float) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def _handler(msg: types.Message):
+        await asyncio.sleep(work_ms / 1000)
+        done[msg.message_id] = time.perf_counter()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+class FakeBotAPI:
+    """حداقل Bot API لازم برای start_polling: getMe، deleteWebhook و getUpdates (long-poll)."""
+
+    def __init__(self, rtt_s: float = 0.0) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.rtt_s = rtt_s
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}})
+        if method == "getUpdates":
+            await asyncio.sleep(self.rtt_s / 2)
+            form = await request.post()
+            timeout = float(form.get("timeout") or 0)
+            batch: List[dict] = []
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout or 0.01))
+            except asyncio.TimeoutError:
+                pass
+            while not self.queue.empty() and len(batch) < 100:
+                batch.append(self.queue.get_nowait())
+            await asyncio.sleep(self.rtt_s / 2)
+            return web.json_response({"ok": True, "result": batch})
+        return web.json_response({"ok": True, "result": True})
+
+    async def start(self) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", API_PORT).start()
+        return runner
+
+
+async def _bursts(send, bursts: int, size: int, gap_s: float) -> Dict[int, float]:
+    sent: Dict[int, float] = {}
+    uid = 1
+    for _ in range(bursts):
+        for _ in range(size):
+            sent[uid] = time.perf_counter()
+            await send(uid)
+            uid += 1
+        await asyncio.sleep(gap_s)
+    return sent
+
+
+async def _wait_done(done: dict, total: int, timeout: float = 60.0) -> None:
+    t0 = time.perf_counter()
+    while len(done) < total and time.perf_counter() - t0 < timeout:
+        await asyncio.sleep(0.01)
+
+
+def _stats(sent: dict, done: dict) -> tuple:
+    lat = sorted((done[u] - sent[u]) * 1000 for u in sent if u in done)
+    if not lat:
+        return 0.0, 0.0, 0.0, 0
+    return statistics.median(lat), lat[int(len(lat) * 0.95) - 1], lat[-1], len(lat)
+
+
+async def run_polling(bursts: int, size: int, gap_s: float, work_ms: float, rtt_s: float) -> tuple:
+    api = FakeBotAPI(rtt_s)
+    runner = await api.start()
+    done: Dict[int, float] = {}
+    dp = _dispatcher(done, work_ms)
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{API_PORT}")))
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+    await asyncio.sleep(0.3)
+
+    async def send(uid: int) -> None:
+        api.queue.put_nowait(_update(uid))
+
+    sent = await _bursts(send, bursts, size, gap_s)
+    await _wait_done(done, len(sent))
+    await dp.stop_polling()
+    await polling
+    await runner.cleanup()
+    return _stats(sent, done)
+
+
+async def run_webhook(bursts: int, size: int, gap_s: float, work_ms: float, rtt_s: float, concurrency: int) -> tuple:
+    done: Dict[int, float] = {}
+    dp = _dispatcher(done, work_ms)
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{API_PORT}")))
+    runner = await start_webhook_server(
+        dp, bot, path=HOOK_PATH, host="127.0.0.1", port=HOOK_PORT,
+        secret_token=SECRET, max_concurrency=concurrency,
+    )
+    acks: List[float] = []
+    url = f"http://127.0.0.1:{HOOK_PORT}{HOOK_PATH}"
+
+    # تلگرام به طور پیش‌فرض حداکثر ۴۰ اتصال همزمان به webhook باز می‌کند (max_connections)
+    async with ClientSession(connector=TCPConnector(limit=40)) as http:
+        # درخواست بدون secret باید رد شود
+        async with http.post(url, json=_update(0)) as resp:
+            assert resp.status == 401, resp.status
+
+        async def post(uid: int) -> None:
+            await asyncio.sleep(rtt_s / 2)
+            t0 = time.perf_counter()
+            async with http.post(url, json=_update(uid), headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as resp:
+                assert resp.status == 200
+            acks.append((time.perf_counter() - t0) * 1000)
+
+        tasks: List[asyncio.Task] = []
+
+        async def send(uid: int) -> None:
+            tasks.append(asyncio.create_task(post(uid)))
+
+        sent = await _bursts(send, bursts, size, gap_s)
+        await asyncio.gather(*tasks)
+        await _wait_done(done, len(sent))
+    await runner.cleanup()
+    acks.sort()
+    return _stats(sent, done), (statistics.median(acks), acks[int(len(acks) * 0.95) - 1])
+
+
+async def main(bursts: int, size: int, gap_ms: float, work_ms: float, rtt_ms: float, concurrency: int) -> None:
+    gap_s, rtt_s = gap_ms / 1000, rtt_ms / 1000
+    print(f"{bursts} bursts × {size} updates, gap {gap_ms:.0f} ms, handler {work_ms:.0f} ms, rtt {rtt_ms:.0f} ms")
+    print(f"{'mode':>8} | {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} {'done':>6}")
+    p50, p95, mx, n = await run_polling(bursts, size, gap_s, work_ms, rtt_s)
+    print(f"{'polling':>8} | {p50:>7.1f} {p95:>7.1f} {mx:>7.1f} {n:>6}")
+    (p50, p95, mx, n), (a50, a95) = await run_webhook(bursts, size, gap_s, work_ms, rtt_s, concurrency)
+    print(f"{'webhook':>8} | {p50:>7.1f} {p95:>7.1f} {mx:>7.1f} {n:>6}   ack p50 {a50:.1f} / p95 {a95:.1f} ms")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--bursts", type=int, default=10)
+    p.add_argument("--burst-size", type=int, default=50)
+    p.add_argument("--gap-ms", type=float, default=200)
+    p.add_argument("--work-ms", type=float, default=10)
+    p.add_argument("--rtt-ms", type=float, default=80)
+    p.add_argument("--concurrency", type=int, default=32)
+    args = p.parse_args()
+    asyncio.run(main(args.bursts, args.burst_size, args.gap_ms, args.work_ms, args.rtt_ms, args.concurrency))
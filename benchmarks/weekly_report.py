@@ -0,0 +1,91 @@
+"""
+بنچمارک گزارش هفتگی: مقایسه حلقه قدیمی (۵ کوئری برای هر مشتری)
+با crud.list_client_summaries. تعداد کوئری باید با رشد مشتری‌ها ثابت بماند.
+ستون snapshot: خواندن گزارش ذخیره‌شده توسط زمان‌بند (services.reports.publish_weekly) برای دکمه گزارش.
+
+    python -m benchmarks.weekly_report
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from db import crud, rollups
+from services import reports
+from db.models import User, Client, ClientKPI, Activity, Feedback, Sale
+from utils.constants import ROLE_STAFF
+from benchmarks.common import make_engine, QueryCounter, timer
+
+
+async def _seed(Session, n_clients: int) -> None:
+    rnd = random.Random(n_clients)
+    now = datetime.utcnow()
+    async with Session() as session:
+        staff = [User(telegram_id=10_000 + i, role=ROLE_STAFF, name=f"staff{i}") for i in range(5)]
+        session.add_all(staff)
+        await session.flush()
+        for i in range(n_clients):
+            c = Client(business_name=f"client{i}", assigned_staff_id=staff[i % 5].id)
+            session.add(c)
+            await session.flush()
+            session.add(ClientKPI(client_id=c.id, target_per_week=rnd.randint(0, 10)))
+            for _ in range(rnd.randint(0, 8)):
+                ts = now - timedelta(days=rnd.uniform(0, 14))
+                session.add(Activity(client_id=c.id, staff_id=c.assigned_staff_id, activity_type="پست", ts=ts))
+                session.add(Sale(client_id=c.id, ts=ts, amount=rnd.uniform(0, 1000)))
+            for _ in range(rnd.randint(0, 3)):
+                session.add(Feedback(client_id=c.id, score=rnd.randint(1, 5)))
+        await session.commit()
+        await rollups.rebuild(session)
+        await session.commit()
+
+
+async def _legacy(session, start_dt, end_dt):
+    out = []
+    for c in await crud.list_all_clients(session):
+        kpi = await crud.get_client_kpi(session, c.id)
+        out.append((
+            c.id,
+            kpi.target_per_week if kpi else 0,
+            await crud.count_activities_in_range(session, c.id, start_dt, end_dt),
+            await crud.sum_sales_in_range(session, c.id, start_dt, end_dt),
+            await crud.avg_feedback_for_client(session, c.id),
+            await crud.last_activity_ts(session, c.id),
+        ))
+    return out
+
+
+async def run(sizes=(10, 100, 500)) -> None:
+    print(f"{'clients':>8} | {'legacy q':>9} {'legacy s':>9} | {'grouped q':>9} {'grouped s':>9} | "
+          f"{'snapshot q':>10} {'snapshot s':>10}")
+    for n in sizes:
+        engine, Session = await make_engine()
+        await _seed(Session, n)
+        counter = QueryCounter(engine)
+        end_dt = datetime.utcnow()
+        start_dt = end_dt - timedelta(days=7)
+
+        async with Session() as session:
+            with counter.track(), timer() as t_old:
+                legacy = await _legacy(session, start_dt, end_dt)
+            q_old = counter.count
+            with counter.track(), timer() as t_new:
+                rows = await crud.list_client_summaries(session, start_dt, end_dt)
+            q_new = counter.count
+            await reports.publish_weekly(session, end_dt)
+            await session.commit()
+            with counter.track(), timer() as t_snap:
+                snap = await crud.get_latest_report_snapshot(session, reports.WEEKLY)
+            q_snap = counter.count
+            assert snap is not None and snap.text.count("1️⃣") == n
+
+        assert [(r.client_id, r.target, r.acts, round(r.sales_sum, 2), r.last_ts) for r in rows] == \
+            [(x[0], x[1], x[2], round(x[3], 2), x[5]) for x in legacy]
+        print(f"{n:>8} | {q_old:>9} {t_old['elapsed']:>9.3f} | {q_new:>9} {t_new['elapsed']:>9.3f} | "
+              f"{q_snap:>10} {t_snap['elapsed']:>10.4f}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
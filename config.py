@@ -21,9 +21,93 @@ def _to_int_or_none(val: str):
 REPORTS_GROUP_ID = _to_int_or_none(os.getenv("REPORTS_GROUP_ID", ""))
 STAFF_TOPIC_ID   = _to_int_or_none(os.getenv("STAFF_TOPIC_ID", ""))
 CLIENT_TOPIC_ID  = _to_int_or_none(os.getenv("CLIENT_TOPIC_ID", ""))
+REPORT_TOPIC_ID  = _to_int_or_none(os.getenv("REPORT_TOPIC_ID", ""))  # گزارش هفتگی زمان‌بندی‌شده
 
 # آستانه هشدار فروش هفتگی (اختیاری؛ 0 یعنی غیرفعال)
 try:
     SALES_WARN_THRESHOLD = float(os.getenv("SALES_WARN_THRESHOLD", "0"))
 except Exception:
     SALES_WARN_THRESHOLD = 0.0
+
+# پروفایل موتور دیتابیس: auto | sqlite | postgres | default
+# auto یعنی انتخاب بر اساس DB_URL
+DB_PROFILE = os.getenv("DB_PROFILE", "auto").strip().lower()
+DB_POOL_SIZE = _to_int_or_none(os.getenv("DB_POOL_SIZE", "")) or 10
+DB_MAX_OVERFLOW = _to_int_or_none(os.getenv("DB_MAX_OVERFLOW", "")) or 20
+DB_STATEMENT_CACHE_SIZE = _to_int_or_none(os.getenv("DB_STATEMENT_CACHE_SIZE", "")) or 500
+SQLITE_BUSY_TIMEOUT_MS = _to_int_or_none(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "")) or 5000
+# بررسی کلید خارجی در SQLite (پیش‌فرض خاموش؛ دیتابیس‌های قدیمی ممکن است ارجاع یتیم داشته باشند)
+SQLITE_FOREIGN_KEYS = os.getenv("SQLITE_FOREIGN_KEYS", "0").strip().lower() in ("1", "true", "yes")
+
+# نویسنده دسته‌ای لاگ ممیزی (پس‌زمینه)
+AUDIT_QUEUE_MAX = _to_int_or_none(os.getenv("AUDIT_QUEUE_MAX", "")) or 10000
+AUDIT_BATCH_SIZE = _to_int_or_none(os.getenv("AUDIT_BATCH_SIZE", "")) or 100
+AUDIT_FLUSH_MS = _to_int_or_none(os.getenv("AUDIT_FLUSH_MS", "")) or 200
+# وقتی صف پر است: block (منتظر بماند) | drop (دور بریزد و شمارش کند)
+AUDIT_QUEUE_POLICY = os.getenv("AUDIT_QUEUE_POLICY", "block").strip().lower()
+
+# کش هویت telegram_id → User/Client (ثانیه)
+IDENTITY_CACHE_MAX = _to_int_or_none(os.getenv("IDENTITY_CACHE_MAX", "")) or 10000
+IDENTITY_CACHE_TTL = _to_int_or_none(os.getenv("IDENTITY_CACHE_TTL", "")) or 300
+IDENTITY_NEGATIVE_TTL = _to_int_or_none(os.getenv("IDENTITY_NEGATIVE_TTL", "")) or 30
+
+# حالت دریافت آپدیت: polling (پیش‌فرض) | webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# آدرس عمومی HTTPS که تلگرام به آن POST می‌کند (مثلاً https://bot.example.com)
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").strip()
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg/webhook").strip()
+# اگر خالی باشد در هر اجرا یک مقدار تصادفی ساخته می‌شود
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip()
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0").strip()
+WEBHOOK_PORT = _to_int_or_none(os.getenv("WEBHOOK_PORT", "")) or 8080
+WEBHOOK_MAX_CONCURRENCY = _to_int_or_none(os.getenv("WEBHOOK_MAX_CONCURRENCY", "")) or 32
+
+# ذخیره وضعیت FSM: sql (در دیتابیس با write-behind) | memory
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sql").strip().lower()
+FSM_FLUSH_MS = _to_int_or_none(os.getenv("FSM_FLUSH_MS", "")) or 1000
+# فرم رهاشده پس از این مدت (ثانیه) بدون تغییر منقضی می‌شود
+FSM_STATE_TTL_S = _to_int_or_none(os.getenv("FSM_STATE_TTL_S", "")) or 6 * 3600
+# ورودی‌های بدون تغییر پس از این مدت بی‌استفاده از حافظه خارج می‌شوند (در DB می‌مانند)
+FSM_CACHE_IDLE_S = _to_int_or_none(os.getenv("FSM_CACHE_IDLE_S", "")) or 900
+
+# صف ارسال اعلان‌های گروه (پس‌زمینه، با محدودیت نرخ هر چت و تلاش مجدد)
+NOTIFY_QUEUE_MAX = _to_int_or_none(os.getenv("NOTIFY_QUEUE_MAX", "")) or 1000
+# سقف تلگرام برای گروه‌ها حدود ۲۰ پیام در دقیقه است
+NOTIFY_PER_MINUTE = _to_int_or_none(os.getenv("NOTIFY_PER_MINUTE", "")) or 20
+NOTIFY_BURST = _to_int_or_none(os.getenv("NOTIFY_BURST", "")) or 3
+NOTIFY_MAX_RETRIES = _to_int_or_none(os.getenv("NOTIFY_MAX_RETRIES", "")) or 6
+NOTIFY_BACKOFF_MS = _to_int_or_none(os.getenv("NOTIFY_BACKOFF_MS", "")) or 500
+NOTIFY_BACKOFF_MAX_S = _to_int_or_none(os.getenv("NOTIFY_BACKOFF_MAX_S", "")) or 60
+# پنجره ادغام اعلان‌های پشت‌سرهم هر تاپیک در یک پیام خلاصه (میلی‌ثانیه؛ 0 یعنی ارسال فوری)
+_coalesce_ms = _to_int_or_none(os.getenv("NOTIFY_COALESCE_MS", ""))
+NOTIFY_COALESCE_MS = 15000 if _coalesce_ms is None else max(0, _coalesce_ms)
+
+# relay صف خروجی اعلان‌ها (جدول outbox)
+OUTBOX_BATCH_SIZE = _to_int_or_none(os.getenv("OUTBOX_BATCH_SIZE", "")) or 20
+OUTBOX_POLL_MS = _to_int_or_none(os.getenv("OUTBOX_POLL_MS", "")) or 2000
+# مدت اجاره‌ی پیام‌های برداشته‌شده (ثانیه)؛ پس از آن relay دیگری می‌تواند دوباره بفرستد
+OUTBOX_LEASE_S = _to_int_or_none(os.getenv("OUTBOX_LEASE_S", "")) or 300
+OUTBOX_MAX_ATTEMPTS = _to_int_or_none(os.getenv("OUTBOX_MAX_ATTEMPTS", "")) or 10
+OUTBOX_RETENTION_DAYS = _to_int_or_none(os.getenv("OUTBOX_RETENTION_DAYS", "")) or 7
+
+# زمان‌بندی گزارش هفتگی (به وقت UTC): ابتدای هر هفته (Monday=0 ... Sunday=6؛ شنبه‌محور: 5) در ساعت مشخص
+WEEKLY_REPORT_ENABLED = os.getenv("WEEKLY_REPORT_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+_week_start = _to_int_or_none(os.getenv("REPORT_WEEK_START", ""))
+REPORT_WEEK_START = 0 if _week_start is None else _week_start % 7
+_report_hour = _to_int_or_none(os.getenv("WEEKLY_REPORT_HOUR", ""))
+WEEKLY_REPORT_HOUR = 8 if _report_hour is None else max(0, min(23, _report_hour))
+
+# شمارش کوئری‌های SQL هر آپدیت و هشدار N+1 (تکرار یک شکل کوئری بیش از آستانه در یک آپدیت)
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+N_PLUS_ONE_THRESHOLD = _to_int_or_none(os.getenv("N_PLUS_ONE_THRESHOLD", "")) or 10
+# آپدیت‌های با بیش از این تعداد دستور SQL در سطح INFO لاگ می‌شوند (بقیه DEBUG)
+SLOW_UPDATE_QUERIES = _to_int_or_none(os.getenv("SLOW_UPDATE_QUERIES", "")) or 20
+
+# صفحه‌های گزارش‌های طولانی (ورق زدن بدون محاسبه دوباره): عمر (ثانیه) و حداکثر گزارش‌های نگه‌داشته‌شده
+REPORT_PAGE_TTL_S = _to_int_or_none(os.getenv("REPORT_PAGE_TTL_S", "")) or 900
+REPORT_PAGE_CACHE_MAX = _to_int_or_none(os.getenv("REPORT_PAGE_CACHE_MAX", "")) or 200
+
+# کش گزارش‌های مشتری/نیرو/هفتگی زنده (با نسخه‌ی داده؛ هر ثبت فعالیت/فروش/بازخورد/KPI/تخصیص آن را باطل می‌کند)
+REPORT_CACHE_MAX_ENTRIES = _to_int_or_none(os.getenv("REPORT_CACHE_MAX_ENTRIES", "")) or 500
+REPORT_CACHE_MAX_MB = _to_int_or_none(os.getenv("REPORT_CACHE_MAX_MB", "")) or 32
+REPORT_CACHE_TTL_S = _to_int_or_none(os.getenv("REPORT_CACHE_TTL_S", "")) or 300
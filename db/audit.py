@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert
+
+from .models import AuditLog
+from config import AUDIT_QUEUE_MAX, AUDIT_BATCH_SIZE, AUDIT_FLUSH_MS, AUDIT_QUEUE_POLICY
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AuditSink:
+    """
+    نویسنده پس‌زمینه لاگ ممیزی:
+    رویدادها در صف محدود جمع می‌شوند و هر flush_ms میلی‌ثانیه یا هر batch_size رویداد
+    در یک تراکنش (executemany به ازای هر مجموعه کلید) نوشته می‌شوند؛ اگر دسته خطا دهد
+    رویدادها تک‌تک دوباره نوشته می‌شوند. در توقف، باقی‌مانده صف flush می‌شود.
+    policy وقتی صف پر است: "block" منتظر می‌ماند، "drop" رویداد را دور می‌ریزد (dropped++).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue: int = AUDIT_QUEUE_MAX,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_ms: int = AUDIT_FLUSH_MS,
+        policy: str = AUDIT_QUEUE_POLICY,
+    ) -> None:
+        if policy not in ("block", "drop"):
+            raise ValueError(f"invalid audit queue policy: {policy!r}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_s = flush_ms / 1000
+        self.policy = policy
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, session_factory) -> None:
+        if self.running:
+            return
+        self._session_factory = session_factory
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="audit-sink")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        log.info("audit sink stopped (written=%s dropped=%s failed=%s)", self.written, self.dropped, self.failed)
+
+    async def submit(self, **data) -> None:
+        data.setdefault("created_at", datetime.utcnow())
+        if self.policy == "drop":
+            try:
+                self._queue.put_nowait(data)
+            except asyncio.QueueFull:
+                self.dropped += 1
+            return
+        await self._queue.put(data)
+
+    # ---------- حلقه نویسنده ----------
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_s
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+        # تخلیه باقی‌مانده صف هنگام توقف
+        rest = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                rest.append(item)
+        for i in range(0, len(rest), self.batch_size):
+            await self._write(rest[i:i + self.batch_size])
+
+    async def _write(self, batch: list) -> None:
+        try:
+            await self._insert(batch)
+            self.written += len(batch)
+        except Exception:
+            if len(batch) == 1:
+                self.failed += 1
+                log.exception("audit sink: failed to write event %s", batch[0])
+                return
+            # یک رویداد خراب نباید کل دسته را از بین ببرد: تک‌تک دوباره
+            log.warning("audit sink: batch of %s events failed; retrying one by one", len(batch), exc_info=True)
+            for event in batch:
+                await self._write([event])
+
+    async def _insert(self, batch: list) -> None:
+        # INSERT چندسطری کلیدها را از سطر اول می‌گیرد؛ رویدادها بر اساس مجموعه کلیدها گروه و
+        # هر گروه با executemany نوشته می‌شود (کلید غایب همان NULL/پیش‌فرض ستون می‌ماند)
+        groups: dict = {}
+        for event in batch:
+            groups.setdefault(tuple(sorted(event)), []).append(event)
+        async with self._session_factory() as session:
+            for rows in groups.values():
+                await session.execute(insert(AuditLog), rows)
+            await session.commit()
+
+
+sink = AuditSink()
@@ -1,14 +1,94 @@
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy import MetaData
-from config import DB_URL
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy import MetaData, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import (
+    DB_URL, DB_PROFILE,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_STATEMENT_CACHE_SIZE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_FOREIGN_KEYS,
+)
 
 metadata = MetaData()
 
 class Base(DeclarativeBase):
     metadata = metadata
 
-engine = create_async_engine(DB_URL, echo=False, future=True)
+
+# ---------------------------
+# پروفایل‌های موتور
+# ---------------------------
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",   # 256MB
+    "PRAGMA cache_size=-65536",     # 64MB
+)
+
+
+def _sqlite_engine(url: str) -> AsyncEngine:
+    """WAL + pragmaها + استخر اتصال (خواننده‌های هم‌زمان در کنار یک نویسنده)."""
+    if make_url(url).database in (None, "", ":memory:"):
+        # دیتابیس حافظه‌ای: WAL معنا ندارد و باید یک اتصال مشترک بماند
+        return create_async_engine(url, echo=False, future=True)
+
+    engine = create_async_engine(
+        url, echo=False, future=True,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+        for pragma in SQLITE_PRAGMAS:
+            cur.execute(pragma)
+        if SQLITE_FOREIGN_KEYS:
+            cur.execute("PRAGMA foreign_keys=ON")
+        cur.close()
+
+    return engine
+
+
+def _postgres_engine(url: str) -> AsyncEngine:
+    connect_args = {}
+    if make_url(url).drivername.endswith("+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+    return create_async_engine(
+        url, echo=False, future=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        connect_args=connect_args,
+    )
+
+
+def _default_engine(url: str) -> AsyncEngine:
+    return create_async_engine(url, echo=False, future=True)
+
+
+ENGINE_PROFILES = {
+    "sqlite": _sqlite_engine,
+    "postgres": _postgres_engine,
+    "default": _default_engine,
+}
+
+
+def build_engine(url: str = DB_URL, profile: str = DB_PROFILE) -> AsyncEngine:
+    if profile == "auto":
+        backend = make_url(url).get_backend_name()
+        profile = {"sqlite": "sqlite", "postgresql": "postgres"}.get(backend, "default")
+    try:
+        factory = ENGINE_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"unknown DB_PROFILE: {profile!r}") from None
+    return factory(url)
+
+
+engine = build_engine()
 AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 async def get_session() -> AsyncSession:
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import User, Client
+from utils.constants import ROLE_STAFF, STATUS_ACTIVE
+
+
+class CapacityIndex:
+    """
+    ایندکس درون‌حافظه‌ای بار نیروها برای تخصیص مشتری.
+    - بار هر نیرو (تعداد مشتری تخصیص‌یافته) یک بار با GROUP BY خوانده می‌شود.
+    - min-heap روی (بار، شناسه نیرو)؛ ورودی‌های کهنه به‌صورت تنبل حذف می‌شوند.
+    - با هر تخصیص، بار دو نیروی قبلی/جدید در O(log n) به‌روز می‌شود.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[int, int]] = []
+        self._load: Dict[int, int] = {}   # staff_id -> تعداد مشتری (همه نیروها)
+        self._cap: Dict[int, int] = {}    # فقط نیروهای فعال: staff_id -> max_capacity (0 = نامحدود)
+        self.ready = False
+
+    # ---------- ساخت/ابطال ----------
+    def rebuild(self, caps: Dict[int, int], loads: Dict[int, int]) -> None:
+        self._cap = dict(caps)
+        self._load = dict(loads)
+        self._heap = [(self._load.get(sid, 0), sid) for sid in self._cap]
+        heapq.heapify(self._heap)
+        self.ready = True
+
+    def invalidate(self) -> None:
+        self.ready = False
+
+    # ---------- پرس‌وجو ----------
+    def load_of(self, staff_id: int) -> int:
+        return self._load.get(staff_id, 0)
+
+    def has_room(self, staff_id: int) -> bool:
+        cap = self._cap.get(staff_id)
+        if cap is None:
+            return False
+        return cap == 0 or self.load_of(staff_id) < cap
+
+    def with_room(self) -> List[int]:
+        """شناسه نیروهای فعالی که هنوز ظرفیت خالی دارند."""
+        return [sid for sid in self._cap if self.has_room(sid)]
+
+    def peek(self) -> Optional[int]:
+        """کم‌بارترین نیروی فعالِ دارای ظرفیت (در تساوی، شناسه کوچک‌تر)."""
+        heap = self._heap
+        while heap:
+            load, sid = heap[0]
+            # ورودی کهنه، نیروی غیرفعال یا پر: کنار گذاشته می‌شود تا بار دوباره کم شود
+            if sid not in self._cap or load != self.load_of(sid) or not self.has_room(sid):
+                heapq.heappop(heap)
+                continue
+            return sid
+        return None
+
+    # ---------- به‌روزرسانی ----------
+    def _push(self, staff_id: int) -> None:
+        if staff_id in self._cap:
+            heapq.heappush(self._heap, (self.load_of(staff_id), staff_id))
+        # جلوگیری از رشد بی‌رویه ورودی‌های کهنه
+        if len(self._heap) > 2 * len(self._cap) + 64:
+            self.rebuild(self._cap, self._load)
+
+    def move(self, old_staff_id: Optional[int], new_staff_id: Optional[int]) -> None:
+        if not self.ready or old_staff_id == new_staff_id:
+            return
+        if old_staff_id is not None:
+            self._load[old_staff_id] = max(0, self.load_of(old_staff_id) - 1)
+            self._push(old_staff_id)
+        if new_staff_id is not None:
+            self._load[new_staff_id] = self.load_of(new_staff_id) + 1
+            self._push(new_staff_id)
+
+
+index = CapacityIndex()
+
+
+async def ensure_index(session: AsyncSession) -> CapacityIndex:
+    """در اولین استفاده (یا پس از ابطال) ایندکس را با دو کوئری می‌سازد."""
+    if index.ready:
+        return index
+
+    staff_res = await session.execute(
+        select(User.id, User.max_capacity).where(User.role == ROLE_STAFF, User.status == STATUS_ACTIVE)
+    )
+    caps = {sid: int(cap or 0) for sid, cap in staff_res.all()}
+
+    load_res = await session.execute(
+        select(Client.assigned_staff_id, func.count())
+        .where(Client.assigned_staff_id.is_not(None))
+        .group_by(Client.assigned_staff_id)
+    )
+    loads = {sid: int(cnt) for sid, cnt in load_res.all()}
+
+    index.rebuild(caps, loads)
+    return index
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import json
+from copy import deepcopy
 from datetime import datetime, date, timedelta
-from typing import List, Optional, Tuple
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple, NamedTuple
 from calendar import monthrange
 
-from sqlalchemy import select, update, func, desc
+from sqlalchemy import select, update, insert, func, desc, and_, or_, union_all, tuple_, literal, JSON
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.ext.asyncio import AsyncSession
-
-from .models import User, Client, ClientKPI, Activity, Feedback, AuditLog, Sale, KPIRecord
+from sqlalchemy.orm import make_transient_to_detached
+
+from .models import (
+    User, Client, ClientKPI, Activity, Feedback, AuditLog, Sale, KPIRecord,
+    ClientDailyRollup, StaffDailyRollup, ReportSnapshot,
+)
+# ماژول audit با نام دیگر: پارامتر audit (dict) در save_with_audit و create_* آن را می‌پوشاند
+from . import audit as audit_sink
+from . import capacity, identity, outbox, report_cache, rollups, search
 from utils.constants import ROLE_STAFF, STATUS_ACTIVE
 from config import ADMIN_TELEGRAM_IDS
 
@@ -27,25 +37,80 @@ def _is_admin_tg(tg_id: int) -> bool:
 async def is_admin_tgid(session: AsyncSession, tg_id: int) -> bool:
     if _is_admin_tg(tg_id):
         return True
-    res = await session.execute(select(User).where(User.telegram_id == tg_id))
-    u = res.scalar_one_or_none()
+    u = await get_user_by_telegram_id(session, tg_id)
     return bool(u and u.role == "ADMIN")
 
 
 # ---------------------------
-# User
+# Unit of work (موجودیت + ممیزی + outbox در یک تراکنش)
 # ---------------------------
-async def create_user(session: AsyncSession, **data) -> User:
-    user = User(**data)
-    session.add(user)
+async def save_with_audit(
+    session: AsyncSession, obj, audit: Optional[dict] = None, notify: Optional[dict] = None
+):
+    """
+    موجودیت و (در صورت وجود audit) سطر AuditLog آن را در یک تراکنش ثبت می‌کند:
+    یک flush برای گرفتن id، یک commit و بدون refresh.
+    audit: {"action": "CREATE", "diff_json": ..., "actor_user_id": ...}
+    notify: اعلان گروه {"chat_id", "thread_id", "text"} که در همان تراکنش در outbox ثبت می‌شود.
+    """
+    session.add(obj)
+    if isinstance(obj, Activity):
+        await rollups.on_activity(session, obj)
+    elif isinstance(obj, Sale):
+        await rollups.on_sale(session, obj)
+    await session.flush()
+    if audit is not None:
+        session.add(AuditLog(
+            action=audit.get("action", "CREATE"),
+            entity=type(obj).__name__,
+            entity_id=obj.id,
+            diff_json=audit.get("diff_json"),
+            actor_user_id=audit.get("actor_user_id"),
+        ))
+    queued = outbox.add_message(session, notify)
     await session.commit()
-    await session.refresh(user)
+    if queued:
+        outbox.relay.wake()
+    return obj
+
+
+# ---------------------------
+# User
+# ---------------------------
+async def create_user(session: AsyncSession, *, audit: Optional[dict] = None, **data) -> User:
+    user = await save_with_audit(session, User(**data), audit)
+    capacity.index.invalidate()
+    identity.cache.invalidate("user", user.telegram_id)
     return user
 
 
+def _detached_copy(obj):
+    """
+    نسخه‌ی جدا (detached) از مقادیر ستون‌های obj؛ کش هیچ‌وقت شیء متصل به session فراخوان را نگه نمی‌دارد
+    (rollback/تغییر آن session، شیء کش‌شده را expire یا dirty نمی‌کند).
+    """
+    mapper = sa_inspect(obj).mapper
+    copy = mapper.class_(**{attr.key: deepcopy(getattr(obj, attr.key)) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+async def _cached_by_telegram_id(session: AsyncSession, kind: str, model, tg_id: int):
+    """
+    خواندن از کش هویت؛ در صورت hit یک نسخه‌ی تازه از شیء کش‌شده بدون SQL به session فعلی merge می‌شود
+    تا lazy-load روابط و به‌روزرسانی‌ها مثل قبل کار کنند.
+    """
+    found, cached = identity.cache.get(kind, tg_id)
+    if found:
+        return await session.merge(_detached_copy(cached), load=False) if cached is not None else None
+    res = await session.execute(select(model).where(model.telegram_id == tg_id))
+    obj = res.scalar_one_or_none()
+    identity.cache.put(kind, tg_id, _detached_copy(obj) if obj is not None else None)
+    return obj
+
+
 async def get_user_by_telegram_id(session: AsyncSession, tg_id: int) -> Optional[User]:
-    res = await session.execute(select(User).where(User.telegram_id == tg_id))
-    return res.scalar_one_or_none()
+    return await _cached_by_telegram_id(session, "user", User, tg_id)
 
 
 async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
@@ -53,6 +118,13 @@ async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
     return res.scalar_one_or_none()
 
 
+async def set_user_status(session: AsyncSession, user_id: int, status: str) -> None:
+    await session.execute(update(User).where(User.id == user_id).values(status=status))
+    await session.commit()
+    capacity.index.invalidate()
+    identity.cache.invalidate_id("user", user_id)
+
+
 async def list_staff_active(session: AsyncSession) -> List[User]:
     res = await session.execute(
         select(User).where(User.role == ROLE_STAFF, User.status == STATUS_ACTIVE)
@@ -63,11 +135,12 @@ async def list_staff_active(session: AsyncSession) -> List[User]:
 # ---------------------------
 # Client
 # ---------------------------
-async def create_client(session: AsyncSession, **data) -> Client:
-    client = Client(**data)
-    session.add(client)
-    await session.commit()
-    await session.refresh(client)
+async def create_client(session: AsyncSession, *, audit: Optional[dict] = None, **data) -> Client:
+    client = await save_with_audit(session, Client(**data), audit)
+    report_cache.cache.bump(("client", client.id), ("staff", client.assigned_staff_id))
+    capacity.index.move(None, client.assigned_staff_id)
+    identity.cache.invalidate("client", client.telegram_id)
+    search.index.add(client.id, client.business_name, client.assigned_staff_id)
     return client
 
 
@@ -77,8 +150,13 @@ async def get_client_by_id(session: AsyncSession, client_id: int) -> Optional[Cl
 
 
 async def get_client_by_telegram_id(session: AsyncSession, tg_id: int) -> Optional[Client]:
-    res = await session.execute(select(Client).where(Client.telegram_id == tg_id))
-    return res.scalar_one_or_none()
+    return await _cached_by_telegram_id(session, "client", Client, tg_id)
+
+
+async def set_client_status(session: AsyncSession, client_id: int, status: str) -> None:
+    await session.execute(update(Client).where(Client.id == client_id).values(status=status))
+    await session.commit()
+    identity.cache.invalidate_id("client", client_id)
 
 
 async def list_all_clients(session: AsyncSession) -> List[Client]:
@@ -86,16 +164,144 @@ async def list_all_clients(session: AsyncSession) -> List[Client]:
     return list(res.scalars())
 
 
+# ---------------------------
+# Projections (فقط ستون‌های لازم برای کیبوردهای انتخاب)
+# ---------------------------
+class ClientOption:
+    __slots__ = ("id", "business_name", "assigned_staff_id")
+
+    def __init__(self, id: int, business_name: str, assigned_staff_id: Optional[int]) -> None:
+        self.id = id
+        self.business_name = business_name
+        self.assigned_staff_id = assigned_staff_id
+
+    def __repr__(self) -> str:
+        return f"ClientOption(id={self.id}, business_name={self.business_name!r})"
+
+
+class StaffOption:
+    __slots__ = ("id", "name", "max_capacity")
+
+    def __init__(self, id: int, name: Optional[str], max_capacity: Optional[int]) -> None:
+        self.id = id
+        self.name = name
+        self.max_capacity = max_capacity
+
+    def __repr__(self) -> str:
+        return f"StaffOption(id={self.id}, name={self.name!r})"
+
+
+async def list_client_options(session: AsyncSession, staff_id: Optional[int] = None) -> List[ClientOption]:
+    """id/نام/نیروی مشتری‌ها بدون بارگذاری ORM و ستون‌های JSON/متنی؛ staff_id برای محدود کردن به یک نیرو."""
+    stmt = select(Client.id, Client.business_name, Client.assigned_staff_id).order_by(Client.id)
+    if staff_id is not None:
+        stmt = stmt.where(Client.assigned_staff_id == staff_id)
+    res = await session.execute(stmt)
+    return [ClientOption(*row) for row in res.tuples()]
+
+
+async def list_staff_options(session: AsyncSession) -> List[StaffOption]:
+    """نیروهای فعال به صورت (id، نام، ظرفیت)."""
+    res = await session.execute(
+        select(User.id, User.name, User.max_capacity)
+        .where(User.role == ROLE_STAFF, User.status == STATUS_ACTIVE)
+        .order_by(User.id)
+    )
+    return [StaffOption(*row) for row in res.tuples()]
+
+
+# ---------------------------
+# Keyset pagination (کیبوردهای انتخاب صفحه‌بندی‌شده)
+# ---------------------------
+PICKER_PAGE_SIZE = 8
+
+
+class Page(NamedTuple):
+    items: list
+    has_prev: bool
+    has_next: bool
+
+
+async def _keyset_page(
+    session: AsyncSession, stmt, sort_cols: tuple, row_factory,
+    cursor: Optional[int], direction: str, limit: int,
+) -> Page:
+    """
+    صفحه‌بندی keyset روی (sort_cols[0], id). cursor شناسه اولین/آخرین ردیف صفحه فعلی است
+    و مقدار ستون مرتب‌سازی آن با یک زیرکوئری خوانده می‌شود (callback_data فقط id را حمل می‌کند).
+    direction: "n" صفحه بعد، "p" صفحه قبل.
+    """
+    key = tuple_(*sort_cols)
+    page_stmt = stmt
+    if cursor is not None:
+        sort_col, id_col = sort_cols
+        anchor = tuple_(select(sort_col).where(id_col == cursor).scalar_subquery(), literal(cursor))
+        page_stmt = stmt.where(key < anchor if direction == "p" else key > anchor)
+    order = [c.desc() for c in sort_cols] if direction == "p" else list(sort_cols)
+    res = await session.execute(page_stmt.order_by(*order).limit(limit + 1))
+    rows = list(res.tuples())
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows and cursor is not None:
+        # ردیف cursor حذف شده یا صفحه خالی است → صفحه اول
+        return await _keyset_page(session, stmt, sort_cols, row_factory, None, "n", limit)
+    if direction == "p":
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = cursor is not None, more
+    return Page([row_factory(*r) for r in rows], has_prev, has_next)
+
+
+async def page_client_options(
+    session: AsyncSession,
+    cursor: Optional[int] = None,
+    direction: str = "n",
+    staff_id: Optional[int] = None,
+    limit: int = PICKER_PAGE_SIZE,
+) -> Page:
+    """یک صفحه ClientOption به ترتیب (business_name, id)؛ staff_id برای محدود کردن به یک نیرو."""
+    stmt = select(Client.id, Client.business_name, Client.assigned_staff_id)
+    if staff_id is not None:
+        stmt = stmt.where(Client.assigned_staff_id == staff_id)
+    return await _keyset_page(
+        session, stmt, (Client.business_name, Client.id), ClientOption, cursor, direction, limit
+    )
+
+
+async def page_staff_options(
+    session: AsyncSession,
+    cursor: Optional[int] = None,
+    direction: str = "n",
+    only_ids: Optional[Sequence[int]] = None,
+    limit: int = PICKER_PAGE_SIZE,
+) -> Page:
+    """یک صفحه StaffOption از نیروهای فعال به ترتیب (نام، id)؛ only_ids برای فیلتر (مثلاً دارای ظرفیت)."""
+    stmt = select(User.id, User.name, User.max_capacity).where(
+        User.role == ROLE_STAFF, User.status == STATUS_ACTIVE
+    )
+    if only_ids is not None:
+        stmt = stmt.where(User.id.in_(list(only_ids)))
+    name = func.coalesce(User.name, "")
+    return await _keyset_page(session, stmt, (name, User.id), StaffOption, cursor, direction, limit)
+
+
 async def list_clients_for_staff(session: AsyncSession, staff_id: int) -> List[Client]:
     res = await session.execute(select(Client).where(Client.assigned_staff_id == staff_id))
     return list(res.scalars())
 
 
 async def assign_client_to_staff(session: AsyncSession, client_id: int, staff_id: int) -> None:
+    res = await session.execute(select(Client.assigned_staff_id).where(Client.id == client_id))
+    old_staff_id = res.scalar_one_or_none()
     await session.execute(
         update(Client).where(Client.id == client_id).values(assigned_staff_id=staff_id)
     )
     await session.commit()
+    report_cache.cache.bump(("client", client_id), ("staff", old_staff_id), ("staff", staff_id))
+    capacity.index.move(old_staff_id, staff_id)
+    identity.cache.invalidate_id("client", client_id)
+    search.index.move(client_id, staff_id)
 
 
 async def count_clients_for_staff(session: AsyncSession, staff_id: int) -> int:
@@ -117,11 +323,13 @@ async def upsert_client_kpi(
         row.target_per_week = target_per_week
         row.warn_ratio = warn_ratio
         await session.commit()
+        report_cache.cache.bump(("client", client_id))
         await session.refresh(row)
         return row
     k = ClientKPI(client_id=client_id, target_per_week=target_per_week, warn_ratio=warn_ratio)
     session.add(k)
     await session.commit()
+    report_cache.cache.bump(("client", client_id))
     await session.refresh(k)
     return k
 
@@ -131,14 +339,75 @@ async def get_client_kpi(session: AsyncSession, client_id: int) -> Optional[Clie
     return res.scalar_one_or_none()
 
 
+# ---------------------------
+# Rollup range helpers
+# ---------------------------
+def _edges_filter(ts_col, start_dt: datetime, end_dt: datetime, d0: date, d1: date):
+    return or_(
+        and_(ts_col >= start_dt, ts_col < rollups.day_start(d0)),
+        and_(ts_col >= rollups.day_start(d1), ts_col < end_dt),
+    )
+
+
+def _range_total(
+    rollup_model, rollup_col, rollup_where: list,
+    raw_value, raw_ts, raw_where: list,
+    start_dt: datetime, end_dt: datetime,
+):
+    """
+    عبارت اسکالر مجموع یک بازه: روزهای کامل از جدول rollup
+    و باقی‌مانده ابتدا/انتهای بازه از ردیف‌های خام.
+    """
+    d0, d1 = rollups.split_range(start_dt, end_dt)
+    if d0 is None:
+        return select(raw_value).where(*raw_where, raw_ts >= start_dt, raw_ts < end_dt).scalar_subquery()
+    days = select(func.coalesce(func.sum(rollup_col), 0)).where(
+        *rollup_where, rollup_model.day >= d0, rollup_model.day < d1
+    ).scalar_subquery()
+    edges = select(raw_value).where(*raw_where, _edges_filter(raw_ts, start_dt, end_dt, d0, d1)).scalar_subquery()
+    return days + edges
+
+
+def _range_total_by_client(
+    rollup_col, raw_key, raw_value, raw_ts,
+    start_dt: datetime, end_dt: datetime, label: str,
+):
+    """مثل _range_total ولی گروه‌بندی‌شده بر اساس client_id (subquery با ستون‌های client_id و label)."""
+    d0, d1 = rollups.split_range(start_dt, end_dt)
+    if d0 is None:
+        return (
+            select(raw_key.label("client_id"), raw_value.label(label))
+            .where(raw_ts >= start_dt, raw_ts < end_dt)
+            .group_by(raw_key)
+            .subquery()
+        )
+    days = (
+        select(ClientDailyRollup.client_id.label("client_id"), func.sum(rollup_col).label(label))
+        .where(ClientDailyRollup.day >= d0, ClientDailyRollup.day < d1)
+        .group_by(ClientDailyRollup.client_id)
+    )
+    edges = (
+        select(raw_key, raw_value)
+        .where(_edges_filter(raw_ts, start_dt, end_dt, d0, d1))
+        .group_by(raw_key)
+    )
+    u = union_all(days, edges).subquery()
+    return (
+        select(u.c.client_id, func.sum(u.c[label]).label(label))
+        .group_by(u.c.client_id)
+        .subquery()
+    )
+
+
 # ---------------------------
 # Activity
 # ---------------------------
-async def create_activity(session: AsyncSession, **data) -> Activity:
-    activity = Activity(**data)
-    session.add(activity)
-    await session.commit()
-    await session.refresh(activity)
+async def create_activity(
+    session: AsyncSession, *, audit: Optional[dict] = None, notify: Optional[dict] = None, **data
+) -> Activity:
+    data.setdefault("ts", datetime.utcnow())
+    activity = await save_with_audit(session, Activity(**data), audit, notify)
+    report_cache.cache.bump(("client", activity.client_id), ("staff", activity.staff_id))
     return activity
 
 
@@ -152,13 +421,11 @@ async def count_activities_for_client(session: AsyncSession, client_id: int) ->
 async def count_activities_in_range(
     session: AsyncSession, client_id: int, start_dt: datetime, end_dt: datetime
 ) -> int:
-    res = await session.execute(
-        select(func.count()).select_from(Activity).where(
-            Activity.client_id == client_id,
-            Activity.ts >= start_dt,
-            Activity.ts < end_dt
-        )
-    )
+    res = await session.execute(select(_range_total(
+        ClientDailyRollup, ClientDailyRollup.activity_count, [ClientDailyRollup.client_id == client_id],
+        func.count(), Activity.ts, [Activity.client_id == client_id],
+        start_dt, end_dt,
+    )))
     return int(res.scalar() or 0)
 
 
@@ -173,13 +440,11 @@ async def last_activity_ts(session: AsyncSession, client_id: int) -> Optional[da
 async def count_activities_in_range_by_staff(
     session: AsyncSession, staff_id: int, start_dt: datetime, end_dt: datetime
 ) -> int:
-    res = await session.execute(
-        select(func.count()).select_from(Activity).where(
-            Activity.staff_id == staff_id,
-            Activity.ts >= start_dt,
-            Activity.ts < end_dt
-        )
-    )
+    res = await session.execute(select(_range_total(
+        StaffDailyRollup, StaffDailyRollup.activity_count, [StaffDailyRollup.staff_id == staff_id],
+        func.count(), Activity.ts, [Activity.staff_id == staff_id],
+        start_dt, end_dt,
+    )))
     return int(res.scalar() or 0)
 
 
@@ -213,12 +478,12 @@ async def list_recent_activities_for_staff(
 # ---------------------------
 # Feedback
 # ---------------------------
-async def create_feedback(session: AsyncSession, **data) -> Feedback:
-    fb = Feedback(**data)
-    session.add(fb)
-    await session.commit()
-    await session.refresh(fb)
-    return fb
+async def create_feedback(
+    session: AsyncSession, *, audit: Optional[dict] = None, notify: Optional[dict] = None, **data
+) -> Feedback:
+    feedback = await save_with_audit(session, Feedback(**data), audit, notify)
+    report_cache.cache.bump(("client", feedback.client_id))
+    return feedback
 
 
 async def avg_feedback_for_client(session: AsyncSession, client_id: int) -> Optional[float]:
@@ -250,34 +515,31 @@ async def avg_feedback_for_staff_clients(session: AsyncSession, staff_id: int) -
 # ---------------------------
 # Sales
 # ---------------------------
-async def create_sale(session: AsyncSession, **data) -> Sale:
-    s = Sale(**data)
-    session.add(s)
-    await session.commit()
-    await session.refresh(s)
-    return s
+async def create_sale(
+    session: AsyncSession, *, audit: Optional[dict] = None, notify: Optional[dict] = None, **data
+) -> Sale:
+    data.setdefault("ts", datetime.utcnow())
+    sale = await save_with_audit(session, Sale(**data), audit, notify)
+    report_cache.cache.bump(("client", sale.client_id))
+    return sale
 
 
 async def sum_sales_in_range(session: AsyncSession, client_id: int, start_dt: datetime, end_dt: datetime) -> float:
-    res = await session.execute(
-        select(func.coalesce(func.sum(Sale.amount), 0.0)).where(
-            Sale.client_id == client_id,
-            Sale.ts >= start_dt,
-            Sale.ts < end_dt
-        )
-    )
+    res = await session.execute(select(_range_total(
+        ClientDailyRollup, ClientDailyRollup.sales_sum, [ClientDailyRollup.client_id == client_id],
+        func.coalesce(func.sum(Sale.amount), 0.0), Sale.ts, [Sale.client_id == client_id],
+        start_dt, end_dt,
+    )))
     return float(res.scalar() or 0.0)
 
 
 async def sum_sales_in_range_for_staff(session: AsyncSession, staff_id: int, start_dt: datetime, end_dt: datetime) -> float:
     subq = select(Client.id).where(Client.assigned_staff_id == staff_id)
-    res = await session.execute(
-        select(func.coalesce(func.sum(Sale.amount), 0.0)).where(
-            Sale.client_id.in_(subq),
-            Sale.ts >= start_dt,
-            Sale.ts < end_dt
-        )
-    )
+    res = await session.execute(select(_range_total(
+        ClientDailyRollup, ClientDailyRollup.sales_sum, [ClientDailyRollup.client_id.in_(subq)],
+        func.coalesce(func.sum(Sale.amount), 0.0), Sale.ts, [Sale.client_id.in_(subq)],
+        start_dt, end_dt,
+    )))
     return float(res.scalar() or 0.0)
 
 
@@ -291,41 +553,250 @@ async def list_recent_sales_for_client(session: AsyncSession, client_id: int, li
 # ---------------------------
 # Audit
 # ---------------------------
-async def log_action(session: AsyncSession, **data) -> AuditLog:
+async def log_action(session: AsyncSession, **data) -> Optional[AuditLog]:
+    """
+    اگر نویسنده پس‌زمینه (db.audit.sink) فعال باشد رویداد در صف آن قرار می‌گیرد
+    و منتظر commit نمی‌ماند؛ در غیر این صورت مستقیم نوشته می‌شود.
+    """
+    if audit_sink.sink.running:
+        await audit_sink.sink.submit(**data)
+        return None
     log = AuditLog(**data)
     session.add(log)
     await session.commit()
     return log
 
 
+# ---------------------------
+# Bulk import (ورود گروهی)
+# ---------------------------
+async def bulk_insert_rows(session: AsyncSession, model, rows: List[dict]) -> None:
+    """
+    درج چندسطری بدون commit. روی Postgres (asyncpg) از COPY و در بقیه از executemany
+    استفاده می‌شود. همه ردیف‌ها باید کلیدهای یکسان و همه مقادیر پیش‌فرض را داشته باشند
+    (COPY پیش‌فرض‌های سمت پایتون را اجرا نمی‌کند).
+    """
+    if not rows:
+        return
+    if session.bind.dialect.driver == "asyncpg":
+        cols = list(rows[0])
+        json_cols = {c.name for c in model.__table__.columns if isinstance(c.type, JSON)}
+        records = [
+            tuple(json.dumps(r[c], ensure_ascii=False) if c in json_cols and r[c] is not None else r[c] for c in cols)
+            for r in rows
+        ]
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(model.__tablename__, records=records, columns=cols)
+        return
+    await session.execute(insert(model), rows)
+
+
+async def import_batch(session: AsyncSession, model, rows: List[dict], audit: dict) -> None:
+    """یک دسته از ورود گروهی: درج + به‌روزرسانی rollup + یک AuditLog خلاصه، در یک تراکنش."""
+    await bulk_insert_rows(session, model, rows)
+    if model is Activity:
+        await rollups.on_activities_bulk(session, rows)
+    elif model is Sale:
+        await rollups.on_sales_bulk(session, rows)
+    session.add(AuditLog(action="IMPORT", entity=model.__name__, entity_id=None, **audit))
+    await session.commit()
+    report_cache.cache.invalidate_all()
+    if model in (User, Client):
+        capacity.index.invalidate()
+        if model is Client:
+            search.index.invalidate()
+        kind = "user" if model is User else "client"
+        for r in rows:
+            identity.cache.invalidate(kind, r.get("telegram_id"))
+
+
+async def existing_ids(session: AsyncSession, column, values) -> set:
+    values = {v for v in values if v is not None}
+    if not values:
+        return set()
+    res = await session.execute(select(column).where(column.in_(values)))
+    return {v for (v,) in res.all()}
+
+
+# ---------------------------
+# Aggregation (گزارش تجمیعی همه مشتری‌ها)
+# ---------------------------
+class ClientSummary(NamedTuple):
+    client_id: int
+    business_name: str
+    assigned_staff_id: Optional[int]
+    target: int
+    acts: int
+    sales_sum: float
+    fb_avg: Optional[float]
+    last_ts: Optional[datetime]
+
+
+async def list_client_summaries(
+    session: AsyncSession,
+    start_dt: datetime,
+    end_dt: datetime,
+    staff_id: Optional[int] = None,
+) -> List[ClientSummary]:
+    """
+    هدف KPI، تعداد فعالیت و جمع فروش بازه، میانگین بازخورد و آخرین فعالیت
+    همه مشتری‌ها (یا فقط مشتری‌های یک نیرو) را با یک کوئری گروه‌بندی‌شده برمی‌گرداند.
+    """
+    kpi_sq = (
+        select(ClientKPI.client_id, func.max(ClientKPI.target_per_week).label("target"))
+        .group_by(ClientKPI.client_id)
+        .subquery()
+    )
+    acts_sq = _range_total_by_client(
+        ClientDailyRollup.activity_count, Activity.client_id, func.count(), Activity.ts,
+        start_dt, end_dt, "acts",
+    )
+    last_sq = (
+        select(Activity.client_id, func.max(Activity.ts).label("last_ts"))
+        .group_by(Activity.client_id)
+        .subquery()
+    )
+    sales_sq = _range_total_by_client(
+        ClientDailyRollup.sales_sum, Sale.client_id, func.sum(Sale.amount), Sale.ts,
+        start_dt, end_dt, "sales_sum",
+    )
+    fb_sq = (
+        select(Feedback.client_id, func.avg(Feedback.score).label("fb_avg"))
+        .group_by(Feedback.client_id)
+        .subquery()
+    )
+
+    stmt = (
+        select(
+            Client.id,
+            Client.business_name,
+            Client.assigned_staff_id,
+            kpi_sq.c.target,
+            acts_sq.c.acts,
+            sales_sq.c.sales_sum,
+            fb_sq.c.fb_avg,
+            last_sq.c.last_ts,
+        )
+        .outerjoin(kpi_sq, kpi_sq.c.client_id == Client.id)
+        .outerjoin(acts_sq, acts_sq.c.client_id == Client.id)
+        .outerjoin(sales_sq, sales_sq.c.client_id == Client.id)
+        .outerjoin(fb_sq, fb_sq.c.client_id == Client.id)
+        .outerjoin(last_sq, last_sq.c.client_id == Client.id)
+        .order_by(Client.id)
+    )
+    if staff_id is not None:
+        stmt = stmt.where(Client.assigned_staff_id == staff_id)
+
+    res = await session.execute(stmt)
+    return [
+        ClientSummary(
+            client_id=row[0],
+            business_name=row[1],
+            assigned_staff_id=row[2],
+            target=int(row[3] or 0),
+            acts=int(row[4] or 0),
+            sales_sum=float(row[5] or 0.0),
+            fb_avg=float(row[6]) if row[6] is not None else None,
+            last_ts=row[7],
+        )
+        for row in res.all()
+    ]
+
+
+# ---------------------------
+# Export (خواندن جریانی ردیف‌های خام)
+# ---------------------------
+async def stream_rows_in_range(
+    session: AsyncSession,
+    model,
+    ts_col,
+    start_dt: datetime,
+    end_dt: datetime,
+    chunk_size: int = 1000,
+) -> AsyncIterator[Sequence[Any]]:
+    """
+    ردیف‌های خام یک جدول در بازه [start_dt, end_dt) را به‌صورت دسته‌های
+    chunk_size تایی (با cursor سمت سرور / yield_per) برمی‌گرداند.
+    """
+    stmt = (
+        select(*model.__table__.columns)
+        .where(ts_col >= start_dt, ts_col < end_dt)
+        .order_by(ts_col, model.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await session.stream(stmt)
+    async for part in result.partitions():
+        yield part
+
+
 # ---------------------------
 # Capacity helpers (Assign)
 # ---------------------------
-async def list_staff_with_capacity(session: AsyncSession) -> List[Tuple[User, int, int]]:
-    staff = await list_staff_active(session)
-    result = []
-    for s in staff:
-        cur_cnt = await count_clients_for_staff(session, s.id)
-        cap = int(s.max_capacity or 0)
-        has_capacity = (cap == 0) or (cur_cnt < cap)
-        if has_capacity:
-            result.append((s, cur_cnt, cap))
-    return result
+async def list_staff_with_load(session: AsyncSession) -> List[Tuple[StaffOption, int, int]]:
+    """همه نیروهای فعال با (بار فعلی، ظرفیت)؛ بار از ایندکس ظرفیت خوانده می‌شود."""
+    staff = await list_staff_options(session)
+    idx = await capacity.ensure_index(session)
+    return [(s, idx.load_of(s.id), int(s.max_capacity or 0)) for s in staff]
+
+
+async def page_staff_with_load(
+    session: AsyncSession, cursor: Optional[int] = None, direction: str = "n"
+) -> Tuple[Page, dict]:
+    """
+    صفحه نیروها برای تخصیص دستی + بار فعلی هر کدام.
+    فقط نیروهای دارای ظرفیت؛ اگر همه پر باشند، همه نیروهای فعال.
+    """
+    idx = await capacity.ensure_index(session)
+    with_room = idx.with_room()
+    page = await page_staff_options(session, cursor, direction, only_ids=with_room or None)
+    return page, {s.id: idx.load_of(s.id) for s in page.items}
+
+
+async def list_staff_with_capacity(session: AsyncSession) -> List[Tuple[StaffOption, int, int]]:
+    return [
+        (s, cur_cnt, cap)
+        for s, cur_cnt, cap in await list_staff_with_load(session)
+        if cap == 0 or cur_cnt < cap
+    ]
 
 
 async def pick_staff_by_capacity(session: AsyncSession) -> Optional[User]:
-    staff_list = await list_staff_active(session)
-    candidates = []
-    for s in staff_list:
-        cur_cnt = await count_clients_for_staff(session, s.id)
-        cap = int(s.max_capacity or 0)
-        has_capacity = (cap == 0) or (cur_cnt < cap)
-        if has_capacity:
-            candidates.append((cur_cnt, s.id, s))
-    if not candidates:
+    idx = await capacity.ensure_index(session)
+    staff_id = idx.peek()
+    if staff_id is None:
         return None
-    candidates.sort(key=lambda t: (t[0], t[1]))
-    return candidates[0][2]
+    return await get_user_by_id(session, staff_id)
+
+
+# ---------------------------
+# Report snapshots (گزارش‌های رندرشده دوره‌ای)
+# ---------------------------
+async def save_report_snapshot(
+    session: AsyncSession, kind: str, period_start: date, period_end: date, text: str
+) -> ReportSnapshot:
+    """متن گزارش یک دوره را ذخیره/جایگزین می‌کند (commit با فراخوان)."""
+    res = await session.execute(
+        select(ReportSnapshot).where(ReportSnapshot.kind == kind, ReportSnapshot.period_start == period_start)
+    )
+    snap = res.scalar_one_or_none()
+    if snap is None:
+        snap = ReportSnapshot(kind=kind, period_start=period_start)
+        session.add(snap)
+    snap.period_end = period_end
+    snap.text = text
+    snap.created_at = datetime.utcnow()
+    return snap
+
+
+async def get_latest_report_snapshot(session: AsyncSession, kind: str) -> Optional[ReportSnapshot]:
+    res = await session.execute(
+        select(ReportSnapshot)
+        .where(ReportSnapshot.kind == kind)
+        .order_by(desc(ReportSnapshot.period_start))
+        .limit(1)
+    )
+    return res.scalar_one_or_none()
 
 
 # =========================================
@@ -452,3 +923,28 @@ async def kpi_report_dict(
         client_id=client_id,
     )
     return {r.metric: float(r.value) for r in rows}
+
+
+async def list_kpi_values_for_periods(
+    session: AsyncSession,
+    *,
+    scope: str,
+    metrics: Sequence[str],
+    period_starts: Sequence[date],
+    client_id: int | None = None,
+) -> List[Tuple[str, date, float]]:
+    """
+    (metric, period_start, value) چند دوره با یک کوئری؛ شرط‌های scope/metric IN/period_start IN
+    روی ستون‌های اول ix_kpi_lookup هستند و بدون بارگذاری ORM برگردانده می‌شوند.
+    """
+    if not metrics or not period_starts:
+        return []
+    res = await session.execute(
+        select(KPIRecord.metric, KPIRecord.period_start, KPIRecord.value).where(
+            KPIRecord.scope == scope,
+            KPIRecord.metric.in_(metrics),
+            KPIRecord.period_start.in_(period_starts),
+            KPIRecord.client_id == client_id,
+        )
+    )
+    return [(metric, start, float(value or 0.0)) for metric, start, value in res.tuples()]
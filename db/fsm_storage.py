@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import select, delete, insert
+
+from .models import FSMStateRecord
+from config import FSM_FLUSH_MS, FSM_STATE_TTL_S, FSM_CACHE_IDLE_S
+
+log = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("state", "data", "updated", "touched", "dirty")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], updated: datetime) -> None:
+        self.state = state
+        self.data = data
+        self.updated = updated          # آخرین تغییر (UTC) — مبنای TTL
+        self.touched = time.monotonic()  # آخرین دسترسی — مبنای خروج از حافظه
+        self.dirty = False
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLStorage(BaseStorage):
+    """
+    ذخیره‌ساز FSM روی جدول fsm_states با کش درون‌حافظه‌ای write-behind:
+    - خواندن‌ها از کش؛ در اولین دسترسی به یک کلید یک SELECT (نبودِ ردیف هم کش می‌شود).
+    - نوشتن‌ها فقط کش را dirty می‌کنند؛ هر flush_ms همه کلیدهای dirty با یک DELETE + یک INSERT
+      چندسطری نوشته می‌شوند، پس چند update_data یک فرم در یک نوشتن ادغام می‌شوند.
+    - وضعیتی که state_ttl ثانیه تغییر نکرده منقضی می‌شود (فرم رهاشده) و از DB هم پاک می‌شود.
+    - ورودی‌های تمیز پس از cache_idle ثانیه بی‌استفاده از حافظه خارج می‌شوند.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        *,
+        flush_ms: int = FSM_FLUSH_MS,
+        state_ttl: int = FSM_STATE_TTL_S,
+        cache_idle: int = FSM_CACHE_IDLE_S,
+    ) -> None:
+        self._session_factory = session_factory
+        self.flush_s = flush_ms / 1000
+        self.state_ttl = timedelta(seconds=state_ttl)
+        self.cache_idle = cache_idle
+        self._cache: Dict[str, _Entry] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._last_sweep = time.monotonic()
+        self.loads = 0
+        self.changes = 0
+        self.rows_written = 0
+        self.flushes = 0
+        self.expired = 0
+        self.failed = 0
+
+    # ---------- کلید و کش ----------
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(p if p is not None else "") for p in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny,
+        ))
+
+    def _expired(self, updated: datetime) -> bool:
+        return updated < datetime.utcnow() - self.state_ttl
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        k = self._key(key)
+        entry = self._cache.get(k)
+        if entry is None:
+            async with self._session_factory() as session:
+                res = await session.execute(
+                    select(FSMStateRecord.state, FSMStateRecord.data, FSMStateRecord.updated_at)
+                    .where(FSMStateRecord.key == k)
+                )
+                row = res.first()
+            self.loads += 1
+            if row is None:
+                entry = _Entry(None, {}, datetime.utcnow())
+            else:
+                entry = _Entry(row.state, dict(row.data or {}), row.updated_at)
+            # ممکن است در حین SELECT ورودی دیگری برای همین کلید ساخته شده باشد
+            entry = self._cache.setdefault(k, entry)
+        if not entry.empty and self._expired(entry.updated):
+            self._change(k, entry, None, {})
+            self.expired += 1
+        entry.touched = time.monotonic()
+        return entry
+
+    def _change(self, k: str, entry: _Entry, state: Optional[str], data: Dict[str, Any]) -> None:
+        entry.state = state
+        entry.data = data
+        entry.updated = datetime.utcnow()
+        entry.dirty = True
+        self._dirty.add(k)
+        self.changes += 1
+        self._ensure_task()
+
+    # ---------- BaseStorage ----------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key)
+        value = state.state if isinstance(state, State) else state
+        self._change(self._key(key), entry, value, entry.data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = await self._entry(key)
+        self._change(self._key(key), entry, entry.state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._entry(key)).data.copy()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # flush در حال اجرا قطع نمی‌شود؛ حلقه پس از آن خارج می‌شود
+            self._stop.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        log.info("FSM storage closed: %s", self.stats())
+
+    # ---------- write-behind ----------
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="fsm-storage-flush")
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.flush_s)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            if time.monotonic() - self._last_sweep >= min(self.cache_idle, 60):
+                await self.sweep()
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        rows = []
+        for k in keys:
+            entry = self._cache.get(k)
+            if entry is None:
+                continue
+            entry.dirty = False
+            if entry.empty:
+                continue
+            try:
+                json.dumps(entry.data)
+            except (TypeError, ValueError):
+                log.error("FSM data for %s is not JSON-serializable; not persisted", k)
+                self.failed += 1
+                continue
+            rows.append({"key": k, "state": entry.state, "data": dict(entry.data), "updated_at": entry.updated})
+        try:
+            async with self._session_factory() as session:
+                await session.execute(delete(FSMStateRecord).where(FSMStateRecord.key.in_(keys)))
+                if rows:
+                    await session.execute(insert(FSMStateRecord), rows)
+                await session.commit()
+        except Exception:
+            log.exception("FSM storage flush failed (%d keys); will retry", len(keys))
+            for k in keys:
+                if k in self._cache:
+                    self._cache[k].dirty = True
+            self._dirty |= keys & self._cache.keys()
+            return
+        self.rows_written += len(rows)
+        self.flushes += 1
+
+    async def sweep(self) -> None:
+        """خروج ورودی‌های تمیز و بی‌استفاده از حافظه + حذف وضعیت‌های منقضی از DB."""
+        self._last_sweep = now = time.monotonic()
+        idle = [k for k, e in self._cache.items() if not e.dirty and now - e.touched > self.cache_idle]
+        for k in idle:
+            del self._cache[k]
+        try:
+            async with self._session_factory() as session:
+                res = await session.execute(
+                    delete(FSMStateRecord).where(FSMStateRecord.updated_at < datetime.utcnow() - self.state_ttl)
+                )
+                await session.commit()
+            self.expired += res.rowcount or 0
+        except Exception:
+            log.exception("FSM storage sweep failed")
+
+    # ---------- آمار ----------
+    def memory_bytes(self) -> int:
+        """برآورد حافظه کش: کلیدها + ورودی‌ها + اندازه JSON داده‌ها."""
+        total = sys.getsizeof(self._cache)
+        for k, e in self._cache.items():
+            total += sys.getsizeof(k) + sys.getsizeof(e) + sys.getsizeof(e.data)
+            if e.data:
+                total += len(json.dumps(e.data, ensure_ascii=False, default=str).encode())
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._cache),
+            "active_flows": sum(1 for e in self._cache.values() if e.state is not None),
+            "dirty": len(self._dirty),
+            "memory_kb": round(self.memory_bytes() / 1024, 1),
+            "loads": self.loads,
+            "changes": self.changes,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "expired": self.expired,
+            "failed": self.failed,
+        }
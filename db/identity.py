@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from config import IDENTITY_CACHE_MAX, IDENTITY_CACHE_TTL, IDENTITY_NEGATIVE_TTL
+
+# نشانگر «در DB نیست» برای کش منفی (None یعنی در کش نیست)
+_MISSING = object()
+
+
+class IdentityCache:
+    """
+    کش درون‌حافظه‌ای telegram_id → User/Client برای تشخیص نقش در هر آپدیت.
+    - LRU محدود (max_size) با OrderedDict
+    - TTL جدا برای نتیجه مثبت و منفی (شناسه ناشناس هم کش می‌شود)
+    - ابطال صریح هنگام ساخت/تغییر کاربر و مشتری
+    کلید: (kind, telegram_id) که kind یکی از "user" / "client" است.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, negative_ttl: float = 30.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data: "OrderedDict[Tuple[str, int], Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, tg_id: int):
+        """(found, value) — value برای کش منفی None است."""
+        key = (kind, tg_id)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, (None if value is _MISSING else value)
+
+    def put(self, kind: str, tg_id: int, value: Optional[Any]) -> None:
+        ttl = self.ttl if value is not None else self.negative_ttl
+        key = (kind, tg_id)
+        self._data[key] = (time.monotonic() + ttl, _MISSING if value is None else value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    # ---------- ابطال ----------
+    def invalidate(self, kind: str, tg_id: Optional[int]) -> None:
+        if tg_id is not None:
+            self._data.pop((kind, tg_id), None)
+
+    def invalidate_id(self, kind: str, entity_id: int) -> None:
+        """ابطال بر اساس کلید اصلی (وقتی telegram_id در دسترس نیست)."""
+        stale = [
+            key for key, (_, value) in self._data.items()
+            if key[0] == kind and value is not _MISSING and getattr(value, "id", None) == entity_id
+        ]
+        for key in stale:
+            del self._data[key]
+
+    def clear(self, kind: Optional[str] = None) -> None:
+        if kind is None:
+            self._data.clear()
+            return
+        for key in [k for k in self._data if k[0] == kind]:
+            del self._data[key]
+
+    # ---------- آمار ----------
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 3),
+        }
+
+
+# نمونه سراسری مورد استفاده در crud
+cache = IdentityCache(IDENTITY_CACHE_MAX, IDENTITY_CACHE_TTL, IDENTITY_NEGATIVE_TTL)
@@ -0,0 +1,137 @@
+"""
+اجرای مهاجرت‌های نسخه‌دار اسکیما (SQLite و Postgres).
+
+- جدول schema_migrations نسخه‌های اجراشده را نگه می‌دارد.
+- هر مرحله یک بار، به ترتیب نسخه و در تراکنش خودش اجرا می‌شود.
+- مراحل باید idempotent باشند (مثلاً CREATE INDEX ... checkfirst).
+
+    python -m db.migrations            # اجرای مراحل باقی‌مانده
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, insert, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from .models import Base, Client, Activity, Sale, Feedback, OutboxMessage
+from . import rollups
+
+log = logging.getLogger(__name__)
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(128), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+# ---------------------------
+# مراحل
+# ---------------------------
+def _index(model, name: str):
+    return next(ix for ix in model.__table__.indexes if ix.name == name)
+
+
+async def _add_column(session: AsyncSession, model, name: str) -> None:
+    """ستون جدید مدل را اگر در جدول موجود نباشد اضافه می‌کند (جدول‌های ساخته‌شده قبل از آن)."""
+    table = model.__table__
+    column = table.c[name]
+
+    def _run(sync_session):
+        conn = sync_session.connection()
+        if name in {c["name"] for c in inspect(conn).get_columns(table.name)}:
+            return
+        ddl = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {ddl}"))
+    await session.run_sync(_run)
+
+
+async def _create_indexes(session: AsyncSession, *indexes) -> None:
+    def _run(sync_session):
+        conn = sync_session.connection()
+        for ix in indexes:
+            ix.create(conn, checkfirst=True)
+    await session.run_sync(_run)
+
+
+async def m0001_activity_range_indexes(session: AsyncSession) -> None:
+    await _create_indexes(
+        session,
+        _index(Activity, "ix_activities_client_ts"),
+        _index(Activity, "ix_activities_staff_ts"),
+    )
+
+
+async def m0002_sales_feedback_range_indexes(session: AsyncSession) -> None:
+    await _create_indexes(
+        session,
+        _index(Sale, "ix_sales_client_ts"),
+        _index(Feedback, "ix_feedbacks_client_created"),
+    )
+
+
+async def m0003_backfill_daily_rollups(session: AsyncSession) -> None:
+    await rollups.rebuild(session)
+
+
+async def m0004_client_picker_index(session: AsyncSession) -> None:
+    await _create_indexes(session, _index(Client, "ix_clients_name_id"))
+
+
+async def m0005_outbox_digest_meta(session: AsyncSession) -> None:
+    await _add_column(session, OutboxMessage, "meta")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[AsyncSession], Awaitable[None]]]] = [
+    (1, "activities (client_id, ts) / (staff_id, ts) indexes", m0001_activity_range_indexes),
+    (2, "sales (client_id, ts) / feedbacks (client_id, created_at) indexes", m0002_sales_feedback_range_indexes),
+    (3, "backfill daily rollups", m0003_backfill_daily_rollups),
+    (4, "clients (business_name, id) index for keyset pickers", m0004_client_picker_index),
+    (5, "outbox.meta for digest coalescing", m0005_outbox_digest_meta),
+]
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+async def upgrade(engine: AsyncEngine) -> List[int]:
+    """ساخت جداول جدید + اجرای مهاجرت‌های باقی‌مانده. نسخه‌های اجراشده را برمی‌گرداند."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_meta.create_all)
+        res = await conn.execute(select(schema_migrations.c.version))
+        done = {int(v) for (v,) in res.all()}
+
+    Session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    applied = []
+    for version, name, step in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        async with Session() as session:
+            await step(session)
+            await session.execute(
+                insert(schema_migrations).values(version=version, name=name, applied_at=datetime.utcnow())
+            )
+            await session.commit()
+        log.info("✅ migration %04d applied: %s", version, name)
+        applied.append(version)
+    return applied
+
+
+async def _main() -> None:
+    from .base import engine
+    logging.basicConfig(level=logging.INFO)
+    applied = await upgrade(engine)
+    await engine.dispose()
+    print(f"applied: {applied or 'nothing (up to date)'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime, date
 from sqlalchemy import (
-    String, ForeignKey, DateTime, Date, JSON, Text, Integer, Float,
+    String, ForeignKey, DateTime, Date, JSON, Text, Integer, BigInteger, Float,
     UniqueConstraint, Index
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -28,6 +28,9 @@ class User(Base):
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        Index("ix_clients_name_id", "business_name", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     business_name: Mapped[str] = mapped_column(String(128))
@@ -59,6 +62,10 @@ class ClientKPI(Base):
 
 class Activity(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        Index("ix_activities_client_ts", "client_id", "ts"),
+        Index("ix_activities_staff_ts", "staff_id", "ts"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), index=True)
@@ -74,6 +81,9 @@ class Activity(Base):
 
 class Feedback(Base):
     __tablename__ = "feedbacks"
+    __table_args__ = (
+        Index("ix_feedbacks_client_created", "client_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), index=True)
@@ -84,6 +94,9 @@ class Feedback(Base):
 
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_client_ts", "client_id", "ts"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), index=True)
@@ -106,6 +119,96 @@ class AuditLog(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+# ============================
+#   📆 جداول تجمیع روزانه (rollup)
+# ============================
+class ClientDailyRollup(Base):
+    __tablename__ = "client_daily_rollups"
+
+    client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    activity_count: Mapped[int] = mapped_column(Integer, default=0)
+    sales_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    sales_count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class StaffDailyRollup(Base):
+    __tablename__ = "staff_daily_rollups"
+
+    staff_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    activity_count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+# ============================
+#   🧭 وضعیت FSM (فرم‌های چندمرحله‌ای)
+# ============================
+class FSMStateRecord(Base):
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)  # bot:chat:user:thread:bc:destiny
+    state: Mapped[str | None] = mapped_column(String(128))
+    data: Mapped[dict | None] = mapped_column(JSON)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+# ============================
+#   📤 صف خروجی اعلان‌ها (outbox)
+# ============================
+class OutboxMessage(Base):
+    """
+    اعلان گروه که در همان تراکنشِ فعالیت/فروش/بازخورد ثبت می‌شود و relay پس‌زمینه آن را می‌فرستد.
+    status: PENDING → SENT | FAILED. locked_until/lease_owner اجاره‌ی ارسال است؛ اگر relay
+    وسط کار از کار بیفتد، اجاره منقضی می‌شود و پیام دوباره برداشته می‌شود (حداقل یک بار).
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_pending", "status", "available_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    thread_id: Mapped[int | None] = mapped_column(Integer)
+    text: Mapped[str] = mapped_column(Text)
+    # برای ادغام در پیام خلاصه: {"group": نیرو/مشتری, "item": مشتری یا None, "line": خلاصه یک‌خطی}
+    meta: Mapped[dict | None] = mapped_column(JSON)
+    status: Mapped[str] = mapped_column(String(16), default="PENDING")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    available_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime)
+    lease_owner: Mapped[str | None] = mapped_column(String(32))
+    last_error: Mapped[str | None] = mapped_column(String(256))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime)
+
+
+# ============================
+#   🗓 گزارش‌های زمان‌بندی‌شده
+# ============================
+class ReportSnapshot(Base):
+    """متن رندرشده گزارش یک دوره (مثلاً هفتگی) تا دکمه‌های گزارش فوراً پاسخ بگیرند."""
+    __tablename__ = "report_snapshots"
+    __table_args__ = (
+        UniqueConstraint("kind", "period_start", name="uq_report_snapshot_period"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32))
+    period_start: Mapped[date] = mapped_column(Date)
+    period_end: Mapped[date] = mapped_column(Date)
+    text: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ScheduledRun(Base):
+    """آخرین مرز دوره‌ای که هر کار زمان‌بندی‌شده برایش اجرا شده (برای جبران اجراهای جاافتاده)."""
+    __tablename__ = "scheduled_runs"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    boundary: Mapped[datetime] = mapped_column(DateTime)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 # ============================
 #   📈 KPI مارکتینگ (جدید)
 # ============================
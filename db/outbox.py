@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select, update, delete, or_
+
+from .models import OutboxMessage
+from config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_POLL_MS, OUTBOX_LEASE_S, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETENTION_DAYS,
+)
+
+log = logging.getLogger(__name__)
+
+PENDING, SENT, FAILED = "PENDING", "SENT", "FAILED"
+_PURGE_EVERY_S = 3600
+_MAX_INFLIGHT_BATCHES = 8
+
+
+def add_message(session, message: Optional[dict]) -> bool:
+    """
+    یک ردیف outbox به session اضافه می‌کند (commit با تراکنش فراخوان).
+    message: {"chat_id", "thread_id", "text", "meta"} — معمولاً از utils.notify.*_message؛ None یعنی چیزی نیست.
+    """
+    if not message:
+        return False
+    session.add(OutboxMessage(
+        chat_id=message["chat_id"],
+        thread_id=message.get("thread_id"),
+        text=message["text"],
+        meta=message.get("meta"),
+        status=PENDING,
+        attempts=0,
+        available_at=datetime.utcnow(),
+    ))
+    return True
+
+
+class OutboxRelay:
+    """
+    ارسال پس‌زمینه ردیف‌های outbox (حداقل یک بار):
+    - هر دور حداکثر batch_size ردیف PENDING برداشته و برای lease_s ثانیه اجاره می‌شود؛
+      روی Postgres با FOR UPDATE SKIP LOCKED تا relayهای همزمان روی هم نیفتند،
+      و در همه دیتابیس‌ها (از جمله SQLite) UPDATE مشروط به منقضی بودن اجاره + lease_owner.
+    - ارسال از طریق utils.notify.Coalescer (ادغام در خلاصه، محدودیت نرخ و retry)؛ relay منتظر نتیجه
+      نمی‌ماند و دسته بعدی را برمی‌دارد تا اعلان‌های پشت‌سرهم در یک پنجره ادغام جمع شوند.
+      موفق‌ها SENT می‌شوند، ناموفق‌ها با backoff نمایی دوباره PENDING و پس از max_attempts تلاش FAILED.
+    - ردیف‌های در صف sender (هنوز ثبت‌نشده) دوباره برداشته نمی‌شوند و اجاره‌شان هر lease_s/3 تمدید می‌شود،
+      چون صف با محدودیت نرخ ممکن است بیش از lease_s طول بکشد؛ ثبت نتیجه فقط برای ردیفی است که
+      هنوز lease_owner همین دسته را دارد.
+    - اگر پروسه وسط ارسال از کار بیفتد، اجاره منقضی و ردیف دوباره فرستاده می‌شود.
+    - ردیف‌های SENT قدیمی‌تر از retention_days پاک می‌شوند.
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_ms: int = OUTBOX_POLL_MS,
+        lease_s: int = OUTBOX_LEASE_S,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        retention_days: int = OUTBOX_RETENTION_DAYS,
+    ) -> None:
+        self.batch_size = batch_size
+        self.poll_s = poll_ms / 1000
+        self.lease = timedelta(seconds=lease_s)
+        self.max_attempts = max_attempts
+        self.retention = timedelta(days=retention_days)
+        self._session_factory = None
+        self._sender = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._leases: Dict[str, List[int]] = {}   # lease_owner دسته‌های در صف → idها
+        self._renew_task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, session_factory, sender) -> None:
+        """sender: utils.notify.Coalescer (متد submit با meta و done)."""
+        if self.running:
+            return
+        self._session_factory = session_factory
+        self._sender = sender
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="outbox-relay")
+        self._renew_task = asyncio.create_task(self._renew_loop(), name="outbox-lease-renew")
+
+    def wake(self) -> None:
+        """بعد از commit ردیف جدید صدا زده می‌شود تا relay منتظر poll بعدی نماند."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        برداشتن ردیف جدید متوقف، بافر ادغام فوراً ارسال و نتیجه ارسال‌های در جریان تا timeout ثانیه ثبت می‌شود؛
+        ردیف‌های اجاره‌شده‌ی ثبت‌نشده پس از انقضای اجاره دوباره برداشته می‌شوند.
+        """
+        if not self.running:
+            return
+        self._stop.set()
+        self._wake.set()
+        await self._task
+        self._task = None
+        self._sender.flush_all()
+        if self._inflight:
+            _, pending = await asyncio.wait(self._inflight, timeout=timeout)
+            if pending:
+                log.warning("outbox relay: %d batches unsettled after %.0fs; leased rows will be retried",
+                            len(pending), timeout)
+        self._renew_task.cancel()
+        self._renew_task = None
+        log.info("outbox relay stopped: %s", self.stats())
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed}
+
+    # ---------- حلقه relay ----------
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_purge = 0.0
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while not self._stop.is_set() and await self.relay_once() >= self.batch_size:
+                    pass
+                if loop.time() - last_purge >= _PURGE_EVERY_S:
+                    await self.purge()
+                    last_purge = loop.time()
+            except Exception:
+                log.exception("outbox relay iteration failed")
+
+    async def _renew_loop(self) -> None:
+        """تمدید اجاره ردیف‌هایی که هنوز در صف sender هستند (تا relay دیگری آن‌ها را دوباره برندارد)."""
+        interval = max(1.0, self.lease.total_seconds() / 3)
+        while True:
+            await asyncio.sleep(interval)
+            if not self._leases:
+                continue
+            try:
+                async with self._session_factory() as session:
+                    await session.execute(
+                        update(OutboxMessage)
+                        .where(OutboxMessage.lease_owner.in_(list(self._leases)), OutboxMessage.status == PENDING)
+                        .values(locked_until=datetime.utcnow() + self.lease)
+                        .execution_options(synchronize_session=False)
+                    )
+                    await session.commit()
+            except Exception:
+                log.exception("outbox relay: failed to renew %d leases", len(self._leases))
+
+    async def claim(self, session) -> List:
+        """
+        حداکثر batch_size ردیف آماده را اجاره می‌کند و
+        (id, chat_id, thread_id, text, meta, attempts, lease_owner) برمی‌گرداند.
+        ردیف‌هایی که همین relay هنوز در صف دارد کنار گذاشته می‌شوند.
+        """
+        now = datetime.utcnow()
+        lease_free = or_(OutboxMessage.locked_until.is_(None), OutboxMessage.locked_until < now)
+        queued = [i for ids in self._leases.values() for i in ids]
+        if queued:
+            lease_free = lease_free & OutboxMessage.id.notin_(queued)
+        q = (
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status == PENDING, OutboxMessage.available_at <= now, lease_free)
+            .order_by(OutboxMessage.id)
+            .limit(self.batch_size)
+        )
+        if session.bind.dialect.name == "postgresql":
+            q = q.with_for_update(skip_locked=True)
+        ids = list((await session.execute(q)).scalars())
+        if not ids:
+            await session.rollback()
+            return []
+
+        token = secrets.token_hex(8)
+        await session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), lease_free)
+            .values(locked_until=now + self.lease, lease_owner=token, attempts=OutboxMessage.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        res = await session.execute(
+            select(
+                OutboxMessage.id, OutboxMessage.chat_id, OutboxMessage.thread_id,
+                OutboxMessage.text, OutboxMessage.meta, OutboxMessage.attempts, OutboxMessage.lease_owner,
+            )
+            .where(OutboxMessage.lease_owner == token)
+            .order_by(OutboxMessage.id)
+        )
+        rows = res.all()
+        await session.commit()
+        self._leases[token] = [r.id for r in rows]
+        return rows
+
+    async def relay_once(self) -> int:
+        """
+        یک دور: اجاره و تحویل به sender؛ ثبت نتیجه در پس‌زمینه (_settle).
+        تعداد ردیف‌های برداشته‌شده را برمی‌گرداند.
+        """
+        while len(self._inflight) >= _MAX_INFLIGHT_BATCHES:
+            await asyncio.wait(self._inflight, return_when=asyncio.FIRST_COMPLETED)
+        async with self._session_factory() as session:
+            rows = await self.claim(session)
+        if not rows:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for r in rows:
+            fut = loop.create_future()
+            if not self._sender.submit(r.chat_id, r.text, r.thread_id, meta=r.meta, done=fut):
+                fut.set_result(False)
+            futures.append(fut)
+        task = asyncio.create_task(self._settle(rows, futures))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+        return len(rows)
+
+    async def _settle(self, rows: List, futures: List[asyncio.Future]) -> None:
+        try:
+            await self._mark(rows, await asyncio.gather(*futures))
+        except Exception:
+            log.exception("outbox relay: failed to record delivery of %d rows", len(rows))
+        finally:
+            self._leases.pop(rows[0].lease_owner, None)
+
+    async def _mark(self, rows: List, results: List[bool]) -> None:
+        """ثبت نتیجه؛ فقط ردیف‌هایی که هنوز اجاره همین دسته را دارند (ردیف دوباره‌اجاره‌شده دست نمی‌خورد)."""
+        now = datetime.utcnow()
+        owner = rows[0].lease_owner
+        sent_ids = [r.id for r, ok in zip(rows, results) if ok]
+        sent = 0
+        async with self._session_factory() as session:
+            if sent_ids:
+                res = await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(sent_ids), OutboxMessage.lease_owner == owner)
+                    .values(status=SENT, sent_at=now, locked_until=None, lease_owner=None)
+                    .execution_options(synchronize_session=False)
+                )
+                sent = res.rowcount or 0
+            for r, ok in zip(rows, results):
+                if ok:
+                    continue
+                failed = r.attempts >= self.max_attempts
+                if failed:
+                    values = {"status": FAILED, "last_error": "delivery failed"}
+                else:
+                    delay = min(3600, 5 * 2 ** (r.attempts - 1))
+                    values = {"available_at": now + timedelta(seconds=delay), "last_error": "delivery failed"}
+                res = await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id == r.id, OutboxMessage.lease_owner == owner)
+                    .values(locked_until=None, lease_owner=None, **values)
+                    .execution_options(synchronize_session=False)
+                )
+                if not res.rowcount:
+                    continue
+                if failed:
+                    self.failed += 1
+                    log.error("outbox: message %s failed after %d attempts", r.id, r.attempts)
+                else:
+                    self.retried += 1
+            await session.commit()
+        if sent < len(sent_ids):
+            log.warning("outbox relay: %d delivered rows were re-leased before settle", len(sent_ids) - sent)
+        self.sent += sent
+
+    async def purge(self) -> int:
+        async with self._session_factory() as session:
+            res = await session.execute(
+                delete(OutboxMessage)
+                .where(OutboxMessage.status == SENT, OutboxMessage.sent_at < datetime.utcnow() - self.retention)
+            )
+            await session.commit()
+        return res.rowcount or 0
+
+
+relay = OutboxRelay()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from config import REPORT_CACHE_MAX_ENTRIES, REPORT_CACHE_MAX_MB, REPORT_CACHE_TTL_S
+
+# وابستگی به «همه داده‌ها» (مثلاً گزارش هفتگی کل مشتری‌ها)؛ با هر bump عوض می‌شود
+ALL = ("*", None)
+
+Dep = Tuple[str, Optional[int]]   # ("client", 12) / ("staff", 3)
+Key = Tuple[str, Optional[int], Hashable]   # (kind, entity_id, period)
+
+
+class _Entry:
+    __slots__ = ("deps", "value", "size", "expires")
+
+    def __init__(self, deps: Tuple[Tuple[Dep, int], ...], value: Any, size: int, expires: float) -> None:
+        self.deps = deps
+        self.value = value
+        self.size = size
+        self.expires = expires
+
+
+def _sizeof(value: Any) -> int:
+    """تخمین حافظه گزارش رندرشده (رشته یا فهرست رشته‌ها)."""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ReportCache:
+    """
+    کش درون‌حافظه‌ای گزارش‌های رندرشده با کلید (kind, entity_id, period):
+    - هر موجودیت ("client", id) / ("staff", id) یک شماره نسخه دارد که توابع نوشتن crud بعد از commit بالا می‌برند
+      (bump)؛ ورودی کش نسخه وابستگی‌هایش را نگه می‌دارد و اگر یکی عوض شده باشد نتیجه کش نادیده گرفته می‌شود.
+      ALL به هر تغییری وابسته است.
+    - گزارشی که حین محاسبه‌اش نوشتنی رخ داده (begin/put) ذخیره نمی‌شود تا نسخه کهنه کش نشود.
+    - ttl سقف عمر است (پنجره‌های «۷ روز اخیر» با گذشت زمان جابه‌جا می‌شوند).
+    - LRU با OrderedDict، محدود به max_entries و max_bytes.
+    نسخه‌ها درون همین پروسه‌اند (مثل identity.cache).
+    """
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300.0) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._versions: Dict[Dep, int] = {}
+        self._global = 0
+        self._data: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- نسخه‌ها ----------
+    def _version(self, dep: Dep) -> int:
+        return self._global if dep == ALL else self._versions.get(dep, 0)
+
+    def bump(self, *deps: Dep) -> None:
+        """بعد از commit نوشتن‌ها: نسخه موجودیت‌های تغییرکرده (None ها نادیده) و ALL بالا می‌رود."""
+        for dep in deps:
+            if dep[1] is not None:
+                self._versions[dep] = self._versions.get(dep, 0) + 1
+        self._global += 1
+
+    def invalidate_all(self) -> None:
+        """تغییرات گروهی (مثل ورود دسته‌ای) که موجودیت‌هایشان مشخص نیست."""
+        self._data.clear()
+        self.bytes = 0
+        self._global += 1
+
+    # ---------- خواندن/نوشتن ----------
+    def get(self, kind: str, entity_id: Optional[int], period: Hashable) -> Optional[Any]:
+        key = (kind, entity_id, period)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires < time.monotonic() or any(self._version(d) != v for d, v in entry.deps):
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def begin(self) -> int:
+        """قبل از محاسبه گزارش صدا زده می‌شود؛ مقدار برگشتی به put داده می‌شود."""
+        return self._global
+
+    def put(
+        self, kind: str, entity_id: Optional[int], period: Hashable, value: Any,
+        deps: Iterable[Dep], since: int,
+    ) -> bool:
+        if since != self._global:
+            return False   # نوشتنی حین محاسبه رخ داده؛ ممکن است نتیجه کهنه باشد
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return False
+        key = (kind, entity_id, period)
+        self._drop(key)
+        self._data[key] = _Entry(
+            tuple((d, self._version(d)) for d in deps), value, size, time.monotonic() + self.ttl
+        )
+        self.bytes += size
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            _, old = self._data.popitem(last=False)
+            self.bytes -= old.size
+            self.evictions += 1
+        return True
+
+    def _drop(self, key: Key) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    # ---------- آمار ----------
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+cache = ReportCache(REPORT_CACHE_MAX_ENTRIES, REPORT_CACHE_MAX_MB * 1024 * 1024, REPORT_CACHE_TTL_S)
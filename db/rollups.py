@@ -0,0 +1,188 @@
+"""
+جداول تجمیع روزانه فعالیت/فروش.
+
+- create_activity / create_sale در همان تراکنش سطر روز مربوطه را افزایش می‌دهند.
+- برای ساخت دوباره از داده‌های خام:
+      python -m db.rollups
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, date, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import select, delete, insert, func, literal_column, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Activity, Sale, ClientDailyRollup, StaffDailyRollup
+
+
+def _dialect_insert(session: AsyncSession):
+    name = session.bind.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert
+    return None
+
+
+async def bump(session: AsyncSession, model, keys: dict, **incs) -> None:
+    """افزایش اتمیک ستون‌های شمارنده یک سطر rollup (بدون commit)."""
+    dialect_insert = _dialect_insert(session)
+    if dialect_insert is not None:
+        stmt = dialect_insert(model).values(**keys, **incs)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={k: getattr(model, k) + stmt.excluded[k] for k in incs},
+        )
+        await session.execute(stmt)
+        return
+
+    row = await session.get(model, tuple(keys.values()))
+    if row is None:
+        session.add(model(**keys, **incs))
+    else:
+        for k, v in incs.items():
+            setattr(row, k, (getattr(row, k) or 0) + v)
+
+
+async def bump_many(session: AsyncSession, model, key_names: tuple, rows: list) -> None:
+    """نسخه چندسطری bump (executemany)؛ همه ردیف‌ها باید ستون‌های یکسان داشته باشند."""
+    if not rows:
+        return
+    dialect_insert = _dialect_insert(session)
+    if dialect_insert is None:
+        for r in rows:
+            await bump(session, model, {k: r[k] for k in key_names}, **{k: v for k, v in r.items() if k not in key_names})
+        return
+    inc_names = [k for k in rows[0] if k not in key_names]
+    stmt = dialect_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_names),
+        set_={k: getattr(model, k) + stmt.excluded[k] for k in inc_names},
+    )
+    await session.execute(stmt, rows)
+
+
+async def on_activities_bulk(session: AsyncSession, rows: list) -> None:
+    by_client: dict = {}
+    by_staff: dict = {}
+    for r in rows:
+        day = r["ts"].date()
+        by_client[(r["client_id"], day)] = by_client.get((r["client_id"], day), 0) + 1
+        by_staff[(r["staff_id"], day)] = by_staff.get((r["staff_id"], day), 0) + 1
+    await bump_many(session, ClientDailyRollup, ("client_id", "day"), [
+        {"client_id": c, "day": d, "activity_count": n} for (c, d), n in by_client.items()
+    ])
+    await bump_many(session, StaffDailyRollup, ("staff_id", "day"), [
+        {"staff_id": s, "day": d, "activity_count": n} for (s, d), n in by_staff.items()
+    ])
+
+
+async def on_sales_bulk(session: AsyncSession, rows: list) -> None:
+    agg: dict = {}
+    for r in rows:
+        key = (r["client_id"], r["ts"].date())
+        total, cnt = agg.get(key, (0.0, 0))
+        agg[key] = (total + float(r["amount"] or 0.0), cnt + 1)
+    await bump_many(session, ClientDailyRollup, ("client_id", "day"), [
+        {"client_id": c, "day": d, "sales_sum": total, "sales_count": cnt} for (c, d), (total, cnt) in agg.items()
+    ])
+
+
+async def on_activity(session: AsyncSession, activity: Activity) -> None:
+    day = activity.ts.date()
+    await bump(session, ClientDailyRollup, {"client_id": activity.client_id, "day": day}, activity_count=1)
+    await bump(session, StaffDailyRollup, {"staff_id": activity.staff_id, "day": day}, activity_count=1)
+
+
+async def on_sale(session: AsyncSession, sale: Sale) -> None:
+    await bump(
+        session, ClientDailyRollup, {"client_id": sale.client_id, "day": sale.ts.date()},
+        sales_sum=float(sale.amount or 0.0), sales_count=1,
+    )
+
+
+def split_range(start_dt: datetime, end_dt: datetime) -> Tuple[Optional[date], Optional[date]]:
+    """
+    بازه [start_dt, end_dt) را به روزهای کامل [d0, d1) تقسیم می‌کند؛
+    باقی‌مانده‌های ابتدا/انتها باید از ردیف‌های خام خوانده شوند.
+    اگر هیچ روز کاملی نباشد (None, None) برمی‌گرداند.
+    """
+    d0 = start_dt.date()
+    if start_dt != datetime.combine(d0, datetime.min.time()):
+        d0 += timedelta(days=1)
+    d1 = end_dt.date()
+    if d0 >= d1:
+        return None, None
+    return d0, d1
+
+
+def day_start(d: date) -> datetime:
+    return datetime.combine(d, datetime.min.time())
+
+
+async def rebuild(session: AsyncSession) -> None:
+    """
+    پاک‌کردن و محاسبه دوباره همه rollupها از جداول خام؛ commit با فراخوان است
+    (مثلاً مهاجرت 0003 که با ردیف schema_migrations در یک تراکنش commit می‌شود).
+    """
+    await session.execute(delete(ClientDailyRollup))
+    await session.execute(delete(StaffDailyRollup))
+
+    acts = (
+        select(
+            Activity.client_id.label("client_id"),
+            func.date(Activity.ts).label("day"),
+            func.count().label("activity_count"),
+            literal_column("0.0").label("sales_sum"),
+            literal_column("0").label("sales_count"),
+        )
+        .group_by(Activity.client_id, func.date(Activity.ts))
+    )
+    sales = (
+        select(
+            Sale.client_id,
+            func.date(Sale.ts),
+            literal_column("0"),
+            func.sum(Sale.amount),
+            func.count(),
+        )
+        .group_by(Sale.client_id, func.date(Sale.ts))
+    )
+    u = union_all(acts, sales).subquery()
+    await session.execute(
+        insert(ClientDailyRollup).from_select(
+            ["client_id", "day", "activity_count", "sales_sum", "sales_count"],
+            select(
+                u.c.client_id, u.c.day,
+                func.sum(u.c.activity_count), func.sum(u.c.sales_sum), func.sum(u.c.sales_count),
+            ).group_by(u.c.client_id, u.c.day),
+        )
+    )
+    await session.execute(
+        insert(StaffDailyRollup).from_select(
+            ["staff_id", "day", "activity_count"],
+            select(Activity.staff_id, func.date(Activity.ts), func.count())
+            .group_by(Activity.staff_id, func.date(Activity.ts)),
+        )
+    )
+
+
+async def _main() -> None:
+    from .base import AsyncSessionLocal, engine
+    from .models import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        await rebuild(session)
+        await session.commit()
+    await engine.dispose()
+    print("✅ rollups rebuilt")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
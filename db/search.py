@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from heapq import nsmallest
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Client
+from utils.validators import normalize_search
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ClientSearchIndex:
+    """
+    ایندکس درون‌حافظه‌ای نام مشتری‌ها برای جستجوی inline.
+    - نام‌ها با normalize_search یکسان‌سازی می‌شوند (ی/ک عربی، نیم‌فاصله، ارقام).
+    - دو آرایه مرتب برای پیشوند: از ابتدای نام (_heads) و از ابتدای هر کلمه بعدی (_tails)؛
+      جستجوی پیشوندی با bisect در O(log n + limit).
+    - postingهای سه‌حرفی (trigram) برای تطبیق وسط کلمه، وقتی پیشوندها کافی نباشند.
+    - جستجوی نیرو فقط روی مشتری‌های خودش (معمولاً چند صد) به صورت خطی.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+        self.ready = False
+
+    def _reset(self) -> None:
+        self._name: Dict[int, str] = {}          # client_id -> نام یکسان‌شده
+        self._display: Dict[int, str] = {}       # client_id -> نام اصلی
+        self._staff: Dict[int, Optional[int]] = {}
+        self._by_staff: Dict[int, Set[int]] = {}
+        self._heads: List[Tuple[str, int]] = []  # (نام، id)
+        self._tails: List[Tuple[str, int]] = []  # (ادامه نام از کلمه دوم به بعد، id)
+        self._grams: Dict[str, Set[int]] = {}
+
+    # ---------- ساخت/به‌روزرسانی ----------
+    def rebuild(self, rows) -> None:
+        """rows: (id, business_name, assigned_staff_id)"""
+        self._reset()
+        heads, tails = [], []
+        for cid, name, staff_id in rows:
+            heads.append(self._register(cid, name, staff_id, tails))
+        heads.sort()
+        tails.sort()
+        self._heads, self._tails = heads, tails
+        self.ready = True
+
+    def invalidate(self) -> None:
+        self.ready = False
+
+    def _register(self, cid: int, name: Optional[str], staff_id: Optional[int], tails: list) -> Tuple[str, int]:
+        norm = normalize_search(name or "")
+        self._name[cid] = norm
+        self._display[cid] = name or ""
+        self._set_staff(cid, staff_id)
+        for i, ch in enumerate(norm):
+            if ch == " ":
+                tails.append((norm[i + 1:], cid))
+        for g in _trigrams(norm):
+            self._grams.setdefault(g, set()).add(cid)
+        return (norm, cid)
+
+    def _set_staff(self, cid: int, staff_id: Optional[int]) -> None:
+        old = self._staff.get(cid)
+        if old is not None:
+            self._by_staff.get(old, set()).discard(cid)
+        self._staff[cid] = staff_id
+        if staff_id is not None:
+            self._by_staff.setdefault(staff_id, set()).add(cid)
+
+    def add(self, cid: int, name: Optional[str], staff_id: Optional[int]) -> None:
+        if not self.ready or cid in self._name:
+            return
+        tails: list = []
+        insort(self._heads, self._register(cid, name, staff_id, tails))
+        for t in tails:
+            insort(self._tails, t)
+
+    def move(self, cid: int, staff_id: Optional[int]) -> None:
+        if self.ready and cid in self._name:
+            self._set_staff(cid, staff_id)
+
+    # ---------- جستجو ----------
+    def __len__(self) -> int:
+        return len(self._name)
+
+    def display_name(self, cid: int) -> str:
+        return self._display.get(cid, "")
+
+    def staff_of(self, cid: int) -> Optional[int]:
+        return self._staff.get(cid)
+
+    def search(self, query: str, staff_id: Optional[int] = None, limit: int = 20) -> List[int]:
+        """شناسه مشتری‌های منطبق به ترتیب: پیشوند نام، پیشوند کلمه، وسط کلمه. staff_id: فقط مشتری‌های آن نیرو."""
+        q = normalize_search(query)
+        if staff_id is not None:
+            return self._search_scoped(q, self._by_staff.get(staff_id, set()), limit)
+        if not q:
+            return []
+
+        out: List[int] = []
+        seen: Set[int] = set()
+        for entries in (self._heads, self._tails):
+            i = bisect_left(entries, (q,))
+            while i < len(entries) and len(out) < limit:
+                key, cid = entries[i]
+                if not key.startswith(q):
+                    break
+                if cid not in seen:
+                    seen.add(cid)
+                    out.append(cid)
+                i += 1
+        if len(out) < limit and len(q) >= 3:
+            out += self._infix(q, seen, limit - len(out))
+        return out
+
+    def _infix(self, q: str, seen: Set[int], need: int) -> List[int]:
+        postings = sorted((self._grams.get(g, set()) for g in _trigrams(q)), key=len)
+        if not postings or not postings[0]:
+            return []
+        first, rest = postings[0], postings[1:]
+        found = []
+        for cid in first:
+            if cid in seen or any(cid not in p for p in rest):
+                continue
+            if q in self._name[cid]:
+                found.append(cid)
+                if len(found) >= need:
+                    break
+        return sorted(found, key=lambda c: (self._name[c], c))
+
+    def _search_scoped(self, q: str, ids: Set[int], limit: int) -> List[int]:
+        names = self._name
+
+        def rank(cid: int):
+            name = names[cid]
+            if name.startswith(q):
+                return (0, name, cid)
+            if f" {q}" in name:
+                return (1, name, cid)
+            return (2, name, cid)
+
+        matches = [cid for cid in ids if q in names[cid]] if q else list(ids)
+        return nsmallest(limit, matches, key=rank)
+
+
+# نمونه سراسری مورد استفاده در crud و هندلرها
+index = ClientSearchIndex()
+
+
+async def ensure_index(session: AsyncSession) -> ClientSearchIndex:
+    if not index.ready:
+        res = await session.execute(select(Client.id, Client.business_name, Client.assigned_staff_id))
+        index.rebuild(res.tuples())
+    return index
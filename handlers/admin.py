@@ -2,19 +2,19 @@ from __future__ import annotations
 
 import io
 import csv
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 
 from aiogram import Router, types, F
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
 
 from db.base import AsyncSessionLocal
-from db import crud
+from db import crud, report_cache
 from utils.constants import (
     ROLE_STAFF, ROLE_ADMIN,
     STATUS_ACTIVE,
     KPI_YELLOW_RATIO, KPI_RED_RATIO,
-    INACTIVITY_WARN_DAYS, FEEDBACK_WARN_SCORE,
 )
 from keyboards.admin import (
     admin_main_kb, admin_setup_kb,
@@ -24,19 +24,26 @@ from keyboards.admin import (
     report_clients_kb, report_staff_kb,
     back_to_clients_reports_kb, back_to_staff_reports_kb,
     sales_clients_kb,  # ✅ برای ثبت فروش
+    bulk_import_kinds_kb,
     # --- جدید برای KPI مارکتینگ ---
     admin_mkt_kpi_root_kb,
     admin_mkt_kpi_metrics_kb,
     mkt_kpi_report_scope_kb,
     back_to_mkt_kpi_kb,
 )
-from keyboards.common import back_reply_kb, confirm_inline_kb, BACK_TEXT
+from keyboards.common import (
+    back_reply_kb, confirm_inline_kb, BACK_TEXT, PAGE_CB_PREFIX, parse_page_cb,
+    REPORT_PAGE_CB_PREFIX, report_pages_kb, parse_report_page_cb,
+)
 from utils.ui import edit_or_send
-from config import SALES_WARN_THRESHOLD  # ✅ آستانه هشدار فروش
+from utils.notify import sale_message
 
 # --- سرویس KPI مارکتینگ + اعتبارسنجی عدد ---
 from services import kpi as kpi_service
-from utils.validators import parse_numeric
+from services import export as export_service
+from services import importer as import_service
+from services import reports as report_service
+from utils.validators import parse_numeric, normalize_digits
 
 router = Router()
 
@@ -44,6 +51,33 @@ router = Router()
 # -------------------------
 # ناوبری پنل مدیر
 # -------------------------
+# صفحه‌بندی کیبوردهای انتخاب مشتری: pager → سازنده کیبورد
+_CLIENT_PICKERS = {
+    "adm_kpi": clients_inline_kb_for_kpi,
+    "adm_asgc": assign_clients_kb,
+    "adm_rptc": report_clients_kb,
+    "adm_sale": sales_clients_kb,
+}
+
+
+@router.callback_query(F.data.startswith(f"{PAGE_CB_PREFIX}adm_"))
+async def admin_picker_page(cb: types.CallbackQuery):
+    pager, direction, cursor = parse_page_cb(cb.data)
+    async with AsyncSessionLocal() as session:
+        if pager == "adm_asgs":
+            page, loads = await crud.page_staff_with_load(session, cursor, direction)
+            kb = assign_staff_kb(page, loads, include_auto=True)
+        elif pager == "adm_rpts":
+            kb = report_staff_kb(await crud.page_staff_options(session, cursor, direction))
+        else:
+            kb = _CLIENT_PICKERS[pager](await crud.page_client_options(session, cursor, direction))
+    try:
+        await cb.message.edit_reply_markup(reply_markup=kb)
+    except TelegramBadRequest:
+        pass
+    await cb.answer()
+
+
 @router.callback_query(F.data == "admin_back_main")
 async def admin_back_main(cb: types.CallbackQuery, state: FSMContext):
     await state.clear()
@@ -243,7 +277,7 @@ async def add_staff_confirm_or_cancel(cb: types.CallbackQuery, state: FSMContext
         return
 
     async with AsyncSessionLocal() as session:
-        user = await crud.create_user(
+        await crud.create_user(
             session,
             telegram_id=data["telegram_id"],
             role=data["role"],
@@ -253,8 +287,8 @@ async def add_staff_confirm_or_cancel(cb: types.CallbackQuery, state: FSMContext
             skills=data.get("skills"),
             max_capacity=data.get("max_capacity"),
             status=data["status"],
+            audit={"diff_json": data},
         )
-        await crud.log_action(session, action="CREATE", entity="User", entity_id=user.id, diff_json=data)
 
     await state.clear()
     await edit_or_send(cb, "✅ نیروی جدید با موفقیت ثبت شد.\nبازگشت به راه‌اندازی اولیه:", admin_setup_kb())
@@ -462,7 +496,7 @@ async def add_client_confirm_or_cancel(cb: types.CallbackQuery, state: FSMContex
 
     data = await state.get_data()
     async with AsyncSessionLocal() as session:
-        client = await crud.create_client(
+        await crud.create_client(
             session,
             business_name=data["business_name"],
             industry=data.get("industry"),
@@ -475,13 +509,96 @@ async def add_client_confirm_or_cancel(cb: types.CallbackQuery, state: FSMContex
             notes=data.get("notes"),
             status=data["status"],
             telegram_id=data["telegram_id"],
+            audit={"diff_json": data},
         )
-        await crud.log_action(session, action="CREATE", entity="Client", entity_id=client.id, diff_json=data)
 
     await state.clear()
     await edit_or_send(cb, "✅ مشتری جدید ثبت شد.\nبازگشت به راه‌اندازی اولیه:", admin_setup_kb())
 
 
+# -----------------------------
+# 📥 ورود گروهی از فایل (CSV/XLSX)
+# -----------------------------
+class BulkImport(StatesGroup):
+    waiting_file = State()
+
+
+@router.callback_query(F.data == "admin_bulk_import")
+async def bulk_import_start(cb: types.CallbackQuery, state: FSMContext):
+    await state.clear()
+    await edit_or_send(cb, "📥 نوع داده برای ورود گروهی را انتخاب کنید:", bulk_import_kinds_kb())
+
+
+@router.callback_query(F.data.startswith("bulk_kind:"))
+async def bulk_import_pick_kind(cb: types.CallbackQuery, state: FSMContext):
+    kind = cb.data.split(":", 1)[1]
+    if kind not in import_service.IMPORT_KINDS:
+        await cb.answer("نوع نامعتبر", show_alert=True)
+        return
+    await state.set_state(BulkImport.waiting_file)
+    await state.update_data(kind=kind)
+    columns = import_service.IMPORT_KINDS[kind][2]
+    await cb.message.answer(
+        "فایل CSV یا XLSX را بفرستید. سطر اول باید نام ستون‌ها باشد:\n"
+        f"<code>{columns}</code>\n"
+        "تاریخ‌ها به شکل YYYY-MM-DD HH:MM؛ فهرست‌ها با کاما جدا شوند.",
+        reply_markup=back_reply_kb(),
+    )
+
+
+@router.message(BulkImport.waiting_file, F.document)
+async def bulk_import_file(msg: types.Message, state: FSMContext):
+    data = await state.get_data()
+    kind = data["kind"]
+    doc = msg.document
+    await msg.answer("⏳ در حال پردازش فایل…")
+
+    buf = await msg.bot.download(doc)
+    async with AsyncSessionLocal() as session:
+        me = await crud.get_user_by_telegram_id(session, msg.from_user.id)
+        report = await import_service.run_import(
+            session, kind, buf, doc.file_name or "",
+            actor_user_id=me.id if me else None,
+        )
+
+    if report.aborted_at is not None and report.total == 0:
+        # فایل از ابتدا خوانده نشد (نوع/قالب نامعتبر)؛ چیزی درج نشده و می‌توان فایل دیگری فرستاد
+        await msg.answer(f"❌ {report.abort_reason}")
+        return
+
+    await state.clear()
+    if report.aborted_at is not None:
+        lines = [
+            f"⚠️ ورود گروهی ({kind}) در سطر {report.aborted_at} متوقف شد: {report.abort_reason}",
+            f"سطرهای قبل از {report.aborted_at} پردازش شده‌اند؛ برای ادامه فقط سطرهای از {report.aborted_at} "
+            "به بعد را دوباره بفرستید (ارسال دوباره کل فایل سطرهای درج‌شده را تکرار می‌کند).",
+        ]
+    else:
+        lines = [f"✅ ورود گروهی ({kind}) انجام شد."]
+    lines += [
+        f"• سطرهای فایل: {report.total}",
+        f"• درج‌شده: {report.inserted} (در {report.batches} دسته)",
+        f"• خطادار: {report.error_count}",
+        f"• سرعت: {report.rows_per_s:.0f} سطر/ثانیه",
+    ]
+    if report.errors:
+        lines.append("\nنمونه خطاها:")
+        lines += [f"  سطر {row_no}: {err}" for row_no, err in report.errors]
+        if report.error_count > len(report.errors):
+            lines.append(f"  … و {report.error_count - len(report.errors)} خطای دیگر")
+    await msg.answer("\n".join(lines))
+    await msg.answer("بازگشت به راه‌اندازی اولیه:", reply_markup=admin_setup_kb())
+
+
+@router.message(BulkImport.waiting_file)
+async def bulk_import_not_file(msg: types.Message, state: FSMContext):
+    if msg.text == BACK_TEXT:
+        await state.clear()
+        await msg.answer("بازگشت به راه‌اندازی اولیه:", reply_markup=admin_setup_kb())
+        return
+    await msg.answer("❌ لطفاً فایل CSV یا XLSX را به صورت Document بفرستید.")
+
+
 # -----------------------------
 # تخصیص مشتری به نیرو (دکمه‌ای)
 # -----------------------------
@@ -493,13 +610,13 @@ class AssignClient(StatesGroup):
 @router.callback_query(F.data == "admin_assign")
 async def assign_start(cb: types.CallbackQuery, state: FSMContext):
     async with AsyncSessionLocal() as session:
-        clients = await crud.list_all_clients(session)
-    if not clients:
+        page = await crud.page_client_options(session)
+    if not page.items:
         await edit_or_send(cb, "هیچ مشتری‌ای ثبت نشده است.", admin_setup_kb())
         return
 
     await state.set_state(AssignClient.pick_client)
-    await edit_or_send(cb, "یک مشتری را انتخاب کنید:", assign_clients_kb(clients))
+    await edit_or_send(cb, "یک مشتری را انتخاب کنید:", assign_clients_kb(page))
 
 
 @router.callback_query(AssignClient.pick_client, F.data.startswith("assign_pick_client:"))
@@ -508,21 +625,13 @@ async def assign_pick_client(cb: types.CallbackQuery, state: FSMContext):
     await state.update_data(client_id=client_id)
 
     async with AsyncSessionLocal() as session:
-        staff_tuples = await crud.list_staff_with_capacity(session)
-        if not staff_tuples:
-            staff_all = await crud.list_staff_active(session)
-            tuples = []
-            for s in staff_all:
-                cur = await crud.count_clients_for_staff(session, s.id)
-                cap = int(s.max_capacity or 0)
-                tuples.append((s, cur, cap))
-            staff_tuples = tuples
+        page, loads = await crud.page_staff_with_load(session)
 
     await state.set_state(AssignClient.pick_staff)
     await edit_or_send(
         cb,
         "حالا یک نیرو را انتخاب کنید (یا روی «🤖 تخصیص خودکار» بزنید):",
-        assign_staff_kb(staff_tuples, include_auto=True)
+        assign_staff_kb(page, loads, include_auto=True)
     )
 
 
@@ -590,12 +699,12 @@ class KPISet(StatesGroup):
 @router.callback_query(F.data == "admin_kpi_set_client")
 async def kpi_pick_client_menu(cb: types.CallbackQuery, state: FSMContext):
     async with AsyncSessionLocal() as session:
-        clients = await crud.list_all_clients(session)
-    if not clients:
+        page = await crud.page_client_options(session)
+    if not page.items:
         await edit_or_send(cb, "هیچ مشتری‌ای ثبت نشده است.", admin_kpi_kb())
         return
     await state.set_state(KPISet.pick_client)
-    await edit_or_send(cb, "مشتری را برای تنظیم KPI انتخاب کنید:", clients_inline_kb_for_kpi(clients))
+    await edit_or_send(cb, "مشتری را برای تنظیم KPI انتخاب کنید:", clients_inline_kb_for_kpi(page))
 
 
 @router.callback_query(KPISet.pick_client, F.data.startswith("kpi_pick_client:"))
@@ -730,6 +839,16 @@ async def admin_mkt_kpi_report_scope(cb: types.CallbackQuery, state: FSMContext)
     await edit_or_send(cb, text, back_to_mkt_kpi_kb())
 
 
+@router.callback_query(F.data.startswith("mkt_kpi_trend:"))
+async def admin_mkt_kpi_trend(cb: types.CallbackQuery, state: FSMContext):
+    scope = cb.data.split(":",1)[1]  # weekly|monthly
+    async with AsyncSessionLocal() as session:
+        trend = await kpi_service.trend_matrix(session, scope=scope, week_start=0)
+    ps, pe = trend.periods[-1]
+    text = kpi_service.format_report_text(scope, ps, pe, trend.current(), trend=trend)
+    await _send_report(cb, text.split("\n"), back_to_mkt_kpi_kb())
+
+
 # -----------------------------
 # 💰 ثبت فروش جدید (فقط مدیر)
 # -----------------------------
@@ -744,12 +863,12 @@ class AddSale(StatesGroup):
 @router.callback_query(F.data == "admin_add_sale")
 async def admin_add_sale_start(cb: types.CallbackQuery, state: FSMContext):
     async with AsyncSessionLocal() as session:
-        clients = await crud.list_all_clients(session)
-    if not clients:
+        page = await crud.page_client_options(session)
+    if not page.items:
         await edit_or_send(cb, "هیچ مشتری‌ای ثبت نشده است.", admin_main_kb())
         return
     await state.set_state(AddSale.pick_client)
-    await edit_or_send(cb, "برای ثبت فروش، مشتری را انتخاب کنید:", sales_clients_kb(clients))
+    await edit_or_send(cb, "برای ثبت فروش، مشتری را انتخاب کنید:", sales_clients_kb(page))
 
 @router.callback_query(AddSale.pick_client, F.data.startswith("sale_pick_client:"))
 async def admin_add_sale_pick_client(cb: types.CallbackQuery, state: FSMContext):
@@ -848,15 +967,23 @@ async def admin_add_sale_confirm(cb: types.CallbackQuery, state: FSMContext):
         return
 
     async with AsyncSessionLocal() as session:
-        s = await crud.create_sale(
+        await crud.create_sale(
             session,
             client_id=int(data["client_id"]),
             ts=datetime.fromisoformat(data["ts"]),
             amount=float(data["amount"]),
             source=data.get("source"),
             note=data.get("note"),
+            audit={"diff_json": data},
+            notify=sale_message(
+                client_name=data.get("client_name"),
+                amount=float(data["amount"]),
+                ts=data["ts"],
+                source=data.get("source"),
+                note=data.get("note"),
+                actor_name=cb.from_user.full_name,
+            ),
         )
-        await crud.log_action(session, action="CREATE", entity="Sale", entity_id=s.id, diff_json=data)
 
     await state.clear()
     await edit_or_send(cb, "✅ فروش ثبت شد.", admin_main_kb())
@@ -865,99 +992,116 @@ async def admin_add_sale_confirm(cb: types.CallbackQuery, state: FSMContext):
 # -----------------------------
 # 📊 گزارش‌ها (هفتگی/مشتری/نیرو) + خروجی CSV
 # -----------------------------
+async def _send_report(cb: types.CallbackQuery, chunks, reply_markup, sep: str = "\n"):
+    """
+    گزارش را صفحه‌بندی می‌کند؛ اگر بیش از یک صفحه شود، صفحه‌ها در report_service.pages کش
+    و صفحه اول با دکمه‌های قبلی/بعدی نمایش داده می‌شود.
+    """
+    report_id, pages = report_service.pages.build(chunks, reply_markup, sep)
+    if report_id is None:
+        await edit_or_send(cb, pages[0], reply_markup)
+        return
+    await edit_or_send(
+        cb, report_service.pages.page_text(pages, 0), report_pages_kb(report_id, 0, len(pages), reply_markup)
+    )
+
+
+@router.callback_query(F.data.startswith(REPORT_PAGE_CB_PREFIX))
+async def admin_report_page(cb: types.CallbackQuery, state: FSMContext):
+    """ورق زدن گزارش از کش صفحه‌ها (بدون کوئری)."""
+    report_id, page = parse_report_page_cb(cb.data)
+    cached = report_service.pages.get(report_id)
+    if cached is None:
+        await cb.answer("⌛️ این گزارش منقضی شده است؛ دوباره از منوی گزارش‌ها دریافت کنید.", show_alert=True)
+        return
+    pages, markup = cached
+    page = max(0, min(page, len(pages) - 1))
+    await edit_or_send(
+        cb, report_service.pages.page_text(pages, page), report_pages_kb(report_id, page, len(pages), markup)
+    )
+    await cb.answer()
+
+
 @router.callback_query(F.data == "admin_reports_weekly")
 async def admin_report_weekly(cb: types.CallbackQuery, state: FSMContext):
+    """آخرین گزارش هفتگی ساخته‌شده توسط زمان‌بند (بدون محاسبه)؛ اگر هنوز نیست، محاسبه ۷ روز اخیر."""
+    async with AsyncSessionLocal() as session:
+        snap = await crud.get_latest_report_snapshot(session, report_service.WEEKLY)
+    if snap is None:
+        await admin_report_weekly_live(cb, state)
+        return
+    # بلوک‌های متن ذخیره‌شده با خط خالی از هم جدا شده‌اند
+    await _send_report(cb, snap.text.split("\n\n"), admin_reports_kb(weekly_live=True), sep="\n\n")
+
+
+# گزارش‌های زنده «۷ روز اخیر»؛ پنجره با زمان جابه‌جا می‌شود و ttl کش آن را محدود می‌کند
+REPORT_PERIOD = "7d"
+
+
+async def _cached_report(kind: str, entity_id, build):
+    """
+    خطوط گزارش از report_cache؛ در صورت نبود/باطل‌شدن، build(session, entity_id) اجرا می‌شود که
+    (lines, deps) یا None (موجودیت یافت نشد) برمی‌گرداند. deps موجودیت‌هایی است که گزارش به آن‌ها وابسته است.
+    """
+    lines = report_cache.cache.get(kind, entity_id, REPORT_PERIOD)
+    if lines is not None:
+        return lines
+    since = report_cache.cache.begin()
+    async with AsyncSessionLocal() as session:
+        built = await build(session, entity_id)
+    if built is None:
+        return None
+    lines, deps = built
+    report_cache.cache.put(kind, entity_id, REPORT_PERIOD, lines, deps, since)
+    return lines
+
+
+async def _weekly_live_lines(session, _=None):
     end_dt = datetime.utcnow()
     start_dt = end_dt - timedelta(days=7)
+    rows = await crud.list_client_summaries(session, start_dt, end_dt)
+    if not rows:
+        return None
+    return list(report_service.weekly_lines(rows, end_dt, [])), [report_cache.ALL]
 
-    async with AsyncSessionLocal() as session:
-        clients = await crud.list_all_clients(session)
-        if not clients:
-            await edit_or_send(cb, "هیچ مشتری‌ای ثبت نشده است.", admin_reports_kb())
-            return
 
-        lines = ["📊 گزارش هفتگی مشتریان\n"]
-        warn_lines = []
-
-        for c in clients:
-            kpi = await crud.get_client_kpi(session, c.id)
-            target = (kpi.target_per_week if kpi else 0)
-
-            acts = await crud.count_activities_in_range(session, c.id, start_dt, end_dt)
-            fb_avg = await crud.avg_feedback_for_client(session, c.id)
-            last_ts = await crud.last_activity_ts(session, c.id)
-            sales_sum = await crud.sum_sales_in_range(session, c.id, start_dt, end_dt)  # ✅ جمع فروش ۷روز
-
-            status_emoji = "⚪️"
-            if target > 0:
-                ratio = acts / max(target, 1)
-                if ratio >= 1.0:
-                    status_emoji = "🟢"
-                elif ratio >= KPI_YELLOW_RATIO:
-                    status_emoji = "🟡"
-                else:
-                    status_emoji = "🔴"
-
-            fb_h = f"{fb_avg:.2f}" if fb_avg is not None else "-"
-            last_h = last_ts.strftime("%Y-%m-%d") if last_ts else "-"
-            sales_h = f"{sales_sum:,.0f}"
-
-            lines.append(
-                f"\n1️⃣ مشتری: {c.business_name}\n"
-                f"- وضعیت: {status_emoji}\n"
-                f"- KPI فعلی (۷روز): {acts} / {target}\n"
-                f"- فروش (۷روز): {sales_h}\n"
-                f"- بازخورد: {fb_h}\n"
-                f"- آخرین فعالیت: {last_h}"
-            )
-
-            # هشدارها
-            if fb_avg is not None and fb_avg < FEEDBACK_WARN_SCORE:
-                warn_lines.append(f"• رضایت پایین‌تر از آستانه ({c.business_name}): {fb_h}")
-            if last_ts is None or (end_dt - last_ts).days > INACTIVITY_WARN_DAYS:
-                days = (end_dt - last_ts).days if last_ts else "∞"
-                warn_lines.append(f"• عدم فعالیت نیرو > {INACTIVITY_WARN_DAYS} روز ({c.business_name}): {days} روز")
-            if SALES_WARN_THRESHOLD > 0 and sales_sum < SALES_WARN_THRESHOLD:
-                warn_lines.append(f"• فروش هفتگی پایین‌تر از آستانه ({c.business_name}): {sales_h} < {SALES_WARN_THRESHOLD:,.0f}")
-
-        if warn_lines:
-            lines.append("\n⚠️ هشدارها:")
-            lines.extend([f"- {w}" for w in warn_lines])
-
-        await edit_or_send(cb, "\n".join(lines), admin_reports_kb())
+@router.callback_query(F.data == "admin_reports_weekly_live")
+async def admin_report_weekly_live(cb: types.CallbackQuery, state: FSMContext):
+    lines = await _cached_report("weekly", None, _weekly_live_lines)
+    if lines is None:
+        await edit_or_send(cb, "هیچ مشتری‌ای ثبت نشده است.", admin_reports_kb())
+        return
+
+    await _send_report(cb, lines, admin_reports_kb())
 
 
 @router.callback_query(F.data == "admin_reports_clients")
 async def admin_reports_clients(cb: types.CallbackQuery, state: FSMContext):
     async with AsyncSessionLocal() as session:
-        clients = await crud.list_all_clients(session)
-    if not clients:
+        page = await crud.page_client_options(session)
+    if not page.items:
         await edit_or_send(cb, "هیچ مشتری‌ای ثبت نشده است.", admin_reports_kb())
         return
-    await edit_or_send(cb, "یک مشتری را انتخاب کنید:", report_clients_kb(clients))
+    await edit_or_send(cb, "یک مشتری را انتخاب کنید:", report_clients_kb(page))
 
 
-@router.callback_query(F.data.startswith("report_client:"))
-async def admin_report_one_client(cb: types.CallbackQuery, state: FSMContext):
-    client_id = int(cb.data.split(":")[1])
+async def _client_report_lines(session, client_id: int):
     end_dt = datetime.utcnow()
     start_dt = end_dt - timedelta(days=7)
 
-    async with AsyncSessionLocal() as session:
-        c = await crud.get_client_by_id(session, client_id)
-        if not c:
-            await edit_or_send(cb, "❌ مشتری یافت نشد.", admin_reports_kb())
-            return
-        kpi = await crud.get_client_kpi(session, client_id)
-        target = (kpi.target_per_week if kpi else 0)
-        acts_7d = await crud.count_activities_in_range(session, client_id, start_dt, end_dt)
-        fb_avg = await crud.avg_feedback_for_client(session, client_id)
-        last_ts = await crud.last_activity_ts(session, client_id)
-        sales_7d = await crud.sum_sales_in_range(session, client_id, start_dt, end_dt)  # ✅ فروش ۷روز
-        staff = await crud.get_user_by_id(session, c.assigned_staff_id) if c.assigned_staff_id else None
-        recent_acts = await crud.list_recent_activities_for_client(session, client_id, limit=10)
-        recent_fb = await crud.list_recent_feedback_for_client(session, client_id, limit=10)
-        recent_sales = await crud.list_recent_sales_for_client(session, client_id, limit=10)  # ✅ فروش‌های اخیر
+    c = await crud.get_client_by_id(session, client_id)
+    if not c:
+        return None
+    kpi = await crud.get_client_kpi(session, client_id)
+    target = (kpi.target_per_week if kpi else 0)
+    acts_7d = await crud.count_activities_in_range(session, client_id, start_dt, end_dt)
+    fb_avg = await crud.avg_feedback_for_client(session, client_id)
+    last_ts = await crud.last_activity_ts(session, client_id)
+    sales_7d = await crud.sum_sales_in_range(session, client_id, start_dt, end_dt)  # ✅ فروش ۷روز
+    staff = await crud.get_user_by_id(session, c.assigned_staff_id) if c.assigned_staff_id else None
+    recent_acts = await crud.list_recent_activities_for_client(session, client_id, limit=10)
+    recent_fb = await crud.list_recent_feedback_for_client(session, client_id, limit=10)
+    recent_sales = await crud.list_recent_sales_for_client(session, client_id, limit=10)  # ✅ فروش‌های اخیر
 
     status_emoji = "⚪️"
     if target > 0:
@@ -1018,36 +1162,42 @@ async def admin_report_one_client(cb: types.CallbackQuery, state: FSMContext):
             comment = getattr(f, "comment", None) or "-"
             lines.append(f"• {ts_h} — {stars} ({score}/5) — {comment}")
 
-    await edit_or_send(cb, "\n".join(lines), back_to_clients_reports_kb())
+    return lines, [("client", client_id)]
+
+
+@router.callback_query(F.data.startswith("report_client:"))
+async def admin_report_one_client(cb: types.CallbackQuery, state: FSMContext):
+    client_id = int(cb.data.split(":")[1])
+    lines = await _cached_report("client", client_id, _client_report_lines)
+    if lines is None:
+        await edit_or_send(cb, "❌ مشتری یافت نشد.", admin_reports_kb())
+        return
+    await _send_report(cb, lines, back_to_clients_reports_kb())
 
 
 @router.callback_query(F.data == "admin_reports_staff")
 async def admin_reports_staff(cb: types.CallbackQuery, state: FSMContext):
     async with AsyncSessionLocal() as session:
-        staff = await crud.list_staff_active(session)
-    if not staff:
+        page = await crud.page_staff_options(session)
+    if not page.items:
         await edit_or_send(cb, "هیچ نیروی فعالی ثبت نشده است.", admin_reports_kb())
         return
-    await edit_or_send(cb, "یک نیرو را انتخاب کنید:", report_staff_kb(staff))
+    await edit_or_send(cb, "یک نیرو را انتخاب کنید:", report_staff_kb(page))
 
 
-@router.callback_query(F.data.startswith("report_staff:"))
-async def admin_report_one_staff(cb: types.CallbackQuery, state: FSMContext):
-    staff_id = int(cb.data.split(":")[1])
+async def _staff_report_lines(session, staff_id: int):
     end_dt = datetime.utcnow()
     start_dt = end_dt - timedelta(days=7)
 
-    async with AsyncSessionLocal() as session:
-        s = await crud.get_user_by_id(session, staff_id)
-        if not s:
-            await edit_or_send(cb, "❌ نیرو یافت نشد.", admin_reports_kb())
-            return
-        acts_7d = await crud.count_activities_in_range_by_staff(session, staff_id, start_dt, end_dt)
-        clients = await crud.list_clients_for_staff(session, staff_id)
-        fb_avg = await crud.avg_feedback_for_staff_clients(session, staff_id)
-        last_ts = await crud.last_activity_ts_for_staff(session, staff_id)
-        recent_acts = await crud.list_recent_activities_for_staff(session, staff_id, limit=10)
-        sales_sum = await crud.sum_sales_in_range_for_staff(session, staff_id, start_dt, end_dt)  # ✅ فروش ۷روز
+    s = await crud.get_user_by_id(session, staff_id)
+    if not s:
+        return None
+    acts_7d = await crud.count_activities_in_range_by_staff(session, staff_id, start_dt, end_dt)
+    clients = await crud.list_client_options(session, staff_id=staff_id)
+    fb_avg = await crud.avg_feedback_for_staff_clients(session, staff_id)
+    last_ts = await crud.last_activity_ts_for_staff(session, staff_id)
+    recent_acts = await crud.list_recent_activities_for_staff(session, staff_id, limit=10)
+    sales_sum = await crud.sum_sales_in_range_for_staff(session, staff_id, start_dt, end_dt)  # ✅ فروش ۷روز
 
     clients_h = ", ".join([c.business_name for c in clients]) if clients else "-"
     fb_h = f"{fb_avg:.2f}" if fb_avg is not None else "-"
@@ -1082,7 +1232,18 @@ async def admin_report_one_staff(cb: types.CallbackQuery, state: FSMContext):
             extra_h = " | ".join(extra) if extra else "-"
             lines.append(f"• {ts_h} — {typ} در {plat} {client_part} — {extra_h}")
 
-    await edit_or_send(cb, "\n".join(lines), back_to_staff_reports_kb())
+    # فروش/بازخورد مشتریان تحت پوشش هم در این گزارش است
+    return lines, [("staff", staff_id)] + [("client", c.id) for c in clients]
+
+
+@router.callback_query(F.data.startswith("report_staff:"))
+async def admin_report_one_staff(cb: types.CallbackQuery, state: FSMContext):
+    staff_id = int(cb.data.split(":")[1])
+    lines = await _cached_report("staff", staff_id, _staff_report_lines)
+    if lines is None:
+        await edit_or_send(cb, "❌ نیرو یافت نشد.", admin_reports_kb())
+        return
+    await _send_report(cb, lines, back_to_staff_reports_kb())
 
 
 # -----------------------------
@@ -1094,28 +1255,22 @@ async def admin_export_week_csv(cb: types.CallbackQuery, state: FSMContext):
     start_dt = end_dt - timedelta(days=7)
 
     async with AsyncSessionLocal() as session:
-        clients = await crud.list_all_clients(session)
-
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(["client_id", "business_name", "kpi_target", "acts_7d", "sales_7d", "avg_feedback", "last_activity_utc"])
-
-        for c in clients:
-            kpi = await crud.get_client_kpi(session, c.id)
-            target = (kpi.target_per_week if kpi else 0)
-            acts = await crud.count_activities_in_range(session, c.id, start_dt, end_dt)
-            sales_sum = await crud.sum_sales_in_range(session, c.id, start_dt, end_dt)  # ✅
-            fb_avg = await crud.avg_feedback_for_client(session, c.id)
-            last_ts = await crud.last_activity_ts(session, c.id)
-            writer.writerow([
-                c.id,
-                c.business_name,
-                target,
-                acts,
-                f"{sales_sum:.2f}",
-                f"{fb_avg:.2f}" if fb_avg is not None else "",
-                last_ts.isoformat() if last_ts else ""
-            ])
+        rows = await crud.list_client_summaries(session, start_dt, end_dt)
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["client_id", "business_name", "kpi_target", "acts_7d", "sales_7d", "avg_feedback", "last_activity_utc"])
+
+    for r in rows:
+        writer.writerow([
+            r.client_id,
+            r.business_name,
+            r.target,
+            r.acts,
+            f"{r.sales_sum:.2f}",
+            f"{r.fb_avg:.2f}" if r.fb_avg is not None else "",
+            r.last_ts.isoformat() if r.last_ts else ""
+        ])
 
     data = buf.getvalue().encode("utf-8-sig")
     await cb.message.answer_document(
@@ -1123,3 +1278,68 @@ async def admin_export_week_csv(cb: types.CallbackQuery, state: FSMContext):
         caption="📤 خروجی هفتگی (7 روز اخیر) — KPI/فعالیت/فروش/بازخورد"
     )
     await cb.message.answer("گزینه‌های دیگر:", reply_markup=admin_export_kb())
+
+
+# -----------------------------
+# 🗂 خروجی کامل بازه دلخواه (CSV فشرده)
+# -----------------------------
+class ExportRange(StatesGroup):
+    start = State()
+    end = State()
+
+
+def _parse_day(text: str) -> date | None:
+    try:
+        return datetime.strptime(normalize_digits(text), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+@router.callback_query(F.data == "admin_export_range")
+async def admin_export_range_start(cb: types.CallbackQuery, state: FSMContext):
+    await state.set_state(ExportRange.start)
+    await cb.message.answer("تاریخ شروع بازه؟ (YYYY-MM-DD)", reply_markup=back_reply_kb())
+
+
+@router.message(ExportRange.start)
+async def admin_export_range_start_date(msg: types.Message, state: FSMContext):
+    if msg.text == BACK_TEXT:
+        await state.clear()
+        await msg.answer("📤 خروجی و دانلود:", reply_markup=admin_export_kb())
+        return
+    d = _parse_day(msg.text or "")
+    if not d:
+        await msg.answer("❌ فرمت نادرست است. نمونه صحیح: 2025-01-01")
+        return
+    await state.update_data(start=d.isoformat())
+    await state.set_state(ExportRange.end)
+    await msg.answer("تاریخ پایان بازه؟ (YYYY-MM-DD — خود این روز هم شامل می‌شود)", reply_markup=back_reply_kb())
+
+
+@router.message(ExportRange.end)
+async def admin_export_range_end_date(msg: types.Message, state: FSMContext):
+    if msg.text == BACK_TEXT:
+        await state.set_state(ExportRange.start)
+        await msg.answer("تاریخ شروع بازه؟ (YYYY-MM-DD)", reply_markup=back_reply_kb())
+        return
+    end_d = _parse_day(msg.text or "")
+    data = await state.get_data()
+    start_d = date.fromisoformat(data["start"])
+    if not end_d or end_d < start_d:
+        await msg.answer("❌ تاریخ پایان نامعتبر است (باید ≥ تاریخ شروع باشد).")
+        return
+
+    await state.clear()
+    await msg.answer("⏳ در حال آماده‌سازی خروجی…")
+
+    start_dt = datetime.combine(start_d, datetime.min.time())
+    end_dt = datetime.combine(end_d + timedelta(days=1), datetime.min.time())
+    async with AsyncSessionLocal() as session:
+        payload, counts = await export_service.build_range_export(session, start_dt, end_dt)
+
+    counts_h = " | ".join(f"{k}: {v}" for k, v in counts.items())
+    await msg.answer_document(
+        types.BufferedInputFile(payload, filename=f"export_{start_d}_{end_d}.csv.gz"),
+        caption=f"🗂 خروجی کامل ({start_d} تا {end_d})\n{counts_h}"
+    )
+    await msg.answer("گزینه‌های دیگر:", reply_markup=admin_export_kb())
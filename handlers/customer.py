@@ -10,7 +10,7 @@ from db import crud
 from keyboards.customer import customer_main_kb, feedback_score_kb
 from keyboards.common import back_reply_kb, confirm_inline_kb, BACK_TEXT
 from utils.ui import edit_or_send
-from utils.notify import notify_feedback
+from utils.notify import feedback_message
 from utils.constants import KPI_YELLOW_RATIO
 
 router = Router()
@@ -86,30 +86,18 @@ async def customer_feedback_confirm(cb: types.CallbackQuery, state: FSMContext):
         return
 
     async with AsyncSessionLocal() as session:
-        fb = await crud.create_feedback(
+        await crud.create_feedback(
             session,
             client_id=data["client_id"],
             score=int(data["score"]),
             comment=data.get("comment"),
+            audit={"diff_json": data},
+            notify=feedback_message(
+                client_name=data.get("client_name"),
+                score=int(data["score"]),
+                comment=data.get("comment"),
+            ),
         )
-        await crud.log_action(
-            session,
-            action="CREATE",
-            entity="Feedback",
-            entity_id=fb.id,
-            diff_json=data
-        )
-        client = await crud.get_client_by_id(session, data["client_id"])
-
-    try:
-        await notify_feedback(
-            cb.message.bot,
-            client_name=(client.business_name if client else data.get("client_name")),
-            score=int(data["score"]),
-            comment=data.get("comment")
-        )
-    except Exception:
-        pass
 
     await state.clear()
     await edit_or_send(cb, "✅ بازخورد شما ثبت شد. ممنون از همکاری شما!", customer_main_kb())
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import (
+    InlineQueryResultArticle, InputTextMessageContent,
+    InlineKeyboardMarkup, InlineKeyboardButton,
+)
+
+from db.base import AsyncSessionLocal
+from db import crud, search
+from utils.constants import ROLE_ADMIN, ROLE_STAFF, STATUS_ACTIVE
+
+router = Router()
+
+INLINE_RESULTS_LIMIT = 20
+
+
+async def _search_scope(session, tg_id: int):
+    """
+    دسترسی جستجو: مدیر → (True, None) همه مشتری‌ها؛ نیروی فعال → (True, staff_id) فقط مشتری‌های خودش؛
+    بقیه → (False, None).
+    """
+    user = await crud.get_user_by_telegram_id(session, tg_id)
+    if crud._is_admin_tg(tg_id) or (user and user.role == ROLE_ADMIN):
+        return True, None
+    if user and user.role == ROLE_STAFF and user.status == STATUS_ACTIVE:
+        return True, user.id
+    return False, None
+
+
+# -----------------------------
+# 🔎 جستجوی inline مشتری: @bot <بخشی از نام>
+# -----------------------------
+@router.inline_query()
+async def inline_client_search(iq: types.InlineQuery):
+    async with AsyncSessionLocal() as session:
+        allowed, staff_id = await _search_scope(session, iq.from_user.id)
+        if not allowed:
+            await iq.answer([], cache_time=30, is_personal=True)
+            return
+        idx = await search.ensure_index(session)
+
+    ids = idx.search(iq.query, staff_id=staff_id, limit=INLINE_RESULTS_LIMIT)
+    results = [
+        InlineQueryResultArticle(
+            id=str(cid),
+            title=idx.display_name(cid) or "بدون‌نام",
+            description=f"مشتری #{cid}",
+            input_message_content=InputTextMessageContent(message_text=f"/client {cid}"),
+        )
+        for cid in ids
+    ]
+    await iq.answer(results, cache_time=5, is_personal=True)
+
+
+# -----------------------------
+# کارت مشتری (نتیجه انتخاب‌شده در جستجو)
+# -----------------------------
+@router.message(Command("client"))
+async def client_card(msg: types.Message, command: CommandObject):
+    try:
+        client_id = int((command.args or "").strip())
+    except ValueError:
+        await msg.answer("فرمت: /client <شناسه مشتری>")
+        return
+
+    async with AsyncSessionLocal() as session:
+        allowed, staff_id = await _search_scope(session, msg.from_user.id)
+        client = await crud.get_client_by_id(session, client_id) if allowed else None
+        if client and staff_id is not None and client.assigned_staff_id != staff_id:
+            client = None
+        staff = await crud.get_user_by_id(session, client.assigned_staff_id) if client and client.assigned_staff_id else None
+
+    if not client:
+        await msg.answer("❌ مشتری یافت نشد یا به شما دسترسی ندارد.")
+        return
+
+    lines = [
+        f"👤 {client.business_name} (#{client.id})",
+        f"- وضعیت: {client.status}",
+        f"- نیروی مسئول: {(staff.name or f'ID={staff.id}') if staff else '-'}",
+    ]
+    if staff_id is None:
+        rows = [[InlineKeyboardButton(text="📄 گزارش ۷ روز اخیر", callback_data=f"report_client:{client.id}")]]
+    else:
+        rows = [
+            [InlineKeyboardButton(text="📝 ثبت فعالیت", callback_data=f"staff_quick:act:{client.id}")],
+            [InlineKeyboardButton(text="💰 ثبت فروش", callback_data=f"staff_quick:sale:{client.id}")],
+        ]
+    await msg.answer("\n".join(lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
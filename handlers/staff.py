@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
+from aiogram.exceptions import TelegramBadRequest
 
 from db.base import AsyncSessionLocal
 from db import crud
@@ -17,9 +18,9 @@ from keyboards.staff import (
     activity_types_inline_kb,
     sales_clients_inline_kb,
 )
-from keyboards.common import back_reply_kb, confirm_inline_kb, BACK_TEXT
+from keyboards.common import back_reply_kb, confirm_inline_kb, BACK_TEXT, PAGE_CB_PREFIX, parse_page_cb
 from utils.ui import edit_or_send
-from utils.notify import notify_activity
+from utils.notify import activity_message, sale_message
 
 router = Router()
 
@@ -29,6 +30,27 @@ async def staff_menu(cb: types.CallbackQuery, state: FSMContext):
     await state.clear()
     await edit_or_send(cb, "پنل نیروی مارکتینگ:", staff_main_kb())
 
+# ---------- صفحه‌بندی انتخاب مشتری (فقط مشتری‌های همین نیرو) ----------
+_STAFF_PICKERS = {
+    "stf_act": clients_inline_kb,
+    "stf_sale": sales_clients_inline_kb,
+}
+
+@router.callback_query(F.data.startswith(f"{PAGE_CB_PREFIX}stf_"))
+async def staff_picker_page(cb: types.CallbackQuery):
+    pager, direction, cursor = parse_page_cb(cb.data)
+    async with AsyncSessionLocal() as session:
+        user = await crud.get_user_by_telegram_id(session, cb.from_user.id)
+        if not user:
+            await cb.answer("⚠️ دسترسی شما تأیید نشد.", show_alert=True)
+            return
+        page = await crud.page_client_options(session, cursor, direction, staff_id=user.id)
+    try:
+        await cb.message.edit_reply_markup(reply_markup=_STAFF_PICKERS[pager](page))
+    except TelegramBadRequest:
+        pass
+    await cb.answer()
+
 # ===================================================================
 #                         ثبت فعالیت جدید
 # ===================================================================
@@ -50,14 +72,14 @@ async def add_activity_start(cb: types.CallbackQuery, state: FSMContext):
         if not user or user.status != STATUS_ACTIVE:
             await cb.message.answer("⚠️ دسترسی شما به عنوان نیروی فعال تأیید نشد.")
             return
-        clients = await crud.list_clients_for_staff(session, user.id)
+        page = await crud.page_client_options(session, staff_id=user.id)
 
-    if not clients:
+    if not page.items:
         await cb.message.answer("هیچ مشتری فعالی برای شما تعریف نشده است.")
         return
 
     await state.set_state(AddActivity.pick_client)
-    await cb.message.answer("مشتری را انتخاب کنید:", reply_markup=clients_inline_kb(clients))
+    await cb.message.answer("مشتری را انتخاب کنید:", reply_markup=clients_inline_kb(page))
 
 @router.callback_query(AddActivity.pick_client, F.data.startswith("staff_pick_client:"))
 async def add_activity_pick_client(cb: types.CallbackQuery, state: FSMContext):
@@ -67,8 +89,10 @@ async def add_activity_pick_client(cb: types.CallbackQuery, state: FSMContext):
     if not client:
         await cb.message.answer("❌ مشتری یافت نشد. دوباره انتخاب کنید.")
         return
+    await _begin_activity(cb, state, client)
 
-    await state.update_data(client_id=client_id, client_name=client.business_name)
+async def _begin_activity(cb: types.CallbackQuery, state: FSMContext, client):
+    await state.update_data(client_id=client.id, client_name=client.business_name)
     await state.set_state(AddActivity.pick_type)
     await cb.message.answer(
         "نوع فعالیت را انتخاب کنید یا «سایر» را بزنید:",
@@ -215,7 +239,7 @@ async def add_activity_confirm_or_cancel(cb: types.CallbackQuery, state: FSMCont
             await edit_or_send(cb, "⚠️ کاربر یافت نشد.", staff_main_kb())
             return
 
-        act = await crud.create_activity(
+        await crud.create_activity(
             session,
             client_id=data["client_id"],
             staff_id=user.id,
@@ -225,29 +249,18 @@ async def add_activity_confirm_or_cancel(cb: types.CallbackQuery, state: FSMCont
             goal=data.get("goal"),
             evidence_link=data.get("evidence"),
             initial_result=data.get("initial_result"),
+            audit={"diff_json": data, "actor_user_id": user.id},
+            notify=activity_message(
+                client_name=data.get("client_name"),
+                staff_name=user.name or "-",
+                activity_type=data.get("activity_type"),
+                platform=data.get("platform"),
+                ts=data.get("ts"),
+                goal=data.get("goal"),
+                evidence=data.get("evidence"),
+                result=data.get("initial_result"),
+            ),
         )
-        await crud.log_action(
-            session,
-            action="CREATE",
-            entity="Activity",
-            entity_id=act.id,
-            diff_json=data
-        )
-
-    try:
-        await notify_activity(
-            cb.message.bot,
-            client_name=data.get("client_name"),
-            staff_name=(user.name if user else "-"),
-            activity_type=data.get("activity_type"),
-            platform=data.get("platform"),
-            ts_str=data.get("ts"),
-            goal=data.get("goal"),
-            evidence=data.get("evidence"),
-            result=data.get("initial_result"),
-        )
-    except Exception:
-        pass
 
     await state.clear()
     await edit_or_send(cb, "✅ فعالیت ثبت شد.", staff_main_kb())
@@ -271,14 +284,14 @@ async def staff_add_sale_start(cb: types.CallbackQuery, state: FSMContext):
         if not user or user.status != STATUS_ACTIVE:
             await cb.message.answer("⚠️ دسترسی شما به عنوان نیروی فعال تأیید نشد.")
             return
-        clients = await crud.list_clients_for_staff(session, user.id)
+        page = await crud.page_client_options(session, staff_id=user.id)
 
-    if not clients:
+    if not page.items:
         await cb.message.answer("هیچ مشتری فعالی برای شما تعریف نشده است.")
         return
 
     await state.set_state(StaffAddSale.pick_client)
-    await cb.message.answer("مشتری را برای ثبت فروش انتخاب کنید:", reply_markup=sales_clients_inline_kb(clients))
+    await cb.message.answer("مشتری را برای ثبت فروش انتخاب کنید:", reply_markup=sales_clients_inline_kb(page))
 
 @router.callback_query(StaffAddSale.pick_client, F.data.startswith("staff_sale_pick_client:"))
 async def staff_add_sale_pick_client(cb: types.CallbackQuery, state: FSMContext):
@@ -288,20 +301,40 @@ async def staff_add_sale_pick_client(cb: types.CallbackQuery, state: FSMContext)
     if not client:
         await cb.message.answer("❌ مشتری یافت نشد. دوباره انتخاب کنید.")
         return
+    await _begin_sale(cb, state, client)
 
-    await state.update_data(client_id=client_id, client_name=client.business_name)
+async def _begin_sale(cb: types.CallbackQuery, state: FSMContext, client):
+    await state.update_data(client_id=client.id, client_name=client.business_name)
     await state.set_state(StaffAddSale.ts)
     await cb.message.answer("تاریخ/ساعت فروش؟ (YYYY-MM-DD HH:MM یا «-» برای اکنون)", reply_markup=back_reply_kb())
 
+
+# ---------- شروع سریع فرم از کارت جستجوی مشتری (/client) ----------
+@router.callback_query(F.data.startswith("staff_quick:"))
+async def staff_quick_start(cb: types.CallbackQuery, state: FSMContext):
+    _, action, client_id = cb.data.split(":")
+    async with AsyncSessionLocal() as session:
+        me = await crud.get_user_by_telegram_id(session, cb.from_user.id)
+        client = await crud.get_client_by_id(session, int(client_id))
+    if not me or me.status != STATUS_ACTIVE or not client or client.assigned_staff_id != me.id:
+        await cb.answer("⚠️ این مشتری به شما تخصیص داده نشده است.", show_alert=True)
+        return
+    await state.clear()
+    if action == "act":
+        await _begin_activity(cb, state, client)
+    else:
+        await _begin_sale(cb, state, client)
+    await cb.answer()
+
 @router.message(StaffAddSale.ts)
 async def staff_add_sale_ts(msg: types.Message, state: FSMContext):
     if msg.text == BACK_TEXT:
         staff_tg = msg.from_user.id
         async with AsyncSessionLocal() as session:
             user = await crud.get_user_by_telegram_id(session, staff_tg)
-            clients = await crud.list_clients_for_staff(session, user.id) if user else []
+            page = await crud.page_client_options(session, staff_id=user.id) if user else crud.Page([], False, False)
         await state.set_state(StaffAddSale.pick_client)
-        await msg.answer("مشتری را انتخاب کنید:", reply_markup=sales_clients_inline_kb(clients or []))
+        await msg.answer("مشتری را انتخاب کنید:", reply_markup=sales_clients_inline_kb(page))
         return
 
     val = (msg.text or "").strip()
@@ -388,15 +421,23 @@ async def staff_add_sale_confirm(cb: types.CallbackQuery, state: FSMContext):
         return
 
     async with AsyncSessionLocal() as session:
-        s = await crud.create_sale(
+        await crud.create_sale(
             session,
             client_id=int(data["client_id"]),
             ts=datetime.fromisoformat(data["ts"]),
             amount=float(data["amount"]),
             source=data.get("source"),
             note=data.get("note"),
+            audit={"diff_json": data},
+            notify=sale_message(
+                client_name=data.get("client_name"),
+                amount=float(data["amount"]),
+                ts=data["ts"],
+                source=data.get("source"),
+                note=data.get("note"),
+                actor_name=cb.from_user.full_name,
+            ),
         )
-        await crud.log_action(session, action="CREATE", entity="Sale", entity_id=s.id, diff_json=data)
 
     await state.clear()
     await edit_or_send(cb, "✅ فروش ثبت شد.", staff_main_kb())
@@ -417,7 +458,7 @@ async def staff_my_report(cb: types.CallbackQuery, state: FSMContext):
             return
 
         acts_cnt = await crud.count_activities_in_range_by_staff(session, me.id, start_dt, end_dt)
-        clients = await crud.list_clients_for_staff(session, me.id)
+        clients = await crud.list_client_options(session, staff_id=me.id)
         fb_avg = await crud.avg_feedback_for_staff_clients(session, me.id)
         last_ts = await crud.last_activity_ts_for_staff(session, me.id)
         recent_acts = await crud.list_recent_activities_for_staff(session, me.id, limit=10)
@@ -476,50 +517,49 @@ async def staff_clients_week(cb: types.CallbackQuery, state: FSMContext):
         if not me or me.status != STATUS_ACTIVE:
             await edit_or_send(cb, "⚠️ شما نیروی فعال نیستید.", staff_main_kb())
             return
-        clients = await crud.list_clients_for_staff(session, me.id)
+        rows = await crud.list_client_summaries(session, start_dt, end_dt, staff_id=me.id)
 
-        if not clients:
-            await edit_or_send(cb, "هیچ مشتری فعالی برای شما وجود ندارد.", staff_main_kb())
-            return
+    if not rows:
+        await edit_or_send(cb, "هیچ مشتری فعالی برای شما وجود ندارد.", staff_main_kb())
+        return
+
+    lines = [f"🗓 گزارش هفتگی مشتریان شما ({me.name or me.id})"]
+    for r in rows:
+        target = r.target
+        acts = r.acts
+        last_ts = r.last_ts
+        fb_avg = r.fb_avg
+
+        status_emoji = "⚪️"
+        if target > 0:
+            ratio = acts / max(target, 1)
+            if ratio >= 1.0:
+                status_emoji = "🟢"
+            elif ratio >= KPI_YELLOW_RATIO:
+                status_emoji = "🟡"
+            else:
+                status_emoji = "🔴"
+
+        fb_h = f"{fb_avg:.2f}" if fb_avg is not None else "-"
+        last_h = last_ts.strftime("%Y-%m-%d") if last_ts else "-"
+
+        line = (
+            f"\n• {r.business_name} (#{r.client_id})\n"
+            f"  وضعیت KPI: {status_emoji}  {acts} / {target}\n"
+            f"  میانگین رضایت: {fb_h}\n"
+            f"  آخرین فعالیت: {last_h}"
+        )
 
-        lines = [f"🗓 گزارش هفتگی مشتریان شما ({me.name or me.id})"]
-        for c in clients:
-            kpi = await crud.get_client_kpi(session, c.id)
-            target = (kpi.target_per_week if kpi else 0)
-            acts = await crud.count_activities_in_range(session, c.id, start_dt, end_dt)
-            last_ts = await crud.last_activity_ts(session, c.id)
-            fb_avg = await crud.avg_feedback_for_client(session, c.id)
-
-            status_emoji = "⚪️"
-            if target > 0:
-                ratio = acts / max(target, 1)
-                if ratio >= 1.0:
-                    status_emoji = "🟢"
-                elif ratio >= KPI_YELLOW_RATIO:
-                    status_emoji = "🟡"
-                else:
-                    status_emoji = "🔴"
-
-            fb_h = f"{fb_avg:.2f}" if fb_avg is not None else "-"
-            last_h = last_ts.strftime("%Y-%m-%d") if last_ts else "-"
-
-            line = (
-                f"\n• {c.business_name} (#{c.id})\n"
-                f"  وضعیت KPI: {status_emoji}  {acts} / {target}\n"
-                f"  میانگین رضایت: {fb_h}\n"
-                f"  آخرین فعالیت: {last_h}"
-            )
-
-            # SLA پایه: هشدارهای هر مشتری
-            warn = []
-            if fb_avg is not None and fb_avg < FEEDBACK_WARN_SCORE:
-                warn.append(f"رضایت < {FEEDBACK_WARN_SCORE}")
-            if last_ts is None or (end_dt - last_ts).days > INACTIVITY_WARN_DAYS:
-                days = (end_dt - last_ts).days if last_ts else "∞"
-                warn.append(f"عدم فعالیت > {INACTIVITY_WARN_DAYS} روز (فعلی: {days})")
-            if warn:
-                line += "\n  ⚠️ " + " | ".join(warn)
-
-            lines.append(line)
+        # SLA پایه: هشدارهای هر مشتری
+        warn = []
+        if fb_avg is not None and fb_avg < FEEDBACK_WARN_SCORE:
+            warn.append(f"رضایت < {FEEDBACK_WARN_SCORE}")
+        if last_ts is None or (end_dt - last_ts).days > INACTIVITY_WARN_DAYS:
+            days = (end_dt - last_ts).days if last_ts else "∞"
+            warn.append(f"عدم فعالیت > {INACTIVITY_WARN_DAYS} روز (فعلی: {days})")
+        if warn:
+            line += "\n  ⚠️ " + " | ".join(warn)
+
+        lines.append(line)
 
     await edit_or_send(cb, "\n".join(lines), staff_main_kb())
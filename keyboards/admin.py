@@ -1,5 +1,7 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from keyboards.common import page_nav_row
+
 
 # ---------------------------
 # اصلی/ناوبری
@@ -7,6 +9,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 def admin_main_kb() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="⚙️ راه‌اندازی اولیه", callback_data="admin_setup")],
+        [InlineKeyboardButton(text="🔎 جستجوی مشتری", switch_inline_query_current_chat="")],
         [InlineKeyboardButton(text="📊 گزارش‌ها", callback_data="admin_reports_menu")],
         [InlineKeyboardButton(text="📤 خروجی و دانلود", callback_data="admin_export_menu")],
         [InlineKeyboardButton(text="🎯 KPI / SLA", callback_data="admin_kpi_menu")],
@@ -21,24 +24,40 @@ def admin_setup_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="➕ ثبت نیروی مارکتینگ", callback_data="admin_add_staff")],
         [InlineKeyboardButton(text="➕ ثبت مشتری", callback_data="admin_add_client")],
         [InlineKeyboardButton(text="🔁 تخصیص مشتری به نیرو", callback_data="admin_assign")],
+        [InlineKeyboardButton(text="📥 ورود گروهی از فایل", callback_data="admin_bulk_import")],
         [InlineKeyboardButton(text="⬅️ بازگشت به پنل مدیر", callback_data="admin_back_main")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def admin_reports_kb() -> InlineKeyboardMarkup:
+def bulk_import_kinds_kb() -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(text="👥 مشتری‌ها", callback_data="bulk_kind:clients")],
+        [InlineKeyboardButton(text="🧑‍💼 نیروها", callback_data="bulk_kind:staff")],
+        [InlineKeyboardButton(text="📝 فعالیت‌ها", callback_data="bulk_kind:activities")],
+        [InlineKeyboardButton(text="💰 فروش‌ها", callback_data="bulk_kind:sales")],
+        [InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_setup")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def admin_reports_kb(weekly_live: bool = False) -> InlineKeyboardMarkup:
+    """weekly_live: زیر گزارش هفتگی ذخیره‌شده، دکمه محاسبه زنده ۷ روز اخیر هم نمایش داده شود."""
     rows = [
         [InlineKeyboardButton(text="🗓 گزارش هفتگی کلی", callback_data="admin_reports_weekly")],
         [InlineKeyboardButton(text="📄 گزارش مشتری‌ها (انتخابی)", callback_data="admin_reports_clients")],
         [InlineKeyboardButton(text="👥 گزارش نیروها (انتخابی)", callback_data="admin_reports_staff")],
         [InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_back_main")],
     ]
+    if weekly_live:
+        rows.insert(0, [InlineKeyboardButton(text="🔄 محاسبه مجدد (۷ روز اخیر)", callback_data="admin_reports_weekly_live")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def admin_export_kb() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="⬇️ CSV هفتگی (7 روز)", callback_data="admin_export_week_csv")],
+        [InlineKeyboardButton(text="🗂 خروجی کامل بازه (CSV.gz)", callback_data="admin_export_range")],
         [InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_back_main")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -59,11 +78,13 @@ def admin_kpi_kb() -> InlineKeyboardMarkup:
 # ---------------------------
 # KPI: انتخاب مشتری
 # ---------------------------
-def clients_inline_kb_for_kpi(clients) -> InlineKeyboardMarkup:
+def clients_inline_kb_for_kpi(page) -> InlineKeyboardMarkup:
     btns = []
-    for c in clients:
-        title = f"{getattr(c, 'business_name', 'بدون‌نام')} (#{c.id})"
+    for c in page.items:
+        title = f"{c.business_name or 'بدون‌نام'} (#{c.id})"
         btns.append([InlineKeyboardButton(text=title, callback_data=f"kpi_pick_client:{c.id}")])
+    if nav := page_nav_row(page, "adm_kpi"):
+        btns.append(nav)
     btns.append([InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_kpi_menu")])
     return InlineKeyboardMarkup(inline_keyboard=btns)
 
@@ -71,24 +92,31 @@ def clients_inline_kb_for_kpi(clients) -> InlineKeyboardMarkup:
 # ---------------------------
 # Assign: انتخاب مشتری و نیرو
 # ---------------------------
-def assign_clients_kb(clients) -> InlineKeyboardMarkup:
+def assign_clients_kb(page) -> InlineKeyboardMarkup:
     rows = []
-    for c in clients:
-        title = f"{getattr(c, 'business_name', 'بدون‌نام')} (#{c.id})"
+    for c in page.items:
+        title = f"{c.business_name or 'بدون‌نام'} (#{c.id})"
         rows.append([InlineKeyboardButton(text=title, callback_data=f"assign_pick_client:{c.id}")])
+    if nav := page_nav_row(page, "adm_asgc"):
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_setup")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def assign_staff_kb(staff_tuples, include_auto: bool = True) -> InlineKeyboardMarkup:
+def assign_staff_kb(page, loads: dict, include_auto: bool = True) -> InlineKeyboardMarkup:
+    """page: صفحه StaffOption؛ loads: staff_id → تعداد مشتری فعلی."""
     rows = []
     if include_auto:
         rows.append([InlineKeyboardButton(text="🤖 تخصیص خودکار", callback_data="assign_auto")])
 
-    for s, cur, cap in staff_tuples:
-        cap_human = "∞" if (int(cap or 0) == 0) else f"{cur}/{cap}"
-        title = f"{getattr(s, 'name', 'بدون‌نام')} (ID={s.id}) | ظرفیت: {cap_human}"
+    for s in page.items:
+        cap = int(s.max_capacity or 0)
+        cur = loads.get(s.id, 0)
+        cap_human = "∞" if cap == 0 else f"{cur}/{cap}"
+        title = f"{s.name or 'بدون‌نام'} (ID={s.id}) | ظرفیت: {cap_human}"
         rows.append([InlineKeyboardButton(text=title, callback_data=f"assign_pick_staff:{s.id}")])
+    if nav := page_nav_row(page, "adm_asgs"):
+        rows.append(nav)
 
     rows.append([InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_setup")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -97,20 +125,24 @@ def assign_staff_kb(staff_tuples, include_auto: bool = True) -> InlineKeyboardMa
 # ---------------------------
 # Reports: انتخاب مشتری/نیرو + برگشت
 # ---------------------------
-def report_clients_kb(clients) -> InlineKeyboardMarkup:
+def report_clients_kb(page) -> InlineKeyboardMarkup:
     rows = []
-    for c in clients:
-        title = f"{getattr(c, 'business_name', 'بدون‌نام')} (#{c.id})"
+    for c in page.items:
+        title = f"{c.business_name or 'بدون‌نام'} (#{c.id})"
         rows.append([InlineKeyboardButton(text=title, callback_data=f"report_client:{c.id}")])
+    if nav := page_nav_row(page, "adm_rptc"):
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_reports_menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def report_staff_kb(staff_list) -> InlineKeyboardMarkup:
+def report_staff_kb(page) -> InlineKeyboardMarkup:
     rows = []
-    for s in staff_list:
-        title = f"{getattr(s, 'name', 'بدون‌نام')} (ID={s.id})"
+    for s in page.items:
+        title = f"{s.name or 'بدون‌نام'} (ID={s.id})"
         rows.append([InlineKeyboardButton(text=title, callback_data=f"report_staff:{s.id}")])
+    if nav := page_nav_row(page, "adm_rpts"):
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_reports_menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
@@ -134,11 +166,13 @@ def back_to_staff_reports_kb() -> InlineKeyboardMarkup:
 # ---------------------------
 # Sales: انتخاب مشتری برای ثبت فروش (جدید)
 # ---------------------------
-def sales_clients_kb(clients) -> InlineKeyboardMarkup:
+def sales_clients_kb(page) -> InlineKeyboardMarkup:
     rows = []
-    for c in clients:
-        title = f"{getattr(c, 'business_name', 'بدون‌نام')} (#{c.id})"
+    for c in page.items:
+        title = f"{c.business_name or 'بدون‌نام'} (#{c.id})"
         rows.append([InlineKeyboardButton(text=title, callback_data=f"sale_pick_client:{c.id}")])
+    if nav := page_nav_row(page, "adm_sale"):
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ انصراف", callback_data="admin_back_main")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
@@ -199,6 +233,10 @@ def mkt_kpi_report_scope_kb() -> InlineKeyboardMarkup:
             InlineKeyboardButton(text="گزارش هفتگی", callback_data="mkt_kpi_report_scope:weekly"),
             InlineKeyboardButton(text="گزارش ماهانه", callback_data="mkt_kpi_report_scope:monthly"),
         ],
+        [
+            InlineKeyboardButton(text="📈 روند هفتگی", callback_data="mkt_kpi_trend:weekly"),
+            InlineKeyboardButton(text="📈 روند ماهانه", callback_data="mkt_kpi_trend:monthly"),
+        ],
         [InlineKeyboardButton(text="⬅️ بازگشت", callback_data="admin_kpi_menu")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=rows)
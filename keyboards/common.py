@@ -30,3 +30,45 @@ def confirm_inline_kb(ok_cb: str, cancel_cb: str) -> InlineKeyboardMarkup:
         ]
     ]
     return InlineKeyboardMarkup(inline_keyboard=rows)
+
+# ---------------------------
+# ناوبری صفحه‌بندی keyset برای کیبوردهای انتخاب
+#  - callback_data: "pg:<pager>:<n|p>:<cursor_id>"
+# ---------------------------
+PAGE_CB_PREFIX = "pg:"
+
+def page_nav_row(page, pager: str) -> list:
+    nav = []
+    if page.has_prev and page.items:
+        nav.append(InlineKeyboardButton(text="◀️ قبلی", callback_data=f"{PAGE_CB_PREFIX}{pager}:p:{page.items[0].id}"))
+    if page.has_next and page.items:
+        nav.append(InlineKeyboardButton(text="بعدی ▶️", callback_data=f"{PAGE_CB_PREFIX}{pager}:n:{page.items[-1].id}"))
+    return nav
+
+def parse_page_cb(data: str) -> tuple[str, str, int]:
+    """"pg:adm_kpi:n:42" → ("adm_kpi", "n", 42)"""
+    _, pager, direction, cursor = data.split(":", 3)
+    return pager, direction, int(cursor)
+
+# ---------------------------
+# ورق زدن صفحه‌های گزارش‌های طولانی (از کش services.reports.pages)
+#  - callback_data: "rp:<report_id>:<page>"
+# ---------------------------
+REPORT_PAGE_CB_PREFIX = "rp:"
+
+def report_pages_kb(report_id: str, page: int, total: int, markup: InlineKeyboardMarkup | None = None) -> InlineKeyboardMarkup:
+    """دکمه‌های قبلی/بعدی بالای کیبورد اصلی گزارش (markup)."""
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️ قبلی", callback_data=f"{REPORT_PAGE_CB_PREFIX}{report_id}:{page - 1}"))
+    if page < total - 1:
+        nav.append(InlineKeyboardButton(text="بعدی ▶️", callback_data=f"{REPORT_PAGE_CB_PREFIX}{report_id}:{page + 1}"))
+    rows = [nav] if nav else []
+    if markup is not None:
+        rows.extend(markup.inline_keyboard)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def parse_report_page_cb(data: str) -> tuple[str, int]:
+    """"rp:1a2b3c4d:2" → ("1a2b3c4d", 2)"""
+    _, report_id, page = data.split(":", 2)
+    return report_id, int(page)
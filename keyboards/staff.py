@@ -4,7 +4,7 @@ from aiogram.types import (
     InlineKeyboardMarkup, InlineKeyboardButton,
     ReplyKeyboardMarkup, KeyboardButton
 )
-from keyboards.common import BACK_TEXT  # متن دکمه بازگشت («⬅️ بازگشت»)
+from keyboards.common import BACK_TEXT, page_nav_row  # متن دکمه بازگشت («⬅️ بازگشت»)
 
 # -------------------------------
 # پنل اصلی نیروی مارکتینگ
@@ -14,6 +14,7 @@ def staff_main_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="📝 ثبت فعالیت جدید", callback_data="staff_add_activity")],
         [InlineKeyboardButton(text="💰 ثبت فروش جدید", callback_data="staff_add_sale")],
         [InlineKeyboardButton(text="📈 گزارش عملکرد من", callback_data="staff_my_report")],
+        [InlineKeyboardButton(text="🔎 جستجوی مشتری‌های من", switch_inline_query_current_chat="")],
         [InlineKeyboardButton(text="🗓 گزارش هفتگی مشتریان من", callback_data="staff_clients_week")],
         [InlineKeyboardButton(text="⬅️ بازگشت به منوی ورود", callback_data="back_to_entry")],
     ]
@@ -22,12 +23,14 @@ def staff_main_kb() -> InlineKeyboardMarkup:
 # ------------------------------------------
 # لیست مشتری‌ها برای انتخاب در فرم فعالیت
 # ------------------------------------------
-def clients_inline_kb(clients: list) -> InlineKeyboardMarkup:
+def clients_inline_kb(page) -> InlineKeyboardMarkup:
     rows = [
-        [InlineKeyboardButton(text=getattr(c, "business_name", "بدون‌نام"),
+        [InlineKeyboardButton(text=c.business_name or "بدون‌نام",
                               callback_data=f"staff_pick_client:{c.id}")]
-        for c in clients[:50]
+        for c in page.items
     ]
+    if nav := page_nav_row(page, "stf_act"):
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ بازگشت به پنل نیرو", callback_data="staff_menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
@@ -56,7 +59,7 @@ def staff_back_kb() -> ReplyKeyboardMarkup:
 # ——— در صورت نیاز برای جریان‌های ادمین (تخصیص مشتری) نگه‌داشتیم ———
 def assign_clients_inline_kb(clients: list) -> InlineKeyboardMarkup:
     rows = [
-        [InlineKeyboardButton(text=getattr(c, "business_name", "بدون‌نام"),
+        [InlineKeyboardButton(text=c.business_name or "بدون‌نام",
                               callback_data=f"assign_pick_client:{c.id}")]
         for c in clients[:50]
     ]
@@ -65,7 +68,7 @@ def assign_clients_inline_kb(clients: list) -> InlineKeyboardMarkup:
 
 def assign_staff_inline_kb(staff_list: list) -> InlineKeyboardMarkup:
     rows = [
-        [InlineKeyboardButton(text=getattr(s, "name", "بدون‌نام"),
+        [InlineKeyboardButton(text=s.name or "بدون‌نام",
                               callback_data=f"assign_pick_staff:{s.id}")]
         for s in staff_list[:50]
     ]
@@ -77,11 +80,13 @@ def assign_staff_inline_kb(staff_list: list) -> InlineKeyboardMarkup:
 # انتخاب مشتری برای «ثبت فروش» توسط نیرو
 #  - handler: data = "staff_sale_pick_client:<id>"
 # ---------------------------------------------------------
-def sales_clients_inline_kb(clients: list) -> InlineKeyboardMarkup:
+def sales_clients_inline_kb(page) -> InlineKeyboardMarkup:
     rows = [
-        [InlineKeyboardButton(text=getattr(c, "business_name", "بدون‌نام"),
+        [InlineKeyboardButton(text=c.business_name or "بدون‌نام",
                               callback_data=f"staff_sale_pick_client:{c.id}")]
-        for c in clients[:50]
+        for c in page.items
     ]
+    if nav := page_nav_row(page, "stf_sale"):
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ بازگشت به پنل نیرو", callback_data="staff_menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import time
+import zipfile
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import crud
+from db.models import User, Client, Activity, Sale
+from utils.constants import ROLE_ADMIN, ROLE_STAFF, STATUS_ACTIVE, STATUS_INACTIVE
+from utils.validators import normalize_digits, parse_numeric
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 20
+
+
+# ================================
+#  خواندن جریانی CSV / XLSX
+# ================================
+def _cell_text(val) -> str:
+    if val is None:
+        return ""
+    if isinstance(val, datetime):
+        return val.strftime("%Y-%m-%d %H:%M")
+    if isinstance(val, float) and val.is_integer():
+        return str(int(val))
+    return str(val).strip()
+
+
+def iter_rows(stream: io.BufferedIOBase, filename: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """(شماره سطر فایل، دیکشنری ستون→متن) را سطر به سطر برمی‌گرداند؛ سرستون‌ها lowercase می‌شوند."""
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        try:
+            from openpyxl import load_workbook
+            from openpyxl.utils.exceptions import InvalidFileException
+        except ImportError:
+            raise ValueError("برای فایل XLSX بسته openpyxl نصب نیست؛ CSV بفرستید.") from None
+        try:
+            wb = load_workbook(stream, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+            # فایل zip/xlsx معتبر نیست یا بخش‌هایش ناقص است
+            raise ValueError("فایل XLSX خراب یا نامعتبر است؛ دوباره از Excel ذخیره کنید یا CSV بفرستید.") from e
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [_cell_text(h).lower() for h in next(rows, ())]
+            for i, values in enumerate(rows, start=2):
+                if values is None or all(v is None for v in values):
+                    continue
+                yield i, {h: _cell_text(v) for h, v in zip(header, values) if h}
+        finally:
+            wb.close()
+        return
+
+    if name.endswith(".csv"):
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        reader = csv.reader(text)
+        header = [h.strip().lower() for h in next(reader, [])]
+        for i, values in enumerate(reader, start=2):
+            if not any(v.strip() for v in values):
+                continue
+            yield i, {h: v.strip() for h, v in zip(header, values) if h}
+        return
+
+    raise ValueError("فقط فایل CSV یا XLSX پشتیبانی می‌شود.")
+
+
+# ================================
+#  اعتبارسنجی سطرها
+# ================================
+def _opt(raw: Dict[str, str], key: str) -> Optional[str]:
+    val = (raw.get(key) or "").strip()
+    return None if val in ("", "-") else val
+
+
+def _req(raw: Dict[str, str], key: str) -> str:
+    val = _opt(raw, key)
+    if val is None:
+        raise ValueError(f"ستون «{key}» خالی است")
+    return val
+
+
+def _int(raw: Dict[str, str], key: str, required: bool = False) -> Optional[int]:
+    val = _req(raw, key) if required else _opt(raw, key)
+    if val is None:
+        return None
+    try:
+        return int(normalize_digits(val))
+    except ValueError:
+        raise ValueError(f"«{key}» باید عدد صحیح باشد") from None
+
+
+def _ts(raw: Dict[str, str], key: str) -> datetime:
+    val = normalize_digits(_req(raw, key))
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(val, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"«{key}» باید به شکل YYYY-MM-DD HH:MM باشد")
+
+
+def _status(raw: Dict[str, str]) -> str:
+    status = (_opt(raw, "status") or STATUS_ACTIVE).upper()
+    if status not in (STATUS_ACTIVE, STATUS_INACTIVE):
+        raise ValueError("status باید ACTIVE یا INACTIVE باشد")
+    return status
+
+
+def _list(raw: Dict[str, str], key: str) -> Optional[dict]:
+    val = _opt(raw, key)
+    if val is None:
+        return None
+    items = [p.strip() for p in val.replace("،", ",").split(",") if p.strip()]
+    return {"list": items} if items else None
+
+
+def clean_client(raw: Dict[str, str], now: datetime) -> dict:
+    contact = {k: _opt(raw, k) for k in ("phone", "email") if _opt(raw, k)}
+    return {
+        "business_name": _req(raw, "business_name"),
+        "industry": _opt(raw, "industry"),
+        "contract_date": normalize_digits(_opt(raw, "contract_date") or "") or None,
+        "platforms": _list(raw, "platforms"),
+        "city": _opt(raw, "city"),
+        "sales_source": _opt(raw, "sales_source"),
+        "feedback_channel": _opt(raw, "feedback_channel"),
+        "contact_info": contact or None,
+        "notes": _opt(raw, "notes"),
+        "status": _status(raw),
+        "telegram_id": _int(raw, "telegram_id"),
+        "assigned_staff_id": _int(raw, "assigned_staff_id"),
+        "created_at": now,
+    }
+
+
+def clean_staff(raw: Dict[str, str], now: datetime) -> dict:
+    role = (_opt(raw, "role") or ROLE_STAFF).upper()
+    role = {"مدیر": ROLE_ADMIN, "نیرو": ROLE_STAFF}.get(_opt(raw, "role") or "", role)
+    if role not in (ROLE_ADMIN, ROLE_STAFF):
+        raise ValueError("role باید ADMIN/STAFF (یا مدیر/نیرو) باشد")
+    cap = _int(raw, "max_capacity") or 0
+    if cap < 0:
+        raise ValueError("max_capacity باید ≥ 0 باشد")
+    return {
+        "telegram_id": _int(raw, "telegram_id", required=True),
+        "role": role,
+        "name": _req(raw, "name"),
+        "phone": _opt(raw, "phone"),
+        "email": _opt(raw, "email"),
+        "skills": _list(raw, "skills"),
+        "max_capacity": cap,
+        "status": _status(raw),
+        "created_at": now,
+    }
+
+
+def clean_activity(raw: Dict[str, str], now: datetime) -> dict:
+    return {
+        "client_id": _int(raw, "client_id", required=True),
+        "staff_id": _int(raw, "staff_id", required=True),
+        "activity_type": _req(raw, "activity_type"),
+        "platform": _opt(raw, "platform"),
+        "ts": _ts(raw, "ts"),
+        "goal": _opt(raw, "goal"),
+        "evidence_link": _opt(raw, "evidence_link"),
+        "initial_result": _opt(raw, "initial_result"),
+        "created_at": now,
+    }
+
+
+def clean_sale(raw: Dict[str, str], now: datetime) -> dict:
+    val = _req(raw, "amount")
+    try:
+        amount = parse_numeric(val)
+    except ValueError:
+        raise ValueError("amount باید عدد باشد") from None
+    if amount < 0:
+        raise ValueError("amount باید ≥ 0 باشد")
+    return {
+        "client_id": _int(raw, "client_id", required=True),
+        "ts": _ts(raw, "ts"),
+        "amount": amount,
+        "source": _opt(raw, "source"),
+        "note": _opt(raw, "note"),
+        "created_at": now,
+    }
+
+
+# نوع → (مدل، تابع پاک‌سازی، ستون‌های الزامی برای راهنما)
+IMPORT_KINDS: Dict[str, Tuple[type, Callable[[Dict[str, str], datetime], dict], str]] = {
+    "clients": (Client, clean_client, "business_name, status, telegram_id, assigned_staff_id, industry, city, platforms, phone, email, notes"),
+    "staff": (User, clean_staff, "name, telegram_id, role, max_capacity, status, phone, email, skills"),
+    "activities": (Activity, clean_activity, "client_id, staff_id, activity_type, ts, platform, goal, evidence_link, initial_result"),
+    "sales": (Sale, clean_sale, "client_id, ts, amount, source, note"),
+}
+
+
+# ================================
+#  اجرای ورود گروهی
+# ================================
+class ImportReport:
+    __slots__ = (
+        "kind", "total", "inserted", "errors", "error_count", "batches", "elapsed", "aborted_at", "abort_reason",
+    )
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self.total = 0
+        self.inserted = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.error_count = 0
+        self.batches = 0
+        self.elapsed = 0.0
+        # اگر خواندن فایل وسط کار قطع شود: سطری که خوانده نشد و علت (سطرهای قبل از آن پردازش شده‌اند)
+        self.aborted_at: Optional[int] = None
+        self.abort_reason: Optional[str] = None
+
+    def abort(self, row_no: int, reason: str) -> None:
+        self.aborted_at = row_no
+        self.abort_reason = reason
+
+    def add_error(self, row_no: int, msg: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_no, msg))
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+
+async def _check_refs(
+    session, kind: str, batch: List[Tuple[int, dict]], seen_tg: set, report: ImportReport,
+) -> List[Tuple[int, dict]]:
+    """بررسی دسته‌ای کلیدهای خارجی و یکتایی telegram_id؛ ردیف‌های سالم را (با شماره سطر) برمی‌گرداند."""
+    staff_ids = {r.get("staff_id") for _, r in batch} | {r.get("assigned_staff_id") for _, r in batch}
+    client_ids = {r.get("client_id") for _, r in batch}
+    ok_staff = await crud.existing_ids(session, User.id, staff_ids) if kind in ("clients", "activities") else set()
+    ok_clients = await crud.existing_ids(session, Client.id, client_ids) if kind in ("activities", "sales") else set()
+    taken_tg = await crud.existing_ids(session, User.telegram_id, {r["telegram_id"] for _, r in batch}) if kind == "staff" else set()
+
+    good = []
+    for row_no, r in batch:
+        if kind in ("activities", "sales") and r["client_id"] not in ok_clients:
+            report.add_error(row_no, f"مشتری #{r['client_id']} وجود ندارد")
+            continue
+        if kind == "activities" and r["staff_id"] not in ok_staff:
+            report.add_error(row_no, f"نیروی #{r['staff_id']} وجود ندارد")
+            continue
+        if kind == "clients" and r["assigned_staff_id"] is not None and r["assigned_staff_id"] not in ok_staff:
+            report.add_error(row_no, f"نیروی #{r['assigned_staff_id']} وجود ندارد")
+            continue
+        if kind == "staff":
+            if r["telegram_id"] in taken_tg or r["telegram_id"] in seen_tg:
+                report.add_error(row_no, f"Telegram ID {r['telegram_id']} تکراری است")
+                continue
+            seen_tg.add(r["telegram_id"])
+        good.append((row_no, r))
+    return good
+
+
+async def run_import(
+    session,
+    kind: str,
+    stream: io.BufferedIOBase,
+    filename: str,
+    *,
+    actor_user_id: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> ImportReport:
+    """
+    فایل را سطر به سطر می‌خواند، در دسته‌های batch_size تایی اعتبارسنجی می‌کند
+    و هر دسته را در یک تراکنش جدا (با یک AuditLog خلاصه) درج می‌کند.
+    خطای خواندن فایل (مثلاً بایت نامعتبر UTF-8 نزدیک انتهای CSV) ورود را متوقف و در report.abort ثبت
+    می‌کند؛ سطرهای خوانده‌شده‌ی قبل از آن درج می‌شوند و گزارش جزئی برگردانده می‌شود (استثنا بالا نمی‌رود).
+    اگر درج یک دسته خطای دیتابیس بدهد (مثلاً کلید یکتای تکراری)، آن دسته rollback و سطرهایش
+    خطادار ثبت می‌شوند و دسته‌های بعدی ادامه می‌یابند؛ دسته‌های commit‌شده قبلی سر جایشان می‌مانند.
+    """
+    model, clean, _ = IMPORT_KINDS[kind]
+    report = ImportReport(kind)
+    now = datetime.utcnow()
+    seen_tg: set = set()
+    t0 = time.perf_counter()
+
+    async def _flush(batch: List[Tuple[int, dict]]) -> None:
+        good: List[Tuple[int, dict]] = []
+        try:
+            good = await _check_refs(session, kind, batch, seen_tg, report)
+            if not good:
+                return
+            await crud.import_batch(session, model, [r for _, r in good], audit={
+                "actor_user_id": actor_user_id,
+                "diff_json": {
+                    "file": filename, "rows": len(good),
+                    "first_row": batch[0][0], "last_row": batch[-1][0],
+                },
+            })
+        except SQLAlchemyError as e:
+            await session.rollback()
+            log.warning("import %s: batch rows %s-%s failed: %s", kind, batch[0][0], batch[-1][0], e)
+            reason = str(getattr(e, "orig", None) or e).splitlines()[0][:200]
+            for row_no, _ in (good or batch):
+                report.add_error(row_no, f"خطای دیتابیس در درج دسته (سطرهای {batch[0][0]} تا {batch[-1][0]}): {reason}")
+            return
+        report.inserted += len(good)
+        report.batches += 1
+
+    batch: List[Tuple[int, dict]] = []
+    last_row = 0
+    try:
+        for row_no, raw in iter_rows(stream, filename):
+            last_row = row_no
+            report.total += 1
+            try:
+                batch.append((row_no, clean(raw, now)))
+            except ValueError as e:
+                report.add_error(row_no, str(e))
+                continue
+            if len(batch) >= batch_size:
+                await _flush(batch)
+                batch = []
+    except UnicodeDecodeError:
+        report.abort(last_row + 1, "کدگذاری فایل UTF-8 نیست (بایت نامعتبر)")
+    except (ValueError, csv.Error) as e:
+        report.abort(last_row + 1, str(e))
+    if batch:
+        await _flush(batch)
+
+    report.elapsed = time.perf_counter() - t0
+    return report
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from typing import Optional, Dict, Tuple, List
-from datetime import date
+from typing import Optional, Dict, Tuple, List, NamedTuple, Sequence
+from datetime import date, timedelta
 from db import crud
 from utils.validators import parse_numeric
 
@@ -55,6 +55,14 @@ def get_period_bounds(scope: str, when: Optional[date] = None, week_start: int =
         return crud.get_month_bounds(when)
     raise ValueError("invalid scope")
 
+def last_periods(scope: str, count: int, when: Optional[date] = None, week_start: int = 0) -> List[Tuple[date, date]]:
+    """count دوره‌ی اخیر (دوره‌ی شامل when آخرین است)، از قدیم به جدید."""
+    periods = [get_period_bounds(scope, when=when, week_start=week_start)]
+    while len(periods) < count:
+        periods.append(get_period_bounds(scope, when=periods[-1][0] - timedelta(days=1), week_start=week_start))
+    periods.reverse()
+    return periods
+
 # =========================================
 #  ثبت/آپدیت KPI و گزارش دوره
 # =========================================
@@ -101,7 +109,93 @@ async def report_dict(
     )
     return data, start_d, end_d
 
-def format_report_text(scope: str, period_start: date, period_end: date, data: Dict[str, float]) -> str:
+# =========================================
+#  روند چنددوره‌ای (ماتریس متریک × دوره)
+# =========================================
+# تعداد پیش‌فرض دوره‌ها در نمای روند
+TREND_PERIODS: Dict[str, int] = {"weekly": 8, "monthly": 6}
+
+
+class KPITrend(NamedTuple):
+    """
+    values[metric][i] مقدار دوره‌ی periods[i] (None = ثبت نشده)؛ deltas و pct اختلاف و درصد تغییر
+    نسبت به دوره‌ی قبل (برای دوره‌ی اول یا وقتی یکی از دو مقدار نیست None).
+    """
+    scope: str
+    periods: List[Tuple[date, date]]
+    values: Dict[str, List[Optional[float]]]
+    deltas: Dict[str, List[Optional[float]]]
+    pct: Dict[str, List[Optional[float]]]
+
+    def current(self) -> Dict[str, float]:
+        """داده‌ی آخرین دوره به شکل report_dict."""
+        return {m: row[-1] for m, row in self.values.items() if row[-1] is not None}
+
+
+def period_deltas(values: Sequence[Optional[float]]) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+    """اختلاف و درصد تغییر هر ستون با ستون قبلی، یک‌جا روی کل ردیف."""
+    prev, cur = [None, *values[:-1]], values
+    deltas = [c - p if c is not None and p is not None else None for p, c in zip(prev, cur)]
+    pct = [d / abs(p) * 100 if d is not None and p else None for p, d in zip(prev, deltas)]
+    return deltas, pct
+
+
+async def trend_matrix(
+    session,
+    *,
+    scope: str,
+    periods: Optional[int] = None,
+    when: Optional[date] = None,
+    client_id: Optional[int] = None,
+    week_start: int = 0,
+    metrics: Optional[Sequence[str]] = None,
+) -> KPITrend:
+    """ماتریس متریک × دوره برای periods دوره‌ی اخیر با یک کوئری روی kpi_records."""
+    bounds = last_periods(scope, periods or TREND_PERIODS.get(scope, 6), when=when, week_start=week_start)
+    slugs = list(metrics) if metrics is not None else [slug for _, slug in get_metrics(scope)]
+    rows = await crud.list_kpi_values_for_periods(
+        session, scope=scope, metrics=slugs, period_starts=[start for start, _ in bounds], client_id=client_id,
+    )
+    column = {start: i for i, (start, _) in enumerate(bounds)}
+    values: Dict[str, List[Optional[float]]] = {}
+    for metric, start, value in rows:
+        values.setdefault(metric, [None] * len(bounds))[column[start]] = value
+    deltas: Dict[str, List[Optional[float]]] = {}
+    pct: Dict[str, List[Optional[float]]] = {}
+    for metric, row in values.items():
+        deltas[metric], pct[metric] = period_deltas(row)
+    return KPITrend(scope, bounds, values, deltas, pct)
+
+
+def _num(v: Optional[float]) -> str:
+    if v is None:
+        return "–"
+    return f"{v:,.0f}" if float(v).is_integer() else f"{v:,.2f}"
+
+
+def _trend_arrow(delta: Optional[float], pct: Optional[float]) -> str:
+    if delta is None:
+        return ""
+    if delta == 0:
+        return " ➡️ 0"
+    arrow, sign = ("🔼", "+") if delta > 0 else ("🔽", "-")
+    pct_h = f" ({pct:+.1f}%)" if pct is not None else ""
+    return f" {arrow} {sign}{_num(abs(delta))}{pct_h}"
+
+
+def format_report_text(
+    scope: str,
+    period_start: date,
+    period_end: date,
+    data: Dict[str, float],
+    trend: Optional[KPITrend] = None,
+) -> str:
+    """
+    بدون trend: مقدار هر KPI در یک دوره. با trend (حالت روند): سری مقادیر دوره‌ها و
+    فلش/اختلاف/درصد تغییر آخرین دوره نسبت به دوره‌ی قبل.
+    """
+    if trend is not None:
+        return _format_trend_text(trend)
     lines = [f"📊 گزارش KPI مارکتینگ {scope_fa(scope)}\n({period_start} تا {period_end})"]
     if not data:
         lines.append("— داده‌ای ثبت نشده است —")
@@ -110,3 +204,19 @@ def format_report_text(scope: str, period_start: date, period_end: date, data: D
     for slug, val in sorted(data.items(), key=lambda kv: fa_name(kv[0])):
         lines.append(f"• {fa_name(slug)}: {val}")
     return "\n".join(lines)
+
+
+def _format_trend_text(trend: KPITrend) -> str:
+    first, last = trend.periods[0][0], trend.periods[-1][1]
+    lines = [
+        f"📈 روند KPI مارکتینگ {scope_fa(trend.scope)} — {len(trend.periods)} دوره\n({first} تا {last})",
+        "مقادیر از قدیم به جدید؛ فلش = آخرین دوره نسبت به دوره‌ی قبل",
+    ]
+    if not trend.values:
+        lines.append("— داده‌ای ثبت نشده است —")
+        return "\n".join(lines)
+    for slug in sorted(trend.values, key=fa_name):
+        series = " → ".join(_num(v) for v in trend.values[slug])
+        arrow = _trend_arrow(trend.deltas[slug][-1], trend.pct[slug][-1])
+        lines.append(f"• {fa_name(slug)}:{arrow}\n   {series}")
+    return "\n".join(lines)
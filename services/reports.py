@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from db import crud, outbox
+from utils.constants import KPI_YELLOW_RATIO, INACTIVITY_WARN_DAYS, FEEDBACK_WARN_SCORE
+from utils.notify import TELEGRAM_TEXT_LIMIT, group_message
+from config import SALES_WARN_THRESHOLD, REPORT_TOPIC_ID, REPORT_PAGE_TTL_S, REPORT_PAGE_CACHE_MAX
+
+log = logging.getLogger(__name__)
+
+WEEKLY = "weekly"
+
+
+# =========================================
+#  گزارش هفتگی مشتریان
+# =========================================
+def render_weekly(
+    rows: Sequence[crud.ClientSummary], end_dt: datetime, *, title: str = "📊 گزارش هفتگی مشتریان"
+) -> Tuple[str, List[str]]:
+    """متن گزارش (همراه بخش هشدارها) و فهرست هشدارها را برمی‌گرداند."""
+    warn_lines: List[str] = []
+    return "\n".join(weekly_lines(rows, end_dt, warn_lines, title=title)), warn_lines
+
+
+def weekly_lines(
+    rows: Sequence[crud.ClientSummary], end_dt: datetime, warn_lines: List[str],
+    *, title: str = "📊 گزارش هفتگی مشتریان",
+) -> Iterator[str]:
+    """
+    بلوک‌های گزارش هفتگی (عنوان، یک بلوک چندخطی برای هر مشتری و در پایان بخش هشدارها)؛
+    هشدارها در warn_lines هم جمع می‌شوند.
+    """
+    yield title + "\n"
+
+    for r in rows:
+        target = r.target
+        acts = r.acts
+        fb_avg = r.fb_avg
+        last_ts = r.last_ts
+        sales_sum = r.sales_sum  # ✅ جمع فروش ۷روز
+
+        status_emoji = "⚪️"
+        if target > 0:
+            ratio = acts / max(target, 1)
+            if ratio >= 1.0:
+                status_emoji = "🟢"
+            elif ratio >= KPI_YELLOW_RATIO:
+                status_emoji = "🟡"
+            else:
+                status_emoji = "🔴"
+
+        fb_h = f"{fb_avg:.2f}" if fb_avg is not None else "-"
+        last_h = last_ts.strftime("%Y-%m-%d") if last_ts else "-"
+        sales_h = f"{sales_sum:,.0f}"
+
+        yield (
+            f"\n1️⃣ مشتری: {r.business_name}\n"
+            f"- وضعیت: {status_emoji}\n"
+            f"- KPI فعلی (۷روز): {acts} / {target}\n"
+            f"- فروش (۷روز): {sales_h}\n"
+            f"- بازخورد: {fb_h}\n"
+            f"- آخرین فعالیت: {last_h}"
+        )
+
+        # هشدارها
+        if fb_avg is not None and fb_avg < FEEDBACK_WARN_SCORE:
+            warn_lines.append(f"• رضایت پایین‌تر از آستانه ({r.business_name}): {fb_h}")
+        if last_ts is None or (end_dt - last_ts).days > INACTIVITY_WARN_DAYS:
+            days = (end_dt - last_ts).days if last_ts else "∞"
+            warn_lines.append(f"• عدم فعالیت نیرو > {INACTIVITY_WARN_DAYS} روز ({r.business_name}): {days} روز")
+        if SALES_WARN_THRESHOLD > 0 and sales_sum < SALES_WARN_THRESHOLD:
+            warn_lines.append(f"• فروش هفتگی پایین‌تر از آستانه ({r.business_name}): {sales_h} < {SALES_WARN_THRESHOLD:,.0f}")
+
+    if warn_lines:
+        yield "\n⚠️ هشدارها:"
+        yield from (f"- {w}" for w in warn_lines)
+
+
+async def build_weekly(session, start_dt: datetime, end_dt: datetime, **kw) -> Optional[Tuple[str, List[str]]]:
+    """گزارش بازه [start_dt, end_dt)؛ اگر مشتری‌ای ثبت نشده باشد None."""
+    rows = await crud.list_client_summaries(session, start_dt, end_dt)
+    if not rows:
+        return None
+    return render_weekly(rows, end_dt, **kw)
+
+
+def paginate(chunks: Iterable[str], limit: int = TELEGRAM_TEXT_LIMIT, sep: str = "\n") -> List[str]:
+    """
+    صفحه‌بندی متن از روی دنباله‌ای از تکه‌ها (خط یا بلوک چندخطی) که با sep به هم می‌چسبند:
+    تکه‌ها تا جای ممکن کامل در یک صفحه می‌مانند و فقط تکه‌ی بلندتر از limit در مرز خط‌هایش شکسته می‌شود.
+    """
+    pages: List[str] = []
+    cur: List[str] = []
+    size = 0
+    for chunk in chunks:
+        if cur and size + len(sep) + len(chunk) > limit:
+            pages.append(sep.join(cur))
+            cur, size = [], 0
+        if not cur and pages:
+            chunk = chunk.lstrip("\n")  # صفحه بعدی با خط خالی شروع نشود
+        if len(chunk) > limit:
+            pieces = paginate(chunk.split("\n"), limit) if "\n" in chunk else \
+                [chunk[i:i + limit] for i in range(0, len(chunk), limit)]
+            pages.extend(pieces[:-1])
+            chunk = pieces[-1]
+        size += len(chunk) + (len(sep) if cur else 0)
+        cur.append(chunk)
+    if cur:
+        pages.append(sep.join(cur))
+    return pages
+
+
+def split_message(text: str, limit: int = TELEGRAM_TEXT_LIMIT) -> List[str]:
+    """تقسیم متن طولانی در مرز خط‌ها به تکه‌های حداکثر limit کاراکتری."""
+    return paginate(text.split("\n"), limit)
+
+
+# =========================================
+#  صفحه‌های گزارش (next/prev بدون کوئری دوباره)
+# =========================================
+_PAGE_FOOTER_RESERVE = 32  # جای «📄 صفحه x/y» زیر هر صفحه
+
+
+class ReportPages:
+    """
+    کش کوتاه‌مدت صفحه‌های رندرشده‌ی گزارش‌ها با شناسه کوتاه (برای callback_data):
+    - LRU محدود (max_reports) با OrderedDict و انقضای ttl ثانیه پس از ساخت
+    - هر ورودی: صفحه‌ها + کیبوردی که زیر دکمه‌های ناوبری نمایش داده می‌شود
+    ورق زدن فقط از همین کش خوانده می‌شود؛ گزارش منقضی‌شده دوباره ساخته نمی‌شود.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_reports: int = 200) -> None:
+        self.ttl = ttl
+        self.max_reports = max_reports
+        self._data: "OrderedDict[str, Tuple[float, List[str], Any]]" = OrderedDict()
+
+    def put(self, pages: List[str], markup: Any = None) -> str:
+        report_id = secrets.token_hex(4)
+        self._data[report_id] = (time.monotonic() + self.ttl, pages, markup)
+        while len(self._data) > self.max_reports:
+            self._data.popitem(last=False)
+        return report_id
+
+    def get(self, report_id: str) -> Optional[Tuple[List[str], Any]]:
+        entry = self._data.get(report_id)
+        if entry is None:
+            return None
+        expires, pages, markup = entry
+        if expires < time.monotonic():
+            del self._data[report_id]
+            return None
+        self._data.move_to_end(report_id)
+        return pages, markup
+
+    def build(self, chunks: Iterable[str], markup: Any = None, sep: str = "\n") -> Tuple[Optional[str], List[str]]:
+        """
+        صفحه‌بندی گزارش؛ (report_id, pages). اگر یک صفحه کافی باشد چیزی کش نمی‌شود و report_id برابر None است.
+        """
+        pages = paginate(chunks, TELEGRAM_TEXT_LIMIT - _PAGE_FOOTER_RESERVE, sep)
+        if len(pages) <= 1:
+            return None, pages or [""]
+        return self.put(pages, markup), pages
+
+    @staticmethod
+    def page_text(pages: List[str], page: int) -> str:
+        if len(pages) <= 1:
+            return pages[0]
+        return f"{pages[page]}\n\n📄 صفحه {page + 1}/{len(pages)}"
+
+
+pages = ReportPages(ttl=REPORT_PAGE_TTL_S, max_reports=REPORT_PAGE_CACHE_MAX)
+
+
+# =========================================
+#  کار زمان‌بندی‌شده: ارسال گزارش هفتگی به گروه
+# =========================================
+async def publish_weekly(session, boundary: datetime) -> None:
+    """
+    گزارش هفته‌ی تمام‌شده در boundary (بازه [boundary-7d, boundary)) را می‌سازد،
+    در report_snapshots ذخیره و متن گزارش + پیام جداگانه هشدارها را در outbox می‌گذارد.
+    همه در تراکنش فراخوان (Scheduler) commit می‌شوند.
+    """
+    start_dt = boundary - timedelta(days=7)
+    period = f"{start_dt:%Y-%m-%d} تا {boundary - timedelta(days=1):%Y-%m-%d}"
+    built = await build_weekly(session, start_dt, boundary, title=f"📊 گزارش هفتگی مشتریان ({period})")
+    if built is None:
+        log.info("weekly report %s: no clients; skipped", period)
+        return
+    text, warnings = built
+    await crud.save_report_snapshot(session, WEEKLY, start_dt.date(), (boundary - timedelta(days=1)).date(), text)
+
+    queued = 0
+    for part in split_message(text):
+        queued += outbox.add_message(session, group_message(part, REPORT_TOPIC_ID))
+    if warnings:
+        alert = f"🚨 هشدارهای هفته ({period}):\n" + "\n".join(warnings)
+        for part in split_message(alert):
+            queued += outbox.add_message(session, group_message(part, REPORT_TOPIC_ID))
+    log.info("weekly report %s: %d clients' report stored, %d group messages queued",
+             period, text.count("1️⃣"), queued)
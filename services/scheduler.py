@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select
+
+from db import crud
+from db.models import ScheduledRun
+
+log = logging.getLogger(__name__)
+
+Job = Callable[..., Awaitable[None]]
+
+PERIODS = ("daily", "weekly", "monthly")
+_MAX_SLEEP_S = 300  # بیدار شدن دوره‌ای برای تلاش مجدد کار ناموفق و تحمل تغییر ساعت سیستم
+
+
+class Entry:
+    """
+    یک کار تکرارشونده شبیه cron: در هر مرز دوره (ابتدای روز/هفته/ماه در ساعت at، به وقت UTC) یک بار.
+    مرز هفته با crud.get_week_bounds و week_start (Monday=0 ... Sunday=6) تعیین می‌شود.
+    """
+
+    __slots__ = ("name", "job", "period", "at", "week_start")
+
+    def __init__(self, name: str, job: Job, *, period: str, at: time, week_start: int = 0) -> None:
+        if period not in PERIODS:
+            raise ValueError(f"invalid period: {period!r}")
+        self.name = name
+        self.job = job
+        self.period = period
+        self.at = at
+        self.week_start = week_start
+
+    def _period_start(self, d: date) -> date:
+        if self.period == "daily":
+            return d
+        if self.period == "weekly":
+            return crud.get_week_bounds(d, self.week_start)[0]
+        return crud.get_month_bounds(d)[0]
+
+    def _following_start(self, start: date) -> date:
+        if self.period == "daily":
+            return start + timedelta(days=1)
+        if self.period == "weekly":
+            return start + timedelta(days=7)
+        return crud.get_month_bounds(start)[1] + timedelta(days=1)
+
+    def last_boundary(self, now: datetime) -> datetime:
+        """آخرین مرزی که تا now فرا رسیده است."""
+        start = self._period_start(now.date())
+        boundary = datetime.combine(start, self.at)
+        if boundary > now:
+            boundary = datetime.combine(self._period_start(start - timedelta(days=1)), self.at)
+        return boundary
+
+    def next_boundary(self, now: datetime) -> datetime:
+        return datetime.combine(self._following_start(self.last_boundary(now).date()), self.at)
+
+
+class Scheduler:
+    """
+    زمان‌بند درون‌پروسه‌ای:
+    - آخرین مرز اجراشده‌ی هر کار در scheduled_runs ذخیره می‌شود؛ پس از ری‌استارت اگر مرزی جا افتاده باشد
+      کار یک بار برای آخرین مرز اجرا می‌شود (نه به تعداد مرزهای جاافتاده).
+    - کار با (session, boundary) صدا زده می‌شود و ثبت اجرا در همان تراکنش commit می‌شود؛
+      پس کار ناموفق ثبت نمی‌شود و در بیدار شدن بعدی دوباره اجرا می‌شود.
+    """
+
+    def __init__(self) -> None:
+        self.entries: List[Entry] = []
+        self._session_factory = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self.runs = 0
+        self.failures = 0
+
+    def add(self, name: str, job: Job, *, period: str = "weekly", at: time = time(0, 0), week_start: int = 0) -> Entry:
+        entry = Entry(name, job, period=period, at=at, week_start=week_start)
+        self.entries.append(entry)
+        return entry
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, session_factory) -> None:
+        if self.running or not self.entries:
+            return
+        self._session_factory = session_factory
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="scheduler")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+        log.info("scheduler stopped (runs=%s failures=%s)", self.runs, self.failures)
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            await self.run_due()
+            now = datetime.utcnow()
+            nxt = min(e.next_boundary(now) for e in self.entries)
+            timeout = min(max(0.0, (nxt - now).total_seconds()), _MAX_SLEEP_S)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _last_runs(self) -> Dict[str, datetime]:
+        async with self._session_factory() as session:
+            res = await session.execute(select(ScheduledRun.name, ScheduledRun.boundary))
+            return {name: boundary for name, boundary in res.all()}
+
+    async def run_due(self, now: Optional[datetime] = None) -> List[str]:
+        """کارهایی که مرز فعلی‌شان هنوز اجرا نشده را اجرا می‌کند؛ نام کارهای موفق را برمی‌گرداند."""
+        now = now or datetime.utcnow()
+        try:
+            done = await self._last_runs()
+        except Exception:
+            log.exception("scheduler: failed to read scheduled_runs")
+            return []
+        ran = []
+        for entry in self.entries:
+            boundary = entry.last_boundary(now)
+            prev = done.get(entry.name)
+            if prev is not None and prev >= boundary:
+                continue
+            if await self._execute(entry, boundary):
+                ran.append(entry.name)
+        return ran
+
+    async def _execute(self, entry: Entry, boundary: datetime) -> bool:
+        log.info("⏰ running %s for %s", entry.name, boundary)
+        try:
+            async with self._session_factory() as session:
+                await entry.job(session, boundary)
+                await session.merge(ScheduledRun(name=entry.name, boundary=boundary, finished_at=datetime.utcnow()))
+                await session.commit()
+        except Exception:
+            self.failures += 1
+            log.exception("scheduler: %s failed for %s; will retry", entry.name, boundary)
+            return False
+        self.runs += 1
+        return True
+
+
+scheduler = Scheduler()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+log = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    دریافت آپدیت‌ها از webhook تلگرام:
+    - هدر X-Telegram-Bot-Api-Secret-Token با secret_token بررسی می‌شود.
+    - پاسخ 200 فوراً برگردانده می‌شود و پردازش در پس‌زمینه انجام می‌شود.
+    - حداکثر max_concurrency آپدیت همزمان پردازش می‌شود (بقیه منتظر می‌مانند).
+    - هنگام خاموش شدن، آپدیت‌های در حال پردازش تا drain_timeout ثانیه تمام می‌شوند.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        secret_token: str,
+        max_concurrency: int = 32,
+        drain_timeout: float = 10.0,
+        **data: Any,
+    ) -> None:
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.drain_timeout = drain_timeout
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._slots:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception:
+                log.exception("webhook update %s failed", update.get("update_id"))
+
+    async def close(self) -> None:
+        pending = list(self._background_feed_update_tasks)
+        if pending:
+            log.info("⏳ Draining %d in-flight webhook updates…", len(pending))
+            await asyncio.wait(pending, timeout=self.drain_timeout)
+        await super().close()
+
+
+async def start_webhook_server(
+    dp: Dispatcher,
+    bot: Bot,
+    *,
+    path: str,
+    host: str,
+    port: int,
+    secret_token: str,
+    max_concurrency: int,
+    **data: Any,
+) -> web.AppRunner:
+    """سرور aiohttp را بالا می‌آورد (بدون ثبت webhook در تلگرام) و runner را برمی‌گرداند."""
+    app = web.Application()
+    BoundedRequestHandler(
+        dp, bot, secret_token=secret_token, max_concurrency=max_concurrency, **data
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot, **data)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    *,
+    base_url: str,
+    path: str,
+    host: str,
+    port: int,
+    secret_token: str,
+    max_concurrency: int,
+) -> None:
+    """
+    حالت webhook: سرور را اجرا و آدرس را در تلگرام ثبت می‌کند.
+    آپدیت‌های در صف حذف نمی‌شوند و webhook هنگام خروج باقی می‌ماند تا
+    آپدیت‌های رسیده در زمان ری‌استارت از دست نروند.
+    """
+    runner = await start_webhook_server(
+        dp, bot, path=path, host=host, port=port,
+        secret_token=secret_token, max_concurrency=max_concurrency,
+    )
+    url = base_url.rstrip("/") + path
+    await bot.set_webhook(
+        url,
+        secret_token=secret_token,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=False,
+    )
+    log.info("🌐 Webhook listening on %s:%s%s → %s (max %d concurrent)", host, port, path, url, max_concurrency)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,13 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Optional
+import random
+import time
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
 
 # از کانفیگ پروژه: آیدی عددی گروه گزارش‌ها و آیدی تاپیک‌ها
-from config import REPORTS_GROUP_ID, STAFF_TOPIC_ID, CLIENT_TOPIC_ID
+from config import (
+    REPORTS_GROUP_ID, STAFF_TOPIC_ID, CLIENT_TOPIC_ID,
+    NOTIFY_QUEUE_MAX, NOTIFY_PER_MINUTE, NOTIFY_BURST,
+    NOTIFY_MAX_RETRIES, NOTIFY_BACKOFF_MS, NOTIFY_BACKOFF_MAX_S, NOTIFY_COALESCE_MS,
+)
 
 log = logging.getLogger(__name__)
 
@@ -29,16 +37,371 @@ def _fmt_dt(dt: Optional[datetime] | Optional[str]) -> str:
     except Exception:
         return str(dt)
 
+# -----------------------------
+# صف ارسال پس‌زمینه
+# -----------------------------
+_STOP = object()
+
+
+class TokenBucket:
+    """سطل توکن ساده: rate توکن در ثانیه، حداکثر capacity توکن ذخیره."""
+
+    __slots__ = ("rate", "capacity", "tokens", "stamp", "not_before")
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.stamp = time.monotonic()
+        self.not_before = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self.not_before:
+                await asyncio.sleep(self.not_before - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def hold(self, seconds: float) -> None:
+        """بعد از RetryAfter: تا seconds ثانیه چیزی ارسال نشود و سطل خالی از سر گرفته شود."""
+        self.not_before = max(self.not_before, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.stamp = self.not_before
+
+
+class _Lane:
+    __slots__ = ("queue", "bucket", "task")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.bucket = bucket
+        self.task: Optional[asyncio.Task] = None
+
+
+class NotifyDispatcher:
+    """
+    ارسال پس‌زمینه اعلان‌ها به تلگرام:
+    - submit فوراً برمی‌گردد؛ هر چت صف و worker خودش را دارد تا ترتیب پیام‌ها حفظ شود.
+    - سطل توکن برای هر چت (per_minute پیام در دقیقه، burst پیام پشت سر هم).
+    - TelegramRetryAfter: ارسال در آن چت به اندازه retry_after متوقف و همان پیام دوباره فرستاده می‌شود.
+    - خطای شبکه/سرور: تلاش مجدد با backoff نمایی (با jitter) تا max_retries بار.
+    - سایر خطاها (مثلاً چت/تاپیک نامعتبر) تلاش مجدد ندارند و ثبت می‌شوند.
+    - مجموع پیام‌های در انتظار حداکثر max_queue است؛ مازاد دور ریخته و شمارش می‌شود.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue: int = NOTIFY_QUEUE_MAX,
+        per_minute: int = NOTIFY_PER_MINUTE,
+        burst: int = NOTIFY_BURST,
+        max_retries: int = NOTIFY_MAX_RETRIES,
+        backoff_ms: int = NOTIFY_BACKOFF_MS,
+        backoff_max_s: int = NOTIFY_BACKOFF_MAX_S,
+    ) -> None:
+        self.max_queue = max_queue
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_s = backoff_ms / 1000
+        self.backoff_max_s = backoff_max_s
+        self._bot: Optional[Bot] = None
+        self._lanes: Dict[int, _Lane] = {}
+        self._pending = 0
+        self._running = False
+        self.sent = 0
+        self.retried = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._running = True
+
+    def submit(
+        self, chat_id: int, text: str, thread_id: Optional[int] = None, *, done: Optional[asyncio.Future] = None
+    ) -> bool:
+        """
+        اعلان را در صف می‌گذارد؛ اگر صف پر باشد False برمی‌گرداند.
+        done (اختیاری) پس از پایان کار با True (ارسال شد) یا False (ناموفق) کامل می‌شود.
+        """
+        if self._pending >= self.max_queue:
+            self.dropped += 1
+            log.warning("notify queue full (%d); dropping message for chat %s", self._pending, chat_id)
+            return False
+        kwargs = {"chat_id": chat_id, "text": text}
+        if thread_id and int(thread_id) > 0:
+            kwargs["message_thread_id"] = int(thread_id)
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = _Lane(TokenBucket(self.rate, self.burst))
+            lane.task = asyncio.create_task(self._run(lane), name=f"notify-{chat_id}")
+        lane.queue.put_nowait((kwargs, done))
+        self._pending += 1
+        return True
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """پیام‌های در صف تا timeout ثانیه ارسال می‌شوند؛ باقی‌مانده لغو و به عنوان dropped ثبت می‌شود."""
+        if not self._running:
+            return
+        self._running = False
+        tasks = []
+        for lane in self._lanes.values():
+            lane.queue.put_nowait(_STOP)
+            tasks.append(lane.task)
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for t in pending:
+                t.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        for lane in self._lanes.values():
+            while not lane.queue.empty():
+                item = lane.queue.get_nowait()
+                if item is not _STOP and item[1] is not None and not item[1].done():
+                    item[1].set_result(False)
+        self.dropped += self._pending
+        self._pending = 0
+        self._lanes.clear()
+        log.info("notify dispatcher stopped: %s", self.stats())
+
+    def flush_all(self) -> None:
+        """dispatcher بافری ندارد؛ برای هم‌خوانی با Coalescer."""
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "sent": self.sent,
+            "retried": self.retried,
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    # ---------- worker هر چت ----------
+    async def _run(self, lane: _Lane) -> None:
+        while True:
+            item = await lane.queue.get()
+            if item is _STOP:
+                break
+            kwargs, done = item
+            ok = False
+            try:
+                ok = await self._deliver(lane.bucket, kwargs)
+            except asyncio.CancelledError:
+                self.dropped += 1
+                raise
+            finally:
+                self._pending -= 1
+                if done is not None and not done.done():
+                    done.set_result(ok)
+
+    async def _deliver(self, bucket: TokenBucket, kwargs: dict) -> bool:
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                await self._bot.send_message(**kwargs)
+                self.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                self.throttled += 1
+                log.warning("notify: flood limit in chat %s, retry after %ss", kwargs["chat_id"], e.retry_after)
+                bucket.hold(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                self.retried += 1
+                delay = min(self.backoff_max_s, self.backoff_s * 2 ** attempt) * random.uniform(0.5, 1.0)
+                log.warning("notify: %s; retrying in %.1fs (attempt %d)", e, delay, attempt + 1)
+                await asyncio.sleep(delay)
+            except Exception:
+                self.failed += 1
+                log.exception("notify: failed to send message to chat %s", kwargs["chat_id"])
+                return False
+        self.failed += 1
+        log.error("notify: giving up on message to chat %s after %d attempts", kwargs["chat_id"], self.max_retries + 1)
+        return False
+
+
+dispatcher = NotifyDispatcher()
+
+
+# -----------------------------
+# ادغام اعلان‌های پشت‌سرهم (digest)
+# -----------------------------
+TELEGRAM_TEXT_LIMIT = 4096
+
+
+class _Event:
+    __slots__ = ("text", "meta", "done")
+
+    def __init__(self, text: str, meta: dict, done: Optional[asyncio.Future]) -> None:
+        self.text = text
+        self.meta = meta
+        self.done = done
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def render_digest(events: List[_Event], limit: int = TELEGRAM_TEXT_LIMIT) -> List[Tuple[str, List[_Event]]]:
+    """
+    رویدادها را بر اساس meta["group"] (نیرو) و meta["item"] (مشتری) با حفظ ترتیب ورود گروه‌بندی
+    و به یک یا چند پیام حداکثر limit کاراکتری تبدیل می‌کند. هر پیام رویدادهای خودش را هم برمی‌گرداند.
+    سرتیتر نیرو/مشتری در ابتدای هر تکه تکرار می‌شود.
+    """
+    groups: Dict[str, Dict[Optional[str], List[_Event]]] = {}
+    for e in events:
+        groups.setdefault(e.meta.get("group") or "-", {}).setdefault(e.meta.get("item"), []).append(e)
+
+    budget = limit - 64  # جا برای تیتر و شماره تکه
+    chunks: List[Tuple[List[str], List[_Event]]] = []
+    lines: List[str] = []
+    members: List[_Event] = []
+    size = 0
+    for group, items in groups.items():
+        group_head = f"👤 {group}"
+        group_open = False
+        for item, evs in items.items():
+            item_head = [f"  🏢 {item}"] if item is not None else []
+            indent = "    " if item is not None else "  "
+            item_open = False
+            for e in evs:
+                line = indent + "• " + _clip(e.meta.get("line") or e.text, budget // 2)
+                add = ([] if group_open else [group_head]) + ([] if item_open else item_head) + [line]
+                if lines and size + sum(len(x) + 1 for x in add) > budget:
+                    chunks.append((lines, members))
+                    lines, members, size = [], [], 0
+                    add = [group_head] + item_head + [line]
+                lines.extend(add)
+                members.append(e)
+                size += sum(len(x) + 1 for x in add)
+                group_open = item_open = True
+    if lines:
+        chunks.append((lines, members))
+
+    out = []
+    for i, (lines, members) in enumerate(chunks, 1):
+        title = f"🗂 خلاصه {len(members)} اعلان" + (f" ({i}/{len(chunks)})" if len(chunks) > 1 else "")
+        out.append(("\n".join([title, ""] + lines), members))
+    return out
+
+
+class Coalescer:
+    """
+    مرحله ادغام قبل از dispatcher:
+    - اعلان‌های دارای meta در هر (چت، تاپیک) به مدت window_ms جمع و در یک پیام خلاصه
+      (گروه‌بندی بر اساس نیرو و مشتری) فرستاده می‌شوند؛ خلاصه در مرز ۴۰۹۶ کاراکتر چند تکه می‌شود.
+    - اگر در پنجره فقط یک اعلان باشد، همان متن کامل اصلی فرستاده می‌شود.
+    - window_ms=0 یا اعلان بدون meta: بدون ادغام و فوری به dispatcher.
+    - done هر اعلان با نتیجه‌ی ارسال پیامی که آن را در بر دارد کامل می‌شود.
+    """
+
+    def __init__(self, sender: NotifyDispatcher, *, window_ms: int = NOTIFY_COALESCE_MS,
+                 limit: int = TELEGRAM_TEXT_LIMIT) -> None:
+        self.sender = sender
+        self.window_s = window_ms / 1000
+        self.limit = limit
+        self._buffers: Dict[tuple, List[_Event]] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self.events = 0
+        self.messages = 0
+
+    @property
+    def running(self) -> bool:
+        return self.sender.running
+
+    def submit(
+        self, chat_id: int, text: str, thread_id: Optional[int] = None, *,
+        meta: Optional[dict] = None, done: Optional[asyncio.Future] = None,
+    ) -> bool:
+        self.events += 1
+        if self.window_s <= 0 or not meta:
+            self.messages += 1
+            return self.sender.submit(chat_id, text, thread_id, done=done)
+        key = (chat_id, thread_id or None)
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = []
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window_s, self._flush, key)
+        buf.append(_Event(text, meta, done))
+        return True
+
+    def flush_all(self) -> None:
+        """ارسال فوری همه بافرها (هنگام توقف)."""
+        for key in list(self._timers):
+            self._timers[key].cancel()
+            self._flush(key)
+        self.sender.flush_all()
+
+    def _flush(self, key: tuple) -> None:
+        self._timers.pop(key, None)
+        events = self._buffers.pop(key, None)
+        if not events:
+            return
+        chat_id, thread_id = key
+        if len(events) == 1:
+            self._send(chat_id, thread_id, events[0].text, events)
+            return
+        for text, members in render_digest(events, self.limit):
+            self._send(chat_id, thread_id, text, members)
+
+    def _send(self, chat_id: int, thread_id: Optional[int], text: str, events: List[_Event]) -> None:
+        waiters = [e.done for e in events if e.done is not None]
+        fut = None
+        if waiters:
+            fut = asyncio.get_running_loop().create_future()
+
+            def _settle(f: asyncio.Future) -> None:
+                ok = not f.cancelled() and bool(f.result())
+                for w in waiters:
+                    if not w.done():
+                        w.set_result(ok)
+
+            fut.add_done_callback(_settle)
+        self.messages += 1
+        if not self.sender.submit(chat_id, text, thread_id, done=fut) and fut is not None:
+            fut.set_result(False)
+
+    def stats(self) -> dict:
+        return {"events": self.events, "messages": self.messages, "buffered": sum(map(len, self._buffers.values()))}
+
+
+coalescer = Coalescer(dispatcher)
+
+
 async def _safe_send(bot: Bot, text: str, thread_id: Optional[int]) -> None:
     """
     اگر REPORTS_GROUP_ID ست باشد، پیام را می‌فرستد.
     اگر thread_id ست باشد، پیام در همان تاپیک ارسال می‌شود.
-    هر خطایی اینجا قورت داده می‌شود تا جریان اصلی بات از کار نیفتد.
+    وقتی dispatcher در حال اجراست پیام فقط در صف قرار می‌گیرد و هندلر منتظر تلگرام نمی‌ماند؛
+    در غیر این صورت (اسکریپت‌ها) مستقیم ارسال می‌شود. خطاها قورت داده می‌شوند تا جریان اصلی بات از کار نیفتد.
     """
     if not REPORTS_GROUP_ID:
         log.debug("REPORTS_GROUP_ID not set; skipping group notify.")
         return
 
+    if dispatcher.running:
+        dispatcher.submit(REPORTS_GROUP_ID, text, thread_id)
+        return
+
     try:
         kwargs = {"chat_id": REPORTS_GROUP_ID, "text": text}
         if thread_id and int(thread_id) > 0:
@@ -50,8 +413,7 @@ async def _safe_send(bot: Bot, text: str, thread_id: Optional[int]) -> None:
 # -----------------------------
 # اعلان: فعالیت نیروی مارکتینگ
 # -----------------------------
-async def notify_staff_activity(
-    bot: Bot,
+def staff_activity_text(
     activity=None,
     client=None,
     staff=None,
@@ -65,9 +427,9 @@ async def notify_staff_activity(
     goal: Optional[str] = None,
     result: Optional[str] = None,
     evidence: Optional[str] = None,
-) -> None:
+) -> str:
     """
-    اطلاع‌رسانی ثبت فعالیت جدید در تاپیک «گزارش نیروها».
+    متن اعلان ثبت فعالیت جدید برای تاپیک «گزارش نیروها».
     می‌توانی یا آبجکت‌های activity/client/staff را بدهی،
     یا با پارامترهای ستاره‌دار اطلاعات را پاس بدهی.
     """
@@ -106,7 +468,12 @@ async def notify_staff_activity(
         f"• نوع/پلتفرم: {typ} / {plat}\n"
         f"• جزئیات: {extra_h}"
     )
-    await _safe_send(bot, text, thread_id=STAFF_TOPIC_ID)
+    return text
+
+
+async def notify_staff_activity(bot: Bot, activity=None, client=None, staff=None, **fields) -> None:
+    """اطلاع‌رسانی ثبت فعالیت جدید در تاپیک «گزارش نیروها» (ورودی‌ها مثل staff_activity_text)."""
+    await _safe_send(bot, staff_activity_text(activity, client, staff, **fields), thread_id=STAFF_TOPIC_ID)
 
 # سازگاری رو به عقب با نام‌های قبلی که در بعضی هندلرها استفاده شده
 async def notify_activity(
@@ -139,17 +506,16 @@ async def notify_activity(
 # -----------------------------
 # اعلان: بازخورد مشتری
 # -----------------------------
-async def notify_client_feedback(
-    bot: Bot,
+def client_feedback_text(
     feedback=None,
     client=None,
     *,
     client_name: Optional[str] = None,
     score: Optional[int] = None,
     comment: Optional[str] = None,
-) -> None:
+) -> str:
     """
-    اطلاع‌رسانی ثبت بازخورد جدید در تاپیک «گزارش مشتری‌ها».
+    متن اعلان ثبت بازخورد جدید برای تاپیک «گزارش مشتری‌ها».
     """
     if feedback is not None:
         created = getattr(feedback, "created_at", None)
@@ -172,7 +538,12 @@ async def notify_client_feedback(
         f"• امتیاز: {stars} ({score or 0}/5)\n"
         f"• توضیح: {comment_h}"
     )
-    await _safe_send(bot, text, thread_id=CLIENT_TOPIC_ID)
+    return text
+
+
+async def notify_client_feedback(bot: Bot, feedback=None, client=None, **fields) -> None:
+    """اطلاع‌رسانی ثبت بازخورد جدید در تاپیک «گزارش مشتری‌ها» (ورودی‌ها مثل client_feedback_text)."""
+    await _safe_send(bot, client_feedback_text(feedback, client, **fields), thread_id=CLIENT_TOPIC_ID)
 
 # سازگاری با نام قبلی
 async def notify_feedback(
@@ -191,3 +562,73 @@ async def notify_feedback(
         score=score,
         comment=comment,
     )
+
+
+# -----------------------------
+# اعلان: ثبت فروش
+# -----------------------------
+def sale_text(
+    *,
+    client_name: Optional[str],
+    amount: float,
+    ts: Optional[datetime | str] = None,
+    source: Optional[str] = None,
+    note: Optional[str] = None,
+    actor_name: Optional[str] = None,
+) -> str:
+    """متن اعلان ثبت فروش جدید برای تاپیک «گزارش نیروها»."""
+    return (
+        "💰 ثبت فروش جدید\n"
+        f"• مشتری: {client_name or '-'}\n"
+        f"• مبلغ: {amount:,.0f}\n"
+        f"• زمان: {_fmt_dt(ts)}\n"
+        f"• منبع: {source or '-'}\n"
+        f"• ثبت توسط: {actor_name or '-'}"
+        + (f"\n• یادداشت: {note}" if note else "")
+    )
+
+
+# -----------------------------
+# پیام‌های outbox (در همان تراکنش ثبت رکورد؛ ارسال با db.outbox.relay)
+# -----------------------------
+def _fmt_hm(ts: Optional[datetime | str]) -> str:
+    h = _fmt_dt(ts)
+    return h[-5:] if len(h) == 16 else h
+
+
+def group_message(text: str, thread_id: Optional[int], meta: Optional[dict] = None) -> Optional[dict]:
+    """
+    پیام گروه گزارش‌ها برای crud (پارامتر notify)؛ اگر REPORTS_GROUP_ID ست نباشد None.
+    meta (اختیاری) برای ادغام در پیام خلاصه: {"group", "item", "line"}.
+    """
+    if not REPORTS_GROUP_ID:
+        return None
+    return {
+        "chat_id": REPORTS_GROUP_ID,
+        "thread_id": int(thread_id) if thread_id and int(thread_id) > 0 else None,
+        "text": text,
+        "meta": meta,
+    }
+
+
+def activity_message(**fields) -> Optional[dict]:
+    line = f"📝 {fields.get('activity_type') or '-'} / {fields.get('platform') or '-'} · {_fmt_hm(fields.get('ts'))}"
+    if fields.get("goal"):
+        line += f" · {fields['goal']}"
+    meta = {"group": fields.get("staff_name") or "-", "item": fields.get("client_name") or "-", "line": line}
+    return group_message(staff_activity_text(**fields), STAFF_TOPIC_ID, meta)
+
+
+def feedback_message(**fields) -> Optional[dict]:
+    score = int(fields.get("score") or 0)
+    line = f"{'⭐' * max(1, min(5, score))} ({score}/5)"
+    if fields.get("comment"):
+        line += f" · {fields['comment']}"
+    meta = {"group": fields.get("client_name") or "-", "item": None, "line": line}
+    return group_message(client_feedback_text(**fields), CLIENT_TOPIC_ID, meta)
+
+
+def sale_message(**fields) -> Optional[dict]:
+    line = f"💰 {fields['amount']:,.0f} · {fields.get('source') or '-'} · {_fmt_hm(fields.get('ts'))}"
+    meta = {"group": fields.get("actor_name") or "-", "item": fields.get("client_name") or "-", "line": line}
+    return group_message(sale_text(**fields), STAFF_TOPIC_ID, meta)
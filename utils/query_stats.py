@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import N_PLUS_ONE_THRESHOLD, SLOW_UPDATE_QUERIES
+
+log = logging.getLogger(__name__)
+
+# -----------------------------
+# شکل کوئری: پارامترها و لیست‌های IN یکسان‌سازی می‌شوند
+# -----------------------------
+_PARAM = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_IN_LIST = re.compile(r"\(\s*" + _PARAM + r"(?:\s*,\s*" + _PARAM + r")*\s*\)")
+_POSITIONAL = re.compile(r"\$\d+|%\(\w+\)s")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(sql: str) -> str:
+    sql = _POSITIONAL.sub("?", sql)
+    sql = _IN_LIST.sub("(?)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class UpdateQueryStats:
+    """آمار SQL یک آپدیت: تعداد، زمان کل DB و تکرار هر شکل کوئری."""
+
+    __slots__ = ("handler", "statements", "db_time", "shapes", "closed", "_starts")
+
+    def __init__(self) -> None:
+        self.handler: Optional[str] = None
+        self.statements = 0
+        self.db_time = 0.0
+        self.shapes: Counter = Counter()
+        self.closed = False
+        self._starts: list = []
+
+
+_current: ContextVar[Optional[UpdateQueryStats]] = ContextVar("update_query_stats", default=None)
+
+
+class _HandlerTotals:
+    __slots__ = ("updates", "statements", "db_time", "max_statements", "n_plus_one")
+
+    def __init__(self) -> None:
+        self.updates = 0
+        self.statements = 0
+        self.db_time = 0.0
+        self.max_statements = 0
+        self.n_plus_one = 0
+
+
+class QueryStatsMiddleware(BaseMiddleware):
+    """
+    middleware بیرونی روی update: برای هر آپدیت یک UpdateQueryStats در contextvar می‌گذارد و
+    listenerهای before/after_cursor_execute موتور (یک بار نصب‌شده) فقط در همان context می‌شمارند.
+    - اگر یک شکل کوئری در یک آپدیت بیش از threshold بار اجرا شود هشدار N+1 ثبت می‌شود.
+    - آپدیت‌های با بیش از slow_queries دستور با سطح INFO و بقیه با DEBUG لاگ می‌شوند.
+    - جمع آمار هر هندلر در totals نگه داشته و با summary() گزارش می‌شود.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        threshold: int = N_PLUS_ONE_THRESHOLD,
+        slow_queries: int = SLOW_UPDATE_QUERIES,
+    ) -> None:
+        self.threshold = threshold
+        self.slow_queries = slow_queries
+        self.totals: Dict[str, _HandlerTotals] = {}
+        self._engine = engine.sync_engine
+        event.listen(self._engine, "before_cursor_execute", self._before)
+        event.listen(self._engine, "after_cursor_execute", self._after)
+
+    def close(self) -> None:
+        event.remove(self._engine, "before_cursor_execute", self._before)
+        event.remove(self._engine, "after_cursor_execute", self._after)
+
+    # ---------- listenerهای SQLAlchemy ----------
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        stats = _current.get()
+        if stats is None or stats.closed:
+            return
+        stats.statements += 1
+        stats.shapes[statement_shape(statement)] += 1
+        stats._starts.append(time.perf_counter())
+
+    @staticmethod
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        stats = _current.get()
+        if stats is None or stats.closed or not stats._starts:
+            return
+        stats.db_time += time.perf_counter() - stats._starts.pop()
+
+    # ---------- middleware ----------
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        stats = UpdateQueryStats()
+        token = _current.set(stats)
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            _current.reset(token)
+            # تسک‌های پس‌زمینه‌ای که در این آپدیت ساخته شده‌اند context را به ارث می‌برند؛ دیگر شمرده نشوند
+            stats.closed = True
+            self._record(event, stats, time.perf_counter() - t0)
+
+    def _record(self, event: TelegramObject, stats: UpdateQueryStats, elapsed: float) -> None:
+        name = stats.handler or "-"
+        update_id = event.update_id if isinstance(event, Update) else None
+        tot = self.totals.get(name)
+        if tot is None:
+            tot = self.totals[name] = _HandlerTotals()
+        tot.updates += 1
+        tot.statements += stats.statements
+        tot.db_time += stats.db_time
+        tot.max_statements = max(tot.max_statements, stats.statements)
+
+        repeated = [(n, shape) for shape, n in stats.shapes.items() if n > self.threshold]
+        for n, shape in repeated:
+            tot.n_plus_one += 1
+            log.warning("N+1 suspected in %s (update %s): %d× %s", name, update_id, n, shape[:300])
+
+        level = logging.INFO if stats.statements > self.slow_queries else logging.DEBUG
+        log.log(level, "update %s → %s: %d SQL statements, db %.1f ms, total %.1f ms",
+                update_id, name, stats.statements, stats.db_time * 1000, elapsed * 1000)
+
+    def summary(self, top: int = 10) -> str:
+        rows = sorted(self.totals.items(), key=lambda kv: kv[1].statements, reverse=True)[:top]
+        lines = [f"{'handler':<55} {'updates':>7} {'avg q':>6} {'max q':>6} {'avg db ms':>9} {'n+1':>4}"]
+        for name, t in rows:
+            lines.append(
+                f"{name[-55:]:<55} {t.updates:>7} {t.statements / t.updates:>6.1f} {t.max_statements:>6} "
+                f"{t.db_time * 1000 / t.updates:>9.1f} {t.n_plus_one:>4}"
+            )
+        return "\n".join(lines)
+
+
+class _HandlerName(BaseMiddleware):
+    """middleware داخلی: نام هندلر انتخاب‌شده را در آمار آپدیت جاری ثبت می‌کند."""
+
+    async def __call__(self, handler, event, data):
+        stats = _current.get()
+        h = data.get("handler")
+        if stats is not None and h is not None:
+            stats.handler = f"{h.callback.__module__}.{h.callback.__qualname__}"
+        return await handler(event, data)
+
+
+def setup(dp: Dispatcher, engine: AsyncEngine, **kw) -> QueryStatsMiddleware:
+    """نصب روی Dispatcher: بیرونی روی update، داخلی روی همه رویدادها (به routerهای فرزند هم می‌رسد)."""
+    mw = QueryStatsMiddleware(engine, **kw)
+    dp.update.outer_middleware(mw)
+    naming = _HandlerName()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(naming)
+    return mw
@@ -28,3 +28,19 @@ def is_positive_number(text: str) -> bool:
         return parse_numeric(text) >= 0
     except Exception:
         return False
+
+# یکسان‌سازی حروف عربی/فارسی برای جستجو: ي/ى→ی، ك→ک، ة/ۀ→ه، أ/إ/آ→ا؛
+# حذف نیم‌فاصله (ZWNJ)، کشیده و اعراب
+_SEARCH_TRANS = dict(_TRANS)
+_SEARCH_TRANS.update({
+    ord("ي"): "ی", ord("ى"): "ی", ord("ك"): "ک",
+    ord("ة"): "ه", ord("ۀ"): "ه",
+    ord("أ"): "ا", ord("إ"): "ا", ord("آ"): "ا",
+    0x200C: None, 0x200D: None, 0x0640: None,
+})
+for _cp in list(range(0x064B, 0x0660)) + [0x0670]:
+    _SEARCH_TRANS[_cp] = None
+
+def normalize_search(s: str) -> str:
+    """متن قابل مقایسه برای جستجو: حروف یکسان، ارقام انگلیسی، حروف کوچک، فاصله‌های تکی."""
+    return " ".join((s or "").translate(_SEARCH_TRANS).lower().split())